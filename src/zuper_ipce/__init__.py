@@ -10,21 +10,29 @@ logger.info(f"zj {__version__}")
 # from .utils_text import *
 
 from .types import IPCE, TypeLike
-from .constants import IEDO, IESO
-from .conv_ipce_from_object import ipce_from_object
+from .constants import IEDO, IESO, NumpyCompression
+from .conv_ipce_from_object import (
+    ipce_from_object,
+    ipce_from_objects,
+    register_ipce_from_object,
+)
 from .conv_ipce_from_typelike import ipce_from_typelike
-from .conv_object_from_ipce import object_from_ipce
+from .conv_object_from_ipce import object_from_ipce, objects_from_ipces
 from .conv_typelike_from_ipce import typelike_from_ipce
 
 _ = (
     ipce_from_object,
+    ipce_from_objects,
+    register_ipce_from_object,
     object_from_ipce,
+    objects_from_ipces,
     typelike_from_ipce,
     ipce_from_typelike,
     TypeLike,
     IPCE,
     IEDO,
     IESO,
+    NumpyCompression,
 )
 
 # __all__ = ['IPCE', 'ipce_from_typelike' ,'ipce_from_object', 'object_from_ipce', 'typelike_from_ipce']
@@ -0,0 +1,227 @@
+import mmap
+import os
+import struct
+from typing import BinaryIO, Iterator, List, Optional, Union
+
+import cbor2
+
+from zuper_typing.exceptions import ZValueError
+from .constants import JSC_TITLE, JSC_TITLE_NUMPY, SCHEMA_ATT
+from .types import IPCE
+
+__all__ = ["read_cbor_mmap", "read_cbor_objects_mmap", "read_cbor_objects_mmap_file"]
+
+CBOR_BREAK = 0xFF
+ARG_FORMATS = {24: ">B", 25: ">H", 26: ">L", 27: ">Q"}
+FLOAT_FORMATS = {25: ">e", 26: ">f", 27: ">d"}
+SIMPLE_VALUES = {20: False, 21: True, 22: None}
+# The keys of the uncompressed numpy encoding (see numpy_encoding)
+NUMPY_KEYS = frozenset(["data", "dtype", "shape"])
+NUMPY_KEYS_WITH_SCHEMA = NUMPY_KEYS | {SCHEMA_ATT}
+# Value-sharing tags (see IESO.sharing)
+CBOR_TAG_SHAREABLE = 28
+CBOR_TAG_SHAREDREF = 29
+
+
+def read_cbor_mmap(fn: str, writable: bool = False) -> IPCE:
+    """
+        Reads the (first) CBOR object in the file, memory-mapping the file.
+
+        The data of the numpy arrays (the "data" attribute of the
+        {data, dtype, shape} dicts, and the RFC 8746 typed arrays) is not
+        copied: it is a memoryview of the mapping, so the arrays decoded
+        with numpy_array_from_ipce() are views and only the pages that are
+        used are read. Compressed arrays are decoded as usual.
+
+        If writable is True, the file is mapped copy-on-write and the arrays
+        can be modified (the file is never changed).
+
+        The rest of the structure is decoded in Python, which is much slower
+        than cbor2's decoder: this is meant for the files whose size is
+        dominated by the arrays. For the files with many small records,
+        cbor2.load() (e.g. read_cbor_or_json_objects()) is faster.
+    """
+    for x in read_cbor_objects_mmap(fn, writable=writable):
+        return x
+    msg = "The file is empty."
+    raise ZValueError(msg, fn=fn)
+
+
+def read_cbor_objects_mmap(fn: str, writable: bool = False) -> Iterator[IPCE]:
+    """ Reads the sequence of CBOR objects in the file; see read_cbor_mmap(). """
+    with open(fn, "rb") as f:
+        yield from read_cbor_objects_mmap_file(f, writable=writable)
+
+
+def read_cbor_objects_mmap_file(
+    f: BinaryIO, writable: bool = False
+) -> Iterator[IPCE]:
+    """
+        Reads the CBOR objects from the current position of the open
+        (regular) file f to its end; see read_cbor_mmap().
+        The position of f is not changed.
+    """
+    start = f.tell()
+    if os.fstat(f.fileno()).st_size <= start:
+        return
+    access = mmap.ACCESS_COPY if writable else mmap.ACCESS_READ
+    # The mapping stays alive as long as some view references it.
+    m = mmap.mmap(f.fileno(), 0, access=access)
+    decoder = MmapCBORDecoder(memoryview(m))
+    decoder.pos = start
+    while decoder.pos < len(decoder.buf):
+        # the shared values are referenced only within each object
+        decoder.shareables = []
+        yield decoder.decode()
+
+
+class MmapCBORDecoder:
+    """
+        A decoder for the CBOR subset used for IPCE, which can return
+        the byte strings as views of the buffer.
+
+        The tags other than the numpy and value-sharing ones are decoded by cbor2.
+    """
+
+    def __init__(self, buf: memoryview):
+        self.buf = buf
+        self.pos = 0
+        # The values marked as shareable, in order
+        self.shareables: List[object] = []
+
+    def read(self, n: int) -> memoryview:
+        a, b = self.pos, self.pos + n
+        if b > len(self.buf):
+            msg = "Truncated CBOR data."
+            raise ZValueError(msg, pos=a, n=n, size=len(self.buf))
+        self.pos = b
+        return self.buf[a:b]
+
+    def read_arg(self, info: int) -> Optional[int]:
+        """ Returns None for the indefinite length. """
+        if info < 24:
+            return info
+        if info == 31:
+            return None
+        if info not in ARG_FORMATS:
+            msg = "Invalid CBOR data."
+            raise ZValueError(msg, pos=self.pos, info=info)
+        fmt = ARG_FORMATS[info]
+        return struct.unpack(fmt, self.read(struct.calcsize(fmt)))[0]
+
+    def at_break(self) -> bool:
+        if self.pos < len(self.buf) and self.buf[self.pos] == CBOR_BREAK:
+            self.pos += 1
+            return True
+        return False
+
+    def decode(self, view_ok: bool = False) -> object:
+        """ If view_ok, a byte string is returned as a view of the buffer. """
+        start = self.pos
+        ib = self.read(1)[0]
+        major, info = ib >> 5, ib & 31
+        if major == 7:
+            return self.decode_simple(info, start)
+        n = self.read_arg(info)
+        if n is None and major in (0, 1, 6):
+            msg = "Invalid CBOR data."
+            raise ZValueError(msg, pos=start, major=major)
+        if major == 0:
+            return n
+        if major == 1:
+            return -1 - n
+        if major == 2:
+            b = self.decode_bytes(n)
+            return b if view_ok else bytes(b)
+        if major == 3:
+            return bytes(self.decode_bytes(n)).decode("utf-8")
+        if major == 4:
+            return self.decode_array(n)
+        if major == 5:
+            return self.decode_map(n)
+        return self.decode_tag(n, start)
+
+    def decode_bytes(self, n: Optional[int]) -> Union[bytes, memoryview]:
+        if n is not None:
+            return self.read(n)
+        chunks = []
+        while not self.at_break():
+            ib = self.read(1)[0]
+            chunks.append(bytes(self.read(self.read_arg(ib & 31))))
+        return b"".join(chunks)
+
+    def decode_array(self, n: Optional[int]) -> list:
+        if n is not None:
+            return [self.decode() for _ in range(n)]
+        res = []
+        while not self.at_break():
+            res.append(self.decode())
+        return res
+
+    def decode_map(self, n: Optional[int]) -> dict:
+        res = {}
+        i = 0
+        while (i < n) if n is not None else not self.at_break():
+            k = self.decode()
+            # the data of the numpy arrays
+            res[k] = self.decode(view_ok=(k == "data"))
+            i += 1
+        data = res.get("data", None)
+        if isinstance(data, memoryview) and not is_numpy_encoding(res):
+            res["data"] = bytes(data)
+        return res
+
+    def decode_tag(self, tag: int, start: int) -> object:
+        from .numpy_encoding import (
+            CBOR_TAG_MULTI_DIM_ARRAY,
+            dtype_from_cbor_tag,
+            numpy_array_from_cbor_tag,
+        )
+
+        if tag == CBOR_TAG_MULTI_DIM_ARRAY or dtype_from_cbor_tag(tag) is not None:
+            value = self.decode(view_ok=True)
+            return numpy_array_from_cbor_tag(cbor2.CBORTag(tag, value))
+        if tag == CBOR_TAG_SHAREABLE:
+            i = len(self.shareables)
+            self.shareables.append(None)
+            value = self.shareables[i] = self.decode()
+            return value
+        if tag == CBOR_TAG_SHAREDREF:
+            i = self.decode()
+            if not isinstance(i, int) or not 0 <= i < len(self.shareables):
+                msg = "Invalid shared reference."
+                raise ZValueError(msg, pos=start, index=i)
+            return self.shareables[i]
+        # skip the value, and let cbor2 decode the whole item
+        self.decode()
+        return self.fallback(start)
+
+    def decode_simple(self, info: int, start: int) -> object:
+        if info in SIMPLE_VALUES:
+            return SIMPLE_VALUES[info]
+        if info in FLOAT_FORMATS:
+            fmt = FLOAT_FORMATS[info]
+            return struct.unpack(fmt, self.read(struct.calcsize(fmt)))[0]
+        if info == 31:
+            msg = "Unexpected CBOR break."
+            raise ZValueError(msg, pos=start)
+        if info == 24:
+            self.read(1)
+        return self.fallback(start)
+
+    def fallback(self, start: int) -> object:
+        from .json2cbor import tag_hook
+
+        return cbor2.loads(bytes(self.buf[start : self.pos]), tag_hook=tag_hook)
+
+
+def is_numpy_encoding(d: dict) -> bool:
+    """ Whether the dict is an uncompressed numpy array, and not
+        e.g. a dataclass that happens to have the same field names. """
+    keys = d.keys()
+    if keys == NUMPY_KEYS:
+        return True
+    if keys == NUMPY_KEYS_WITH_SCHEMA:
+        schema = d[SCHEMA_ATT]
+        return isinstance(schema, dict) and schema.get(JSC_TITLE) == JSC_TITLE_NUMPY
+    return False
@@ -0,0 +1,259 @@
+from dataclasses import fields, is_dataclass, replace
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+
+from zuper_typing.exceptions import ZTypeError, ZValueError
+from zuper_typing.my_dict import make_list
+from .constants import (
+    COLUMNS_ATT,
+    COLUMNS_LENGTH_ATT,
+    GlobalsDict,
+    IEDO,
+    IEDS,
+    IESO,
+    IPCE_PASS_THROUGH,
+    SCHEMA_ATT,
+)
+from .schema_session import schema_or_ref
+from .trampoline import Steps
+from .type_descriptors import get_type_descriptor, KIND_LIST
+from .types import IPCE, is_unconstrained, TypeLike
+
+__all__ = [
+    "get_columnar_type",
+    "gen_ipce_columns",
+    "gen_list_from_ipce_columns",
+    "get_packed_list",
+    "ipce_from_packed_list",
+    "list_from_packed_ipce",
+]
+
+# The field types stored as numpy arrays, if all the values have exactly this type
+NUMERIC_COLUMNS = {float: np.float64, int: np.int64, bool: np.bool_}
+# The dtype kinds that can be decoded as each type; the ints use the smallest
+# dtype that fits the values, otherwise they would be bigger than CBOR varints.
+NUMERIC_KINDS = {float: "f", int: "iu", bool: "b"}
+INT_DTYPES = [
+    np.uint8,
+    np.int8,
+    np.uint16,
+    np.int16,
+    np.uint32,
+    np.int32,
+    np.uint64,
+    np.int64,
+]
+
+
+def get_columnar_type(ob: list, V: TypeLike, ieso: IESO) -> Optional[type]:
+    """
+        Returns the dataclass T if the list can be encoded by columns:
+        all elements must be exactly of type T, and the decoder must be able
+        to know T (from the suggested type, or from the schema).
+    """
+    if not ob:
+        return None
+    T = type(ob[0])
+    if not is_dataclass(T):
+        return None
+    if V is not T and not (ieso.with_schema and is_unconstrained(V)):
+        return None
+    for x in ob:
+        if type(x) is not T:
+            return None
+
+    from .compile_ipce_from_object import get_ipce_from_object_plan
+
+    # The values that would need hints must be encoded by rows.
+    plan = get_ipce_from_object_plan(T, ieso)
+    for fp in plan.field_plans:
+        if fp.needs_hint:
+            for x in ob:
+                if isinstance(getattr(x, fp.name), (list, tuple)):
+                    return None
+    return T
+
+
+def gen_ipce_columns(
+    ob: list, T: type, *, globals_: GlobalsDict, ieso: IESO
+) -> Steps:
+    """
+        Encodes the list of instances of the dataclass T as
+        ``{"$columns": {field: column}, "$length": n}``, plus the schema of List[T].
+
+        The int, float and bool fields become numpy arrays (see numpy_encoding);
+        the other columns are the lists of the IPCEs of the values.
+    """
+    from .compile_ipce_from_object import get_ipce_from_object_plan
+    from .conv_ipce_from_object import (
+        all_ipce_as_is,
+        gen_ipce_from_object_,
+        is_ipce_as_is,
+    )
+    from .ipce_spec import sorted_dict_cbor_ord
+    from .numpy_encoding import ipce_from_numpy_array
+
+    plan = get_ipce_from_object_plan(T, ieso)
+    res = {}
+    if ieso.with_schema:
+        from .conv_ipce_from_typelike import ipce_from_typelike
+
+        schema = ipce_from_typelike(List[T], globals0=globals_, ieso=ieso)
+        res[SCHEMA_ATT] = schema_or_ref(schema)
+
+    globals_ = plan.get_globals(globals_)
+    columns = {}
+    for fp in plan.field_plans:
+        values = [getattr(x, fp.name) for x in ob]
+        column = get_numeric_column(fp.T, values)
+        if column is not None:
+            columns[fp.name] = ipce_from_numpy_array(column)
+            continue
+        if all_ipce_as_is(values, fp.T):
+            columns[fp.name] = values
+            continue
+        col = []
+        for x, v in zip(ob, values):
+            try:
+                if is_ipce_as_is(v, fp.T):
+                    col.append(v)
+                elif fp.convert is not None:
+                    col.append(fp.convert(v, globals_))
+                else:
+                    g = gen_ipce_from_object_(v, fp.T, globals_=globals_, ieso=ieso)
+                    col.append((yield g))
+            except IPCE_PASS_THROUGH:  # pragma: no cover
+                raise
+            except BaseException as e:
+                raise plan.field_error(fp, x) from e
+        columns[fp.name] = col
+
+    res[COLUMNS_ATT] = sorted_dict_cbor_ord(columns)
+    res[COLUMNS_LENGTH_ATT] = len(ob)
+    return sorted_dict_cbor_ord(res)
+
+
+def get_numeric_column(T: TypeLike, values: list) -> Optional[np.ndarray]:
+    if T not in NUMERIC_COLUMNS:
+        return None
+    for v in values:
+        if type(v) is not T:
+            return None
+    if T is int and values:
+        return get_int_column(values)
+    return np.array(values, dtype=NUMERIC_COLUMNS[T])
+
+
+def get_int_column(values: List[int]) -> Optional[np.ndarray]:
+    """ Uses the smallest dtype for the range of the values; returns None
+        if they do not fit in 64 bits. """
+    lo = min(values)
+    hi = max(values)
+    for dtype in INT_DTYPES:
+        info = np.iinfo(dtype)
+        if info.min <= lo and hi <= info.max:
+            return np.array(values, dtype=dtype)
+    return None
+
+
+def get_packed_list(ob: list, V: TypeLike, ieso: IESO) -> Optional[np.ndarray]:
+    """
+        Returns the array to use for the list with elements of type V,
+        if the list must be packed according to ieso.pack_numeric_lists.
+    """
+    threshold = ieso.pack_numeric_lists
+    if threshold is None or len(ob) < threshold:
+        return None
+    return get_numeric_column(V, ob)
+
+
+def ipce_from_packed_list(
+    x: np.ndarray, V: type, *, globals_: GlobalsDict, ieso: IESO
+) -> IPCE:
+    """ The IPCE of a list packed by get_packed_list(): the numpy encoding,
+        plus the schema of List[V]. """
+    from .ipce_spec import sorted_dict_cbor_ord
+    from .numpy_encoding import ipce_from_numpy_array
+
+    res = ipce_from_numpy_array(x, ieso.numpy_compression)
+    if ieso.with_schema:
+        from .conv_ipce_from_typelike import ipce_from_typelike
+
+        schema = ipce_from_typelike(List[V], globals0=globals_, ieso=ieso)
+        res[SCHEMA_ATT] = schema_or_ref(schema)
+    return sorted_dict_cbor_ord(res)
+
+
+def list_from_packed_ipce(mj: Union[dict, np.ndarray], K: TypeLike) -> list:
+    """ Decodes a list packed by ipce_from_packed_list(), or a numpy array
+        decoded from the CBOR tags, as the list type K. """
+    from .numpy_encoding import numpy_array_from_ipce
+
+    (V,) = get_type_descriptor(K).args
+    x = mj if isinstance(mj, np.ndarray) else numpy_array_from_ipce(mj)
+    if V not in NUMERIC_KINDS or x.ndim != 1 or x.dtype.kind not in NUMERIC_KINDS[V]:
+        msg = "Cannot decode the array of @dtype with shape @shape as @K."
+        raise ZValueError(msg, K=K, dtype=x.dtype.name, shape=x.shape)
+    return make_list(V)(x.tolist())
+
+
+def gen_list_from_ipce_columns(
+    mj: dict, K: TypeLike, *, ieds: IEDS, iedo: IEDO
+) -> Steps:
+    """ Decodes the columnar encoding created by gen_ipce_columns(). """
+    from .conv_object_from_ipce import (
+        all_objects_as_is,
+        gen_object_from_ipce_,
+        is_object_as_is,
+    )
+    from .numpy_encoding import numpy_array_from_ipce
+
+    d = get_type_descriptor(K)
+    T = d.args[0] if d.kind == KIND_LIST else None
+    if T is None or not is_dataclass(T):
+        msg = "Found a list of dataclasses by columns, but expected @K."
+        raise ZValueError(msg, K=K)
+
+    name = T.__name__
+    if ieds.global_symbols.get(name, None) is not T:
+        g = dict(ieds.global_symbols)
+        g[name] = T
+        ieds = replace(ieds, global_symbols=g)
+
+    n = mj[COLUMNS_LENGTH_ATT]
+    anns: Dict[str, TypeLike] = {f.name: f.type for f in fields(T)}
+    columns = {}
+    for k, col in mj[COLUMNS_ATT].items():
+        if k not in anns:
+            msg = f"Unknown column {k!r} for class {name}."
+            raise ZValueError(msg, T=T, known=sorted(anns))
+        et = anns[k]
+        if isinstance(col, dict):
+            values = numpy_array_from_ipce(col).tolist()
+        elif all_objects_as_is(col, et):
+            values = col
+        else:
+            values = []
+            for v in col:
+                if is_object_as_is(v, et):
+                    values.append(v)
+                else:
+                    g = gen_object_from_ipce_(v, et, ieds=ieds, iedo=iedo)
+                    values.append((yield g))
+        if len(values) != n:
+            msg = f"Column {k!r} has {len(values)} values instead of {n}."
+            raise ZValueError(msg, T=T)
+        columns[k] = values
+
+    names = list(columns)
+    rows = zip(*columns.values()) if names else ([()] * n)
+    res = []
+    for row in rows:
+        attrs = dict(zip(names, row))
+        try:
+            res.append(T(**attrs))
+        except TypeError as e:  # pragma: no cover
+            msg = f"Cannot instantiate type {name}."
+            raise ZTypeError(msg, T=T, attrs=attrs) from e
+    return make_list(T)(res)
@@ -0,0 +1,228 @@
+import datetime
+from dataclasses import dataclass, Field, fields, MISSING
+from decimal import Decimal
+from typing import Callable, cast, Dict, List, Optional, Tuple
+
+from zuper_typing.exceptions import ZValueError
+from zuper_typing.my_dict import make_dict
+from .constants import GlobalsDict, HINTS_ATT, IESO, IPCE_PASS_THROUGH, SCHEMA_ATT
+from .ipce_spec import sorted_list_cbor_ord
+from .schema_session import schema_or_ref
+from .trampoline import run_trampoline, Steps
+from .types import IPCE, is_unconstrained, TypeLike
+
+__all__ = [
+    "get_ipce_from_object_plan",
+    "compile_ipce_from_object_dataclass",
+    "DataclassSerializer",
+    "DataclassPlan",
+]
+
+# Where the compiled plans are stored on the dataclass type.
+# Maps IESO -> DataclassSerializer.
+ATT_IPCE_FROM_OBJECT_PLANS = "__ipce_from_object_plans__"
+
+DataclassSerializer = Callable[[object, GlobalsDict], IPCE]
+
+FieldConverter = Callable[[object, GlobalsDict], IPCE]
+
+TRIVIAL_FIELD_TYPES = (bool, int, str, float, bytes, Decimal)
+
+
+def get_ipce_from_object_plan(T: type, ieso: IESO) -> DataclassSerializer:
+    """ Returns the serializer for instances of the dataclass T,
+        compiling it the first time it is needed. """
+    # Note: we look in __dict__ so that subclasses do not use the plans of the parents.
+    plans: Optional[Dict[IESO, DataclassSerializer]]
+    plans = T.__dict__.get(ATT_IPCE_FROM_OBJECT_PLANS, None)
+    if plans is None:
+        plans = {}
+        setattr(T, ATT_IPCE_FROM_OBJECT_PLANS, plans)
+    try:
+        return plans[ieso]
+    except KeyError:
+        plan = plans[ieso] = compile_ipce_from_object_dataclass(T, ieso)
+        return plan
+
+
+@dataclass
+class FieldPlan:
+    name: str
+    T: TypeLike
+    # Fast path for scalars; None means to use the generic conversion steps
+    convert: Optional[FieldConverter]
+    # True if the default (or the default factory result) is equal to the value
+    is_default: Callable[[object], bool]
+    # Whether we need to write the type of lists/tuples in the hints
+    needs_hint: bool
+
+
+def compile_ipce_from_object_dataclass(T: type, ieso: IESO) -> DataclassSerializer:
+    """
+        Creates a specialized serializer for instances of the dataclass T.
+
+        Everything that does not depend on the instance is computed here once:
+        the list of fields, the converter for each field, the way to compare
+        with the defaults, and the final CBOR order of the keys.
+    """
+    return DataclassPlan(T, ieso)
+
+
+class DataclassPlan:
+    """ The compiled serializer for a dataclass;
+        see compile_ipce_from_object_dataclass(). """
+
+    def __init__(self, T: type, ieso: IESO):
+        self.T = T
+        self.name = T.__name__
+        self.ieso = ieso
+        self.field_plans: List[FieldPlan] = []
+        for f in fields(T):
+            fp = FieldPlan(
+                name=f.name,
+                T=f.type,
+                convert=get_field_converter(f.type, ieso),
+                is_default=get_default_comparison(f),
+                needs_hint=ieso.with_schema and is_unconstrained(f.type),
+            )
+            self.field_plans.append(fp)
+
+        # We only need to sort once; the output is created already sorted.
+        names = [_.name for _ in self.field_plans]
+        self.order: Tuple[str, ...] = tuple(
+            sorted_list_cbor_ord(names + [SCHEMA_ATT, HINTS_ATT])
+        )
+        self._schema: Optional[IPCE] = None
+
+    def get_schema(self, globals_: GlobalsDict) -> IPCE:
+        if self._schema is not None:
+            return self._schema
+        from .conv_ipce_from_typelike import ipce_from_typelike
+
+        schema = ipce_from_typelike(self.T, globals0=globals_, ieso=self.ieso)
+        if self.ieso.use_ipce_from_typelike_cache:
+            self._schema = schema
+        return schema
+
+    def get_globals(self, globals_: GlobalsDict) -> GlobalsDict:
+        """ Returns the globals to use for the fields. """
+        if globals_.get(self.name, None) is not self.T:
+            globals_ = dict(globals_)
+            globals_[self.name] = self.T
+        return globals_
+
+    def select(self, ob: object) -> Tuple[Dict[str, Tuple[FieldPlan, object]], dict]:
+        """ Returns the fields that are not equal to the default,
+            with their values, and the hints to write. """
+        present = {}
+        hints = {}
+        for fp in self.field_plans:
+            v = getattr(ob, fp.name)
+            if fp.is_default(v):
+                continue
+            present[fp.name] = fp, v
+            if fp.needs_hint and isinstance(v, (list, tuple)):
+                hints[fp.name] = type(v)
+        return present, hints
+
+    def get_hints_ipce(self, hints: dict) -> IPCE:
+        from .conv_ipce_from_object import ipce_from_object
+
+        H = make_dict(str, type)
+        return ipce_from_object(H(hints), ieso=self.ieso)
+
+    def field_error(self, fp: FieldPlan, ob: object) -> ZValueError:
+        msg = (
+            f"Could not serialize an object. Problem "
+            f"occurred with the attribute {fp.name!r}. It is supposed to be of type @expected "
+            f" but found @found."
+        )
+        return ZValueError(msg, expected=fp.T, found=type(ob))
+
+    def __call__(self, ob: object, globals_: GlobalsDict) -> IPCE:
+        return cast(IPCE, run_trampoline(self.steps(ob, globals_)))
+
+    def steps(self, ob: object, globals_: GlobalsDict) -> Steps:
+        """ The conversion as steps for run_trampoline(); the fields are
+            converted by yielding the steps of ipce_from_object_(). """
+        from .conv_ipce_from_object import gen_ipce_from_object_
+
+        values = {}
+        if self.ieso.with_schema:
+            values[SCHEMA_ATT] = schema_or_ref(self.get_schema(globals_))
+
+        globals_ = self.get_globals(globals_)
+
+        present, hints = self.select(ob)
+        for k, (fp, v) in present.items():
+            try:
+                if fp.convert is not None:
+                    values[k] = fp.convert(v, globals_)
+                else:
+                    values[k] = yield gen_ipce_from_object_(
+                        v, fp.T, globals_=globals_, ieso=self.ieso
+                    )
+            except IPCE_PASS_THROUGH:
+                raise
+            except BaseException as e:
+                raise self.field_error(fp, ob) from e
+
+        if hints:
+            values[HINTS_ATT] = self.get_hints_ipce(hints)
+
+        return {k: values[k] for k in self.order if k in values}
+
+
+def get_default_comparison(f: Field) -> Callable[[object], bool]:
+    if f.default is not MISSING:
+        default = f.default
+    elif f.default_factory is not MISSING:
+        factory = f.default_factory
+
+        # The factory is called for each value, as it might not always
+        # return equal values (e.g. a timestamp).
+        def is_default_factory(value: object) -> bool:
+            return factory() == value
+
+        return is_default_factory
+    else:
+
+        def never(_: object) -> bool:
+            return False
+
+        return never
+
+    def is_default(value: object) -> bool:
+        return default == value
+
+    return is_default
+
+
+def get_field_converter(ft: TypeLike, ieso: IESO) -> Optional[FieldConverter]:
+    """ Returns a fast converter for scalar fields, or None. """
+    from .conv_ipce_from_object import ipce_from_object
+
+    def generic(v: object, globals_: GlobalsDict) -> IPCE:
+        return ipce_from_object(v, ft, globals_=globals_, ieso=ieso)
+
+    if ft in TRIVIAL_FIELD_TYPES:
+
+        def trivial(v: object, globals_: GlobalsDict) -> IPCE:
+            if type(v) is ft:
+                return v
+            # subclasses might have a registered handler;
+            # and let the generic path raise the appropriate error
+            return generic(v, globals_)
+
+        return trivial
+
+    if ft is datetime.datetime:
+
+        def with_timezone(v: object, globals_: GlobalsDict) -> IPCE:
+            if isinstance(v, datetime.datetime) and v.tzinfo:
+                return v
+            return generic(v, globals_)
+
+        return with_timezone
+
+    return None
@@ -0,0 +1,166 @@
+import datetime
+import inspect
+from dataclasses import dataclass, Field, fields, MISSING, replace
+from decimal import Decimal
+from typing import Callable, Dict, FrozenSet, List, Optional
+
+from zuper_typing.annotations_tricks import is_ClassVar
+from zuper_typing.exceptions import ZTypeError, ZValueError
+from .constants import HINTS_ATT, IEDO, IEDS, IPCE_PASS_THROUGH
+from .trampoline import Steps
+from .types import IPCE, TypeLike
+
+__all__ = [
+    "get_object_from_ipce_plan",
+    "compile_object_from_ipce_dataclass",
+    "get_required_fields",
+    "DataclassDeserializer",
+]
+
+# Where the compiled plan is stored on the dataclass type.
+ATT_OBJECT_FROM_IPCE_PLAN = "__object_from_ipce_plan__"
+
+# Returns the steps of the deserialization (see run_trampoline)
+DataclassDeserializer = Callable[[IPCE, IEDS, IEDO], Steps]
+
+TRIVIAL_FIELD_TYPES = (int, float, bool, bytes, str, datetime.datetime, Decimal)
+
+
+def get_object_from_ipce_plan(K: type) -> DataclassDeserializer:
+    """ Returns the deserializer for the dataclass K,
+        compiling it the first time it is needed. """
+    # Note: we look in __dict__ so that subclasses do not use the plan of the parents.
+    plan: Optional[DataclassDeserializer]
+    plan = K.__dict__.get(ATT_OBJECT_FROM_IPCE_PLAN, None)
+    if plan is None:
+        plan = compile_object_from_ipce_dataclass(K)
+        setattr(K, ATT_OBJECT_FROM_IPCE_PLAN, plan)
+    return plan
+
+
+@dataclass
+class FieldDecodePlan:
+    name: str
+    T: TypeLike
+    # Whether T is one of TRIVIAL_FIELD_TYPES, for the fast path
+    is_trivial: bool
+    is_abstract: bool
+
+
+@dataclass
+class FieldDefault:
+    name: str
+    T: TypeLike
+    f: Optional[Field]
+
+
+def compile_object_from_ipce_dataclass(K: type) -> DataclassDeserializer:
+    """
+        Creates a specialized deserializer for the dataclass K.
+
+        The annotations, the converter for each key, the abstract checks
+        and the defaults to fill in are computed here once.
+    """
+    name = K.__name__
+    anns: Dict[str, TypeLike] = dict(getattr(K, "__annotations__", {}))
+    class_fields: Dict[str, Field] = {f.name: f for f in fields(K)}
+
+    by_key: Dict[str, FieldDecodePlan] = {}
+    for k, et_k in anns.items():
+        by_key[k] = FieldDecodePlan(
+            name=k,
+            T=et_k,
+            is_trivial=et_k in TRIVIAL_FIELD_TYPES,
+            is_abstract=inspect.isabstract(et_k),
+        )
+
+    defaults: List[FieldDefault] = []
+    for k, T in anns.items():
+        if is_ClassVar(T):
+            continue
+        defaults.append(FieldDefault(k, T, class_fields.get(k, None)))
+
+    def deserialize(mj: IPCE, ieds: IEDS, iedo: IEDO) -> Steps:
+        from .conv_object_from_ipce import gen_object_from_ipce_
+
+        if ieds.global_symbols.get(name, None) is not K:
+            g = dict(ieds.global_symbols)
+            g[name] = K
+            ieds = replace(ieds, global_symbols=g)
+
+        attrs = {}
+        hints = mj.get(HINTS_ATT, None)
+
+        for k, v in mj.items():
+            fp = by_key.get(k, None)
+            if fp is None:
+                continue
+
+            if fp.is_abstract:  # pragma: no cover
+                msg = f"Trying to instantiate abstract class for field {k!r} of class {name}."
+                raise ZValueError(msg, K=K, expect_type=fp.T, mj=mj, annotation=fp.T)
+
+            if hints and k in hints:
+                from .conv_typelike_from_ipce import typelike_from_ipce_sr
+
+                et_k = typelike_from_ipce_sr(hints[k], ieds=ieds, iedo=iedo).res
+                is_trivial = False
+            else:
+                et_k = fp.T
+                is_trivial = fp.is_trivial
+            try:
+                if is_trivial and isinstance(v, et_k):
+                    attrs[k] = v
+                else:
+                    g = gen_object_from_ipce_(v, et_k, ieds=ieds, iedo=iedo)
+                    attrs[k] = yield g
+            except IPCE_PASS_THROUGH:  # pragma: no cover
+                raise
+            except ZValueError as e:  # pragma: no cover
+                msg = f"Cannot deserialize attribute {k!r} of {name}."
+                raise ZValueError(
+                    msg,
+                    K_annotations=anns,
+                    expect_type=et_k,
+                    ann_K=fp.T,
+                    K_name=name,
+                ) from e
+
+        for fd in defaults:
+            if fd.name in mj:
+                continue
+            f = fd.f
+            if f is not None and f.default is not MISSING:
+                attrs[fd.name] = f.default
+            elif f is not None and f.default_factory is not MISSING:
+                attrs[fd.name] = f.default_factory()
+            else:
+                msg = (
+                    f"Cannot find field {fd.name!r} in data for class {name} "
+                    f"and no default available"
+                )
+                raise ZValueError(msg, anns=anns, T=fd.T, known=sorted(mj), f=f)
+
+        try:
+            return K(**attrs)
+        except TypeError as e:  # pragma: no cover
+            msg = f"Cannot instantiate type {name}."
+            raise ZTypeError(msg, K=K, attrs=attrs, bases=K.__bases__, fields=anns) from e
+
+    deserialize.__name__ = f"object_from_ipce_{name}"
+    return deserialize
+
+
+def get_required_fields(K: type) -> FrozenSet[str]:
+    """ The fields that must be in the data for deserializing K
+        (the same ones for which the deserializer would complain). """
+    anns: Dict[str, TypeLike] = dict(getattr(K, "__annotations__", {}))
+    class_fields: Dict[str, Field] = {f.name: f for f in fields(K)}
+    res = set()
+    for k, T in anns.items():
+        if is_ClassVar(T):
+            continue
+        f = class_fields.get(k, None)
+        if f is None or (f.default is MISSING and f.default_factory is MISSING):
+            res.add(k)
+    return frozenset(res)
@@ -0,0 +1,179 @@
+import datetime
+from dataclasses import dataclass, field, is_dataclass
+from decimal import Decimal
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+from zuper_typing.annotations_tricks import (
+    get_Union_args,
+    is_Optional,
+    is_TupleLike,
+    is_TypeVar,
+    is_Union,
+)
+from zuper_typing.my_dict import is_ListLike
+from zuper_typing.my_intersection import is_Intersection
+from .constants import (
+    ATT_PYTHON_NAME,
+    JSC_TITLE,
+    JSC_TITLE_TYPE,
+    REF_ATT,
+    SCHEMA_ATT,
+    X_PYTHON_MODULE_ATT,
+)
+from .types import IPCE, is_unconstrained, TypeLike
+
+__all__ = ["get_union_plan", "UnionPlan"]
+
+TRIVIAL_TYPES = (bool, int, str, float, bytes, Decimal, datetime.datetime)
+
+
+@dataclass
+class UnionMember:
+    T: TypeLike
+    # One of the TRIVIAL_TYPES
+    is_trivial: bool
+    # Optional, Union, Intersection, TypeVar: we cannot say anything
+    is_opaque: bool
+    # For dataclasses: the fields that must be present in the data
+    required: Optional[FrozenSet[str]]
+    # Whether a list can be deserialized with this type
+    accepts_list: bool
+
+
+@dataclass
+class UnionPlan:
+    """
+        Selects the members of a Union that can possibly work for a value.
+
+        The candidates are returned in the same order as the Union
+        arguments, skipping only the ones that would certainly fail;
+        so trying them in order gives the same result as trying all members,
+        without paying for the failures.
+    """
+
+    U: TypeLike
+    members: Tuple[UnionMember, ...]
+    # Candidates for a dict with a schema: all the members that are not scalars
+    typed: List[TypeLike]
+    # (module, qualname) of a dataclass member -> the candidates for a dict
+    # whose $schema names it: that member first, then the other ones of typed.
+    by_name: Dict[Tuple[str, str], List[TypeLike]]
+    # Python type of the object -> candidates for serialization
+    by_type: Dict[type, List[TypeLike]] = field(default_factory=dict)
+    # Python type of a scalar IPCE -> candidates for deserialization
+    by_scalar: Dict[type, List[TypeLike]] = field(default_factory=dict)
+
+    def candidates_for_object(self, ob: object) -> List[TypeLike]:
+        T = type(ob)
+        try:
+            return self.by_type[T]
+        except KeyError:
+            pass
+        res = []
+        for m in self.members:
+            # the only check that depends on the type: it must be an instance
+            if m.is_trivial and not issubclass(T, m.T):
+                continue
+            res.append(m.T)
+        self.by_type[T] = res
+        return res
+
+    def candidates_for_ipce(self, mj: IPCE) -> List[TypeLike]:
+        if isinstance(mj, dict):
+            return self.candidates_for_ipce_dict(mj)
+        if isinstance(mj, list):
+            return [m.T for m in self.members if m.is_opaque or m.accepts_list]
+        T = type(mj)
+        try:
+            return self.by_scalar[T]
+        except KeyError:
+            pass
+        res = []
+        for m in self.members:
+            if m.is_opaque:
+                ok = True
+            elif m.is_trivial:
+                ok = isinstance(mj, m.T)
+            else:
+                ok = (
+                    is_unconstrained(m.T)
+                    or (mj is None and m.T is type(None))
+                    # decoded arrays (see numpy_array_from_cbor_tag)
+                    or (isinstance(m.T, type) and isinstance(mj, m.T))
+                )
+            if ok:
+                res.append(m.T)
+        self.by_scalar[T] = res
+        return res
+
+    def candidates_for_ipce_dict(self, mj: dict) -> List[TypeLike]:
+        # With a schema, the type comes from the data, so any
+        # member that is not a scalar gives the same result;
+        # the member named by the schema is picked directly.
+        schema = mj.get(SCHEMA_ATT, None)
+        if isinstance(schema, dict):
+            name = schema.get(X_PYTHON_MODULE_ATT, None), schema.get(ATT_PYTHON_NAME)
+            try:
+                return self.by_name[name]
+            except (KeyError, TypeError):
+                return self.typed
+        if schema is not None or REF_ATT in mj:
+            return self.typed
+        if mj.get(JSC_TITLE, None) == JSC_TITLE_TYPE:
+            return self.typed
+        res = []
+        for m in self.members:
+            if m.is_trivial:
+                continue
+            if m.required is not None and not m.required.issubset(mj):
+                continue
+            res.append(m.T)
+        return res
+
+
+class UnionPlans:
+    # The Unions (and their members) are held strongly,
+    # so the cache is cleared when it reaches max_size.
+    plans: Dict[TypeLike, UnionPlan] = {}
+    max_size = 10000
+
+
+def get_union_plan(U: TypeLike) -> UnionPlan:
+    try:
+        return UnionPlans.plans[U]
+    except KeyError:
+        pass
+    except TypeError:  # pragma: no cover
+        # not hashable
+        return compile_union_plan(U)
+    plan = compile_union_plan(U)
+    if len(UnionPlans.plans) >= UnionPlans.max_size:
+        UnionPlans.plans.clear()
+    UnionPlans.plans[U] = plan
+    return plan
+
+
+def compile_union_plan(U: TypeLike) -> UnionPlan:
+    from .compile_object_from_ipce import get_required_fields
+
+    members = []
+    for T in get_Union_args(U):
+        is_opaque = is_Optional(T) or is_Union(T) or is_Intersection(T) or is_TypeVar(T)
+        is_dc = isinstance(T, type) and is_dataclass(T)
+        m = UnionMember(
+            T=T,
+            is_trivial=T in TRIVIAL_TYPES,
+            is_opaque=is_opaque,
+            required=get_required_fields(T) if is_dc else None,
+            accepts_list=is_unconstrained(T) or is_TupleLike(T) or is_ListLike(T),
+        )
+        members.append(m)
+
+    typed = [m.T for m in members if not m.is_trivial]
+    by_name = {}
+    for T in typed:
+        if isinstance(T, type) and is_dataclass(T):
+            name = T.__module__, T.__qualname__
+            if name not in by_name:
+                by_name[name] = [T] + [x for x in typed if x is not T]
+    return UnionPlan(U, tuple(members), typed, by_name)
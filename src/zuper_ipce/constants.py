@@ -1,7 +1,7 @@
 from dataclasses import dataclass, field
 from datetime import datetime
 from decimal import Decimal
-from typing import cast, Dict, NewType, Tuple
+from typing import cast, Dict, NewType, Optional, Tuple
 
 from zuper_typing.my_dict import make_dict
 
@@ -14,6 +14,11 @@ EncounteredDict = Dict[str, object]
 SCHEMA_ID = "http://json-schema.org/draft-07/schema#"
 SCHEMA_ATT = "$schema"
 HINTS_ATT = "$hints"
+# In a schema session, stands in for a schema already written in the stream
+SCHEMA_REF_ATT = "$schema_ref"
+# Columnar encoding of a list of dataclasses (see columnar.py)
+COLUMNS_ATT = "$columns"
+COLUMNS_LENGTH_ATT = "$length"
 ANY_OF = "anyOf"
 ALL_OF = "allOf"
 ID_ATT = "$id"
@@ -85,10 +90,18 @@ CALLABLE_ORDERING = "ordering"
 CALLABLE_RETURN = "return"
 
 
-@dataclass
+@dataclass(frozen=True)
 class IEDO:
     use_remembered_classes: bool
     remember_deserialized_classes: bool
+    # Re-use the types synthesized from identical schemas across calls
+    # (a bounded cache; see schema_caching.set_typelike_from_ipce_cache_size)
+    use_schema_cache: bool = False
+    # Decode numpy arrays as writable (copying the data only if read-only)
+    numpy_writable: bool = False
+    # Decode the IPCE subtrees that appear several times (the same dict or list,
+    # as produced by the CBOR value-sharing tags) as the same object
+    share_objects: bool = False
 
 
 ModuleName = QualName = str
@@ -100,11 +113,15 @@ class IEDS:
     global_symbols: Dict[str, type]
     encountered: Dict
     klasses: Dict[Tuple[ModuleName, QualName], type] = None
+    # (id(IPCE), expected type) -> (IPCE, object), if IEDO.share_objects
+    shared: Dict[Tuple[int, object], Tuple[object, object]] = None
 
     def __post_init__(self):
         pass
         if self.klasses is None:
             self.klasses = make_dict(str, type)()
+        if self.shared is None:
+            self.shared = {}
         #     from .logging import logger
         #     logger.info('IEDS new')
         #     global n
@@ -113,10 +130,52 @@ class IEDS:
         #         raise NotImplementedError()
 
 
-@dataclass
+# Validation levels for the canonical form of the IPCE produced.
+# Any other level N > 1 means that one every N results is checked.
+VALIDATION_OFF = 0
+VALIDATION_FULL = 1
+
+# Sharing of the repeated sub-objects in the IPCE produced (see sharing.py)
+SHARING_OFF = 0
+# The same object (by identity) is converted once
+SHARING_IDENTITY = 1
+# Also the equal instances of frozen dataclasses
+SHARING_VALUE = 2
+
+
+NUMPY_COMPRESSION_ZLIB = "zlib"
+NUMPY_COMPRESSION_LZMA = "lzma"
+
+
+@dataclass(frozen=True)
+class NumpyCompression:
+    """ How to compress the data of the numpy arrays (see numpy_encoding). """
+
+    # One of the NUMPY_COMPRESSION_* methods
+    method: str = NUMPY_COMPRESSION_ZLIB
+    # zlib level, or lzma preset
+    level: int = 6
+    # The data is compressed in chunks of this many (uncompressed) bytes
+    chunk_size: int = 1 << 20
+    # Smaller arrays are not compressed
+    min_size: int = 1 << 16
+
+
+@dataclass(frozen=True)
 class IESO:
     use_ipce_from_typelike_cache: bool = True
     with_schema: bool = True
+    # One of the VALIDATION_* levels; None uses the process-wide default
+    validation: Optional[int] = None
+    # If not None, the large numpy arrays are compressed
+    numpy_compression: Optional[NumpyCompression] = None
+    # Encode the lists of dataclasses by columns (see columnar.py)
+    columnar: bool = False
+    # If not None, the lists of int, float or bool with at least this many
+    # elements are packed as numpy arrays (see columnar.py)
+    pack_numeric_lists: Optional[int] = None
+    # One of the SHARING_* levels
+    sharing: int = SHARING_OFF
 
 
 IPCE_PASS_THROUGH = (NotImplementedError, KeyboardInterrupt, MemoryError)
@@ -0,0 +1,196 @@
+import io
+import itertools
+import struct
+from typing import BinaryIO, Dict, Iterator, List, Optional, Set
+
+import cbor2
+import numpy as np
+
+from zuper_typing.exceptions import ZTypeError
+from .constants import GlobalsDict, IESO, SHARING_OFF
+from .ipce_stream_writer import IPCEStreamWriter
+from .schema_session import SchemaSession
+from .types import IPCE, TypeLike
+
+__all__ = ["cbor_from_object"]
+
+CBOR_MAJOR_BYTES = 2
+CBOR_MAJOR_ARRAY = 4
+CBOR_MAJOR_MAP = 5
+CBOR_MAJOR_TAG = 6
+# Value-sharing tags (http://cbor.schmorp.de/value-sharing)
+CBOR_TAG_SHAREABLE = 28
+CBOR_TAG_SHAREDREF = 29
+
+
+def cbor_from_object(
+    ob: object,
+    fp: Optional[BinaryIO] = None,
+    suggest_type: TypeLike = object,
+    *,
+    globals_: GlobalsDict = None,
+    ieso: Optional[IESO] = None,
+    session: Optional[SchemaSession] = None,
+    numpy_tags: bool = False,
+) -> Optional[bytes]:
+    """
+        Writes the CBOR encoding of the object to the binary stream fp,
+        walking the object directly instead of creating the IPCE first.
+
+        The output is byte-identical to ``cbor2.dumps(ipce_from_object(ob))``.
+        If fp is None, the bytes are returned.
+
+        If a session is given, the schemas already written in the session
+        are replaced by references (see SchemaSession).
+
+        If numpy_tags is True, the numpy arrays are written using the
+        RFC 8746 tags for multi-dimensional and typed arrays, in their byte order,
+        instead of the {data, dtype, shape} dict (which is still used for the
+        dtypes without a tag, and for the arrays compressed according to
+        ieso.numpy_compression). These are read back as arrays by
+        json2cbor.tag_hook, but the output is not the encoding of an IPCE anymore.
+
+        If ieso.sharing is on, the IPCE is created first, and the dicts and lists
+        that appear more than once in it are written once, using the value-sharing
+        tags; cbor2.loads() decodes them as the same object. In this case the
+        numpy arrays are written as dicts.
+
+        If an error occurs, part of the output might have been already written.
+    """
+    if ieso is None:
+        ieso = IESO(with_schema=True)
+    if globals_ is None:
+        globals_ = {}
+    if fp is None:
+        buf = io.BytesIO()
+        cbor_from_object(
+            ob,
+            buf,
+            suggest_type,
+            globals_=globals_,
+            ieso=ieso,
+            session=session,
+            numpy_tags=numpy_tags,
+        )
+        return buf.getvalue()
+
+    w = CBORStreamWriter(fp, ieso, session, numpy_tags=numpy_tags)
+    try:
+        if ieso.sharing != SHARING_OFF:
+            from .conv_ipce_from_object import ipce_from_object
+
+            ipce = ipce_from_object(
+                ob, suggest_type, globals_=globals_, ieso=ieso, session=session
+            )
+            w.write_ipce_shared(ipce)
+        else:
+            w.write(ob, suggest_type, globals_)
+    except TypeError as e:
+        msg = "cbor_from_object() for type @T failed."
+        raise ZTypeError(msg, ob=ob, T=type(ob)) from e
+    return None
+
+
+class CBORStreamWriter(IPCEStreamWriter):
+    def __init__(
+        self,
+        fp: BinaryIO,
+        ieso: IESO,
+        session: Optional[SchemaSession],
+        numpy_tags: bool = False,
+    ):
+        IPCEStreamWriter.__init__(self, ieso, session)
+        self.fp = fp
+        self.numpy_tags = numpy_tags
+        # used for the leaves and the (small) IPCE subtrees like schemas
+        self.encoder = cbor2.CBOREncoder(fp)
+
+    def write_header(self, major: int, n: int) -> None:
+        m = major << 5
+        if n < 24:
+            self.fp.write(struct.pack(">B", m | n))
+        elif n < 0x100:
+            self.fp.write(struct.pack(">BB", m | 24, n))
+        elif n < 0x10000:
+            self.fp.write(struct.pack(">BH", m | 25, n))
+        elif n < 0x100000000:
+            self.fp.write(struct.pack(">BL", m | 26, n))
+        else:
+            self.fp.write(struct.pack(">BQ", m | 27, n))
+
+    def write_ipce(self, x: IPCE) -> None:
+        self.encoder.encode(x)
+
+    def write_bytes(self, b: memoryview) -> None:
+        # written directly from the buffer, without copying
+        self.write_header(CBOR_MAJOR_BYTES, b.nbytes)
+        self.fp.write(b)
+
+    def write_numpy(self, x: np.ndarray) -> None:
+        from .numpy_encoding import (
+            cbor_tag_from_dtype,
+            CBOR_TAG_MULTI_DIM_ARRAY,
+            numpy_array_buffer,
+            use_compression,
+        )
+
+        tag = cbor_tag_from_dtype(x.dtype) if self.numpy_tags else None
+        compressed = use_compression(x, self.ieso.numpy_compression)
+        if tag is None or x.ndim == 0 or compressed:
+            IPCEStreamWriter.write_numpy(self, x)
+            return
+        # 40([dims, tag(data)])
+        self.write_header(CBOR_MAJOR_TAG, CBOR_TAG_MULTI_DIM_ARRAY)
+        self.write_header(CBOR_MAJOR_ARRAY, 2)
+        self.write_ipce(list(x.shape))
+        self.write_header(CBOR_MAJOR_TAG, tag)
+        self.write_bytes(numpy_array_buffer(x))
+
+    def write_ipce_shared(self, x: IPCE) -> None:
+        """ Writes the IPCE, using the value-sharing tags for the dicts and lists
+            that appear more than once (the others are written as usual). """
+        from .sharing import find_shared
+
+        shared = find_shared(x)
+        if not shared:
+            self.write_ipce(x)
+        else:
+            self.write_ipce_shared_(x, shared)
+
+    def write_ipce_shared_(self, x: IPCE, shared: Set[int]) -> None:
+        """ Walks the IPCE with an explicit stack, like find_shared(). """
+        # id -> index of the values written as shareable
+        indices: Dict[int, int] = {}
+        # the iterators over the values still to write, in each container;
+        # the keys of the dicts are written in the same way as the values
+        todo: List[Iterator[IPCE]] = [iter([x])]
+        while todo:
+            try:
+                y = next(todo[-1])
+            except StopIteration:
+                todo.pop()
+                continue
+            if id(y) in shared:
+                if id(y) in indices:
+                    self.write_header(CBOR_MAJOR_TAG, CBOR_TAG_SHAREDREF)
+                    self.write_ipce(indices[id(y)])
+                    continue
+                indices[id(y)] = len(indices)
+                self.write_header(CBOR_MAJOR_TAG, CBOR_TAG_SHAREABLE)
+            if isinstance(y, dict):
+                self.begin_map(len(y))
+                todo.append(itertools.chain.from_iterable(y.items()))
+            elif isinstance(y, list):
+                self.begin_array(len(y))
+                todo.append(iter(y))
+            else:
+                self.write_ipce(y)
+
+    def begin_array(self, n: int) -> None:
+        self.write_header(CBOR_MAJOR_ARRAY, n)
+
+    def begin_map(self, n: int) -> None:
+        self.write_header(CBOR_MAJOR_MAP, n)
+
+    def map_key(self, i: int, k: str) -> None:
+        self.encoder.encode(k)
@@ -1,8 +1,20 @@
 import datetime
-import traceback
-from dataclasses import dataclass, Field, fields, is_dataclass, MISSING
+from dataclasses import dataclass, is_dataclass
 from decimal import Decimal
-from typing import cast, Dict, Iterator, Optional, Set, TypeVar
+from types import GeneratorType
+from typing import (
+    Callable,
+    cast,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+)
 
 import numpy as np
 from frozendict import frozendict
@@ -13,22 +25,28 @@ from zuper_ipce.guesses import (
     get_set_type_suggestion,
     get_tuple_type_suggestion,
 )
-from zuper_ipce.types import is_unconstrained
-from zuper_typing.my_dict import make_dict
-
-X = TypeVar("X")
-from zuper_typing.annotations_tricks import (
-    get_Optional_arg,
-    get_Union_args,
-    is_Optional,
-    is_SpecialForm,
-    is_Union,
-)
+from zuper_typing.annotations_tricks import is_SpecialForm
 from zuper_typing.exceptions import ZNotImplementedError, ZTypeError, ZValueError
-from .constants import GlobalsDict, HINTS_ATT, SCHEMA_ATT, IESO, IPCE_PASS_THROUGH
+from .constants import GlobalsDict, IESO, IPCE_PASS_THROUGH, SCHEMA_ATT, SHARING_OFF
 from .conv_ipce_from_typelike import ipce_from_typelike, ipce_from_typelike_ndarray
-from .ipce_spec import assert_canonical_ipce, sorted_dict_cbor_ord
+from .exceptions import FailedAttempt
+from .ipce_spec import assert_canonical_ipce, should_validate, sorted_dict_cbor_ord
+from .schema_session import (
+    compress_schemas,
+    get_active_session,
+    schema_or_ref,
+    SchemaSession,
+    session_scope,
+)
+from .sharing import get_sharing_key, get_sharing_memo, sharing_scope
 from .structures import FakeValues
+from .trampoline import lazy_steps, run_trampoline, Steps
+from .type_descriptors import (
+    get_type_descriptor,
+    KIND_OPTIONAL,
+    KIND_UNCONSTRAINED,
+    KIND_UNION,
+)
 from .types import IPCE, TypeLike
 
 
@@ -38,227 +56,403 @@ def ipce_from_object(
     *,
     globals_: GlobalsDict = None,
     ieso: Optional[IESO] = None,
+    session: Optional[SchemaSession] = None,
     # with_schema: bool = True,
 ) -> IPCE:
+    """
+        If a session is given, the schemas already written in the session
+        are replaced by references (see SchemaSession).
+    """
     # logger.debug(f'ipce_from_object({ob})')
     if ieso is None:
         ieso = IESO(with_schema=True)
     if globals_ is None:
         globals_ = {}
+    st = suggest_type
+    g = lazy_steps(gen_ipce_from_object_, ob, st, globals_=globals_, ieso=ieso)
+    return ipce_from_object_finish(ob, g, ieso, session)
+
+
+def ipce_from_object_finish(
+    ob: object, g: Steps, ieso: IESO, session: Optional[SchemaSession]
+) -> IPCE:
+    """ Runs the steps for the object and does the final checks. """
     try:
-        res = ipce_from_object_(ob, suggest_type, globals_=globals_, ieso=ieso)
+        with sharing_scope(ieso), session_scope(session):
+            res = cast(IPCE, run_trampoline(g))
     except TypeError as e:
         msg = "ipce_from_object() for type @t failed."
         raise ZTypeError(msg, ob=ob, T=type(ob)) from e
 
-    assert_canonical_ipce(res)
+    if should_validate(ieso.validation):
+        assert_canonical_ipce(res)
     return res
 
 
+def ipce_from_objects(
+    obs: Iterable[object],
+    suggest_type: TypeLike = object,
+    *,
+    globals_: GlobalsDict = None,
+    ieso: Optional[IESO] = None,
+    session: Optional[SchemaSession] = None,
+    lazy: bool = False,
+) -> Union[List[IPCE], Iterator[IPCE]]:
+    """
+        Same as calling ipce_from_object() for each object, but the options
+        and the plan of the dataclass suggest_type are resolved only once.
+
+        If lazy is True, returns an iterator instead of a list.
+    """
+    if ieso is None:
+        ieso = IESO(with_schema=True)
+    if globals_ is None:
+        globals_ = {}
+
+    plan = None
+    if isinstance(suggest_type, type) and is_dataclass(suggest_type):
+        from .compile_ipce_from_object import get_ipce_from_object_plan
+
+        plan = get_ipce_from_object_plan(suggest_type, ieso)
+
+    def convert_all() -> Iterator[IPCE]:
+        for ob in obs:
+            if plan is not None and type(ob) is suggest_type:
+                g = plan.steps(ob, globals_)
+            else:
+                st = suggest_type
+                f = gen_ipce_from_object_
+                g = lazy_steps(f, ob, st, globals_=globals_, ieso=ieso)
+            yield ipce_from_object_finish(ob, g, ieso, session)
+
+    if lazy:
+        return convert_all()
+    else:
+        return list(convert_all())
+
+
 def ipce_from_object_(
     ob: object, st: TypeLike, *, globals_: GlobalsDict, ieso: IESO
 ) -> IPCE:
-    unconstrained = is_unconstrained(st)
-    if ob is None:
-        if unconstrained or (st is type(None)) or is_Optional(st):
-            return ob
-        else:
-            msg = f"ob is None but suggest_type is @suggest_type"
-            raise ZTypeError(msg, suggest_type=st)
+    with sharing_scope(ieso):
+        g = gen_ipce_from_object_(ob, st, globals_=globals_, ieso=ieso)
+        return cast(IPCE, run_trampoline(g))
 
-    if is_Optional(st):
-        assert ob is not None  # from before
-        T = get_Optional_arg(st)
-        return ipce_from_object_(ob, T, globals_=globals_, ieso=ieso)
 
-    if is_Union(st):
-        return ipce_from_object_union(ob, st, globals_=globals_, ieso=ieso)
+# Scalars that are their own IPCE, if the type suggestion is compatible
+SCALARS_AS_IS = (bool, int, str, float, bytes, Decimal)
 
-    if isinstance(ob, datetime.datetime):
-        if not ob.tzinfo:
-            msg = "Cannot serialize dates without a timezone."
-            raise ZValueError(msg, ob=ob)
 
-    trivial = (bool, int, str, float, bytes, Decimal, datetime.datetime)
-    if st in trivial:
-        if not isinstance(ob, st):
-            msg = "Expected this to be @suggest_type."
-            raise ZTypeError(msg, st=st, ob=ob, T=type(ob))
-        return ob
+def is_ipce_as_is(ob: object, st: TypeLike) -> bool:
+    """ Fast check for the common case of scalars (the IPCE is the object itself);
+        we can skip creating the steps for these. """
+    T = type(ob)
+    return (st is object or st is T) and T in SCALARS_AS_IS
 
-    if isinstance(ob, trivial):
-        return ob
 
-    if isinstance(ob, list):
-        return ipce_from_object_list(ob, st, globals_=globals_, ieso=ieso)
+def all_ipce_as_is(obs: Sequence[object], st: TypeLike) -> bool:
+    """ Same as is_ipce_as_is() for all the elements, so that the list can
+        be copied in one step. The types are collected in a single pass
+        (map and set run in C), which matters for the long lists of numbers. """
+    types = set(map(type, obs))
+    if st is object:
+        return types.issubset(SCALARS_AS_IS)
+    return st in SCALARS_AS_IS and types.issubset((st,))
 
-    if isinstance(ob, tuple):
-        return ipce_from_object_tuple(ob, st, globals_=globals_, ieso=ieso)
 
-    if isinstance(ob, slice):
-        return ipce_from_object_slice(ob, ieso=ieso)
+def gen_ipce_from_object_(
+    ob: object, st: TypeLike, *, globals_: GlobalsDict, ieso: IESO
+) -> Union[IPCE, Steps]:
+    """ The steps of ipce_from_object_(): the values inside containers
+        are converted by yielding their steps (see run_trampoline).
+        The handlers that do not need steps return the IPCE directly. """
+    if ieso.sharing != SHARING_OFF:
+        return gen_ipce_from_object_shared(ob, st, globals_, ieso)
+    h = get_ipce_from_object_handler(type(ob), st)
+    return h(ob, st, globals_=globals_, ieso=ieso)
+
+
+def gen_ipce_from_object_shared(
+    ob: object, st: TypeLike, globals_: GlobalsDict, ieso: IESO
+) -> Steps:
+    """ Same as gen_ipce_from_object_(), but returns the same IPCE for
+        the objects already converted (see sharing.py). """
+    memo = get_sharing_memo()
+    key = get_sharing_key(ob, st, ieso) if memo is not None else None
+    if key is not None and key in memo:
+        return memo[key][1]
+    h = get_ipce_from_object_handler(type(ob), st)
+    res = h(ob, st, globals_=globals_, ieso=ieso)
+    if isinstance(res, GeneratorType):
+        res = yield from res
+    if key is not None:
+        memo[key] = ob, res
+    return res
 
-    if isinstance(ob, set):
-        return ipce_from_object_set(ob, st, globals_=globals_, ieso=ieso)
 
-    if isinstance(ob, (dict, frozendict)):
-        return ipce_from_object_dict(ob, st, globals_=globals_, ieso=ieso)
+# A handler converts the object; it returns the IPCE, or the steps (a generator).
+IPCEFromObjectHandler = Callable[..., Union[IPCE, Steps]]
 
-    if isinstance(ob, type):
-        return ipce_from_typelike(ob, globals0=globals_, processing={}, ieso=ieso)
 
-    if is_SpecialForm(ob):
-        ob = cast(TypeLike, ob)
-        return ipce_from_typelike(ob, globals0=globals_, processing={}, ieso=ieso)
+class IPCEFromObjectHandlers:
+    # The handlers registered for the user types
+    registered: Dict[type, IPCEFromObjectHandler] = {}
+    # (type(ob), suggest_type) -> handler. The types are held strongly,
+    # so the cache is cleared when it reaches max_size.
+    cache: Dict[Tuple[type, TypeLike], IPCEFromObjectHandler] = {}
+    max_size = 10000
+
+
+def register_ipce_from_object(T: type, handler: IPCEFromObjectHandler) -> None:
+    """
+        Registers a function to convert the instances of T (and its subclasses)
+        to IPCE, called as ``handler(ob, suggest_type, globals_=..., ieso=...)``.
+
+        For example, to write UUIDs as strings::
+
+            register_ipce_from_object(UUID, lambda ob, st, **_: str(ob))
+
+        This is only for the conversion of the values; the schema of a field
+        of type T, and the conversion back, are not affected.
+    """
+    if T in SCALARS_AS_IS or T in CONTAINERS or T is type(None):
+        msg = "Cannot register a handler for the built-in type @T."
+        raise ZValueError(msg, T=T)
+    IPCEFromObjectHandlers.registered[T] = handler
+    IPCEFromObjectHandlers.cache.clear()
+
+
+def get_registered_handler(T: type) -> Optional[IPCEFromObjectHandler]:
+    """ The handler registered for T or for one of its bases. """
+    registered = IPCEFromObjectHandlers.registered
+    if registered:
+        for K in T.__mro__:
+            if K in registered:
+                return registered[K]
+    return None
+
+
+def get_ipce_from_object_handler(T: type, st: TypeLike) -> IPCEFromObjectHandler:
+    """ Returns the handler for an object of type T with the type suggestion st;
+        the decision depends only on these two, so it is cached. """
+    try:
+        return IPCEFromObjectHandlers.cache[(T, st)]
+    except KeyError:
+        pass
+    except TypeError:  # pragma: no cover
+        # not hashable
+        return compile_ipce_from_object_handler(T, st)
+    h = compile_ipce_from_object_handler(T, st)
+    if len(IPCEFromObjectHandlers.cache) >= IPCEFromObjectHandlers.max_size:
+        IPCEFromObjectHandlers.cache.clear()
+    IPCEFromObjectHandlers.cache[(T, st)] = h
+    return h
+
+
+TRIVIAL = (bool, int, str, float, bytes, Decimal, datetime.datetime)
+CONTAINERS = (list, tuple, slice, set, dict, frozendict)
+
+
+def compile_ipce_from_object_handler(T: type, st: TypeLike) -> IPCEFromObjectHandler:
+    kind = get_type_descriptor(st).kind
+    if T is type(None):
+        if kind in (KIND_UNCONSTRAINED, KIND_OPTIONAL) or (st is type(None)):
+            return ipce_as_is
+        return ipce_from_object_none_error
+
+    if kind == KIND_OPTIONAL:
+        return gen_ipce_from_object_optional
+
+    if kind == KIND_UNION:
+        return gen_ipce_from_object_union
+
+    registered = get_registered_handler(T)
+    if registered is not None:
+        return registered
+
+    if issubclass(T, datetime.datetime):
+        return ipce_from_object_datetime
+
+    if st in TRIVIAL:
+        return ipce_as_is if issubclass(T, st) else ipce_from_object_type_error
+
+    if issubclass(T, TRIVIAL):
+        return ipce_as_is
+
+    if issubclass(T, list):
+        return gen_ipce_from_object_list
+    if issubclass(T, tuple):
+        return gen_ipce_from_object_tuple
+    if issubclass(T, slice):
+        return ipce_from_object_slice
+    if issubclass(T, set):
+        return gen_ipce_from_object_set
+    if issubclass(T, (dict, frozendict)):
+        return gen_ipce_from_object_dict
+    if issubclass(T, type):
+        return ipce_from_object_typelike
+    if issubclass(T, np.ndarray):
+        return ipce_from_object_numpy
+    if is_dataclass(T):
+        return ipce_from_object_dataclass_steps
+    # This depends on the value.
+    return ipce_from_object_other
+
+
+def ipce_as_is(ob: object, st: TypeLike, **_) -> IPCE:
+    return ob
+
+
+def ipce_from_object_none_error(ob: object, st: TypeLike, **_) -> IPCE:
+    msg = f"ob is None but suggest_type is @suggest_type"
+    raise ZTypeError(msg, suggest_type=st)
+
+
+def ipce_from_object_type_error(ob: object, st: TypeLike, **_) -> IPCE:
+    msg = "Expected this to be @suggest_type."
+    raise ZTypeError(msg, st=st, ob=ob, T=type(ob))
 
-    if isinstance(ob, np.ndarray):
-        return ipce_from_object_numpy(ob, ieso=ieso)
 
-    assert not isinstance(ob, type), ob
-    if is_dataclass(ob):
-        return ipce_from_object_dataclass_instance(ob, globals_=globals_, ieso=ieso)
+def ipce_from_object_datetime(ob: datetime.datetime, st: TypeLike, **_) -> IPCE:
+    if not ob.tzinfo:
+        msg = "Cannot serialize dates without a timezone."
+        raise ZValueError(msg, ob=ob)
+    if st in TRIVIAL and not isinstance(ob, st):
+        return ipce_from_object_type_error(ob, st)
+    return ob
+
+
+def gen_ipce_from_object_optional(
+    ob: object, st: TypeLike, *, globals_: GlobalsDict, ieso: IESO
+) -> Steps:
+    (T,) = get_type_descriptor(st).args
+    return (yield gen_ipce_from_object_(ob, T, globals_=globals_, ieso=ieso))
+
+
+def ipce_from_object_typelike(
+    ob: object, st: TypeLike, *, globals_: GlobalsDict, ieso: IESO
+) -> IPCE:
+    ob = cast(TypeLike, ob)
+    return ipce_from_typelike(ob, globals0=globals_, processing={}, ieso=ieso)
+
+
+def ipce_from_object_other(
+    ob: object, st: TypeLike, *, globals_: GlobalsDict, ieso: IESO
+) -> IPCE:
+    if is_SpecialForm(ob):
+        return ipce_from_object_typelike(ob, st, globals_=globals_, ieso=ieso)
 
     msg = "I do not know a way to convert object @ob of type @T."
     raise ZNotImplementedError(msg, ob=ob, T=type(ob))
 
 
-def ipce_from_object_numpy(ob, *, ieso: IESO) -> IPCE:
+def ipce_from_object_numpy(ob, st: TypeLike = object, *, ieso: IESO, **_) -> IPCE:
     from .numpy_encoding import ipce_from_numpy_array
 
-    res = ipce_from_numpy_array(ob)
+    res = ipce_from_numpy_array(ob, ieso.numpy_compression)
     if ieso.with_schema:
-        res[SCHEMA_ATT] = ipce_from_typelike_ndarray().schema
+        res[SCHEMA_ATT] = schema_or_ref(ipce_from_typelike_ndarray().schema)
+        # "$schema" goes before the keys of the compressed form
+        res = sorted_dict_cbor_ord(res)
     return res
 
 
-def ipce_from_object_slice(ob, *, ieso: IESO):
+def ipce_from_object_slice(ob, st: TypeLike = object, *, ieso: IESO, **_):
     from .conv_ipce_from_typelike import ipce_from_typelike_slice
 
     res = {"start": ob.start, "step": ob.step, "stop": ob.stop}
     if ieso.with_schema:
-        res[SCHEMA_ATT] = ipce_from_typelike_slice(ieso=ieso).schema
+        res[SCHEMA_ATT] = schema_or_ref(ipce_from_typelike_slice(ieso=ieso).schema)
     res = sorted_dict_cbor_ord(res)
     return res
 
 
-def ipce_from_object_union(ob: object, st: TypeLike, *, globals_, ieso: IESO) -> IPCE:
-    ts = get_Union_args(st)
+def gen_ipce_from_object_union(
+    ob: object, st: TypeLike, *, globals_: GlobalsDict, ieso: IESO
+) -> Steps:
+    from .compile_union import get_union_plan
+
+    # only the members that do not fail trivially
+    ts = get_union_plan(st).candidates_for_object(ob)
     errors = []
+    # The attempts that fail must not register their schemas in the session.
+    session = get_active_session()
     for Ti in ts:
         try:
-            return ipce_from_object(ob, Ti, globals_=globals_, ieso=ieso)
+            with session_scope(None):
+                res = yield gen_ipce_from_object_(ob, Ti, globals_=globals_, ieso=ieso)
+            if session is not None:
+                res = compress_schemas(res, session)
+            return res
         except IPCE_PASS_THROUGH:
             raise
-        except BaseException:
-            errors.append((Ti, traceback.format_exc()))
+        except BaseException as e:
+            errors.append(FailedAttempt(Ti, e))
 
     msg = "Cannot save union."
-    raise ZTypeError(msg, suggest_type=st, value=ob, errors=errors)
+    raise ZTypeError(msg, suggest_type=st, value=ob, tried=ts, errors=errors)
 
 
-def ipce_from_object_list(ob, st: TypeLike, *, globals_: dict, ieso: IESO) -> IPCE:
+def gen_ipce_from_object_list(
+    ob: list, st: TypeLike, *, globals_: dict, ieso: IESO
+) -> Steps:
     assert st is not None
 
     V = get_list_type_suggestion(ob, st)
+    if ieso.columnar:
+        from .columnar import gen_ipce_columns, get_columnar_type
 
-    def rec(x: X) -> X:
-        return ipce_from_object(x, V, globals_=globals_, ieso=ieso)
+        T = get_columnar_type(ob, V, ieso)
+        if T is not None:
+            return (yield from gen_ipce_columns(ob, T, globals_=globals_, ieso=ieso))
 
-    return [rec(_) for _ in ob]
+    if ieso.pack_numeric_lists is not None:
+        from .columnar import get_packed_list, ipce_from_packed_list
 
+        x = get_packed_list(ob, V, ieso)
+        if x is not None:
+            return ipce_from_packed_list(x, V, globals_=globals_, ieso=ieso)
 
-def ipce_from_object_tuple(ob: tuple, st: TypeLike, *, globals_, ieso: IESO) -> IPCE:
-    ts = get_tuple_type_suggestion(ob, st)
+    if all_ipce_as_is(ob, V):
+        return list(ob)
 
     res = []
-    for _, T in zip(ob, ts):
-        x = ipce_from_object(_, T, globals_=globals_, ieso=ieso)
-        res.append(x)
-
+    for x in ob:
+        if is_ipce_as_is(x, V):
+            res.append(x)
+        else:
+            x = yield gen_ipce_from_object_(x, V, globals_=globals_, ieso=ieso)
+            res.append(x)
     return res
 
 
-@dataclass
-class IterAtt:
-    attr: str
-    T: TypeLike
-    value: object
-
-
-def same_as_default(f: Field, value: object) -> bool:
-    if f.default != MISSING:
-        return f.default == value
-    elif f.default_factory != MISSING:
-        default = f.default_factory()
-        return default == value
-    else:
-        return False
-
-
-def iterate_resolved_type_values_without_default(x: dataclass) -> Iterator[IterAtt]:
-    for f in fields(type(x)):
-        k = f.name
-        v0 = getattr(x, k)
-
-        if same_as_default(f, v0):
-            continue
-        k_st = f.type
-
-        yield IterAtt(k, k_st, v0)
+def gen_ipce_from_object_tuple(
+    ob: tuple, st: TypeLike, *, globals_, ieso: IESO
+) -> Steps:
+    ts = get_tuple_type_suggestion(ob, st)
 
+    res = []
+    for _, T in zip(ob, ts):
+        if is_ipce_as_is(_, T):
+            x = _
+        else:
+            x = yield gen_ipce_from_object_(_, T, globals_=globals_, ieso=ieso)
+        res.append(x)
 
-def get_fields_values(x: dataclass) -> Dict[str, object]:
-    res = {}
-    for f in fields(type(x)):
-        k = f.name
-        v0 = getattr(x, k)
-        res[k] = v0
     return res
 
 
-def ipce_from_object_dataclass_instance(ob: dataclass, *, globals_, ieso: IESO) -> IPCE:
-    globals_ = dict(globals_)
-    res = {}
-    T = type(ob)
-    from .conv_ipce_from_typelike import ipce_from_typelike
-
-    if ieso.with_schema:
-        res[SCHEMA_ATT] = ipce_from_typelike(T, globals0=globals_, ieso=ieso)
-
-    globals_[T.__name__] = T
-    H = make_dict(str, type)
-    hints = H()
-
-    for ia in iterate_resolved_type_values_without_default(ob):
-        k = ia.attr
-        v = ia.value
-        T = ia.T
-        try:
-
-            res[k] = ipce_from_object(v, T, globals_=globals_, ieso=ieso)
+def ipce_from_object_dataclass_steps(
+    ob: dataclass, st: TypeLike, *, globals_: GlobalsDict, ieso: IESO
+) -> Steps:
+    from .compile_ipce_from_object import get_ipce_from_object_plan
 
-            needs_schema = isinstance(v, (list, tuple))
-            if ieso.with_schema and needs_schema and is_unconstrained(T):
-                # hints[k] = ipce_from_typelike(type(v), globals0=globals_, ieso=ieso)
-                hints[k] = type(v)
+    return get_ipce_from_object_plan(type(ob), ieso).steps(ob, globals_)
 
-        except IPCE_PASS_THROUGH:
-            raise
-        except BaseException as e:
-            msg = (
-                f"Could not serialize an object. Problem "
-                f"occurred with the attribute {k!r}. It is supposed to be of type @expected "
-                f" but found @found."
-            )
-            raise ZValueError(msg, expected=T, found=type(ob)) from e
-    if hints:
-        res[HINTS_ATT] = ipce_from_object(hints, ieso=ieso)
-    res = sorted_dict_cbor_ord(res)
 
-    return res
-
-
-def ipce_from_object_dict(ob: dict, st: TypeLike, *, globals_: GlobalsDict, ieso: IESO):
+def gen_ipce_from_object_dict(
+    ob: dict, st: TypeLike, *, globals_: GlobalsDict, ieso: IESO
+) -> Steps:
     K, V = get_dict_type_suggestion(ob, st)
     DT = Dict[K, V]
     res = {}
@@ -266,14 +460,16 @@ def ipce_from_object_dict(ob: dict, st: TypeLike, *, globals_: GlobalsDict, ieso
     from .conv_ipce_from_typelike import ipce_from_typelike
 
     if ieso.with_schema:
-        res[SCHEMA_ATT] = ipce_from_typelike(DT, globals0=globals_, ieso=ieso)
+        DT_schema = ipce_from_typelike(DT, globals0=globals_, ieso=ieso)
+        res[SCHEMA_ATT] = schema_or_ref(DT_schema)
 
-    if isinstance(K, type) and issubclass(K, str):
+    if isinstance(K, type) and (issubclass(K, str) or issubclass(K, int)):
         for k, v in ob.items():
-            res[k] = ipce_from_object(v, V, globals_=globals_, ieso=ieso)
-    elif isinstance(K, type) and issubclass(K, int):
-        for k, v in ob.items():
-            res[str(k)] = ipce_from_object(v, V, globals_=globals_, ieso=ieso)
+            if is_ipce_as_is(v, V):
+                vj = v
+            else:
+                vj = yield gen_ipce_from_object_(v, V, globals_=globals_, ieso=ieso)
+            res[k if issubclass(K, str) else str(k)] = vj
     else:
         FV = FakeValues[K, V]
 
@@ -283,12 +479,16 @@ def ipce_from_object_dict(ob: dict, st: TypeLike, *, globals_: GlobalsDict, ieso
             #
             h = get_key_for_set_entry(i, len(ob))
             fv = FV(k, v)
-            res[h] = ipce_from_object(fv, globals_=globals_, ieso=ieso)
+            res[h] = yield gen_ipce_from_object_(
+                fv, object, globals_=globals_, ieso=ieso
+            )
     res = sorted_dict_cbor_ord(res)
     return res
 
 
-def ipce_from_object_set(ob: set, st: TypeLike, *, globals_: GlobalsDict, ieso: IESO):
+def gen_ipce_from_object_set(
+    ob: set, st: TypeLike, *, globals_: GlobalsDict, ieso: IESO
+) -> Steps:
     from .conv_ipce_from_typelike import ipce_from_typelike
 
     V = get_set_type_suggestion(ob, st)
@@ -296,11 +496,15 @@ def ipce_from_object_set(ob: set, st: TypeLike, *, globals_: GlobalsDict, ieso:
 
     res = {}
     if ieso.with_schema:
-        res[SCHEMA_ATT] = ipce_from_typelike(ST, globals0=globals_, ieso=ieso)
+        ST_schema = ipce_from_typelike(ST, globals0=globals_, ieso=ieso)
+        res[SCHEMA_ATT] = schema_or_ref(ST_schema)
 
     for i, v in enumerate(ob):
         h = get_key_for_set_entry(i, len(ob))
-        vj = ipce_from_object(v, V, globals_=globals_, ieso=ieso)
+        if is_ipce_as_is(v, V):
+            vj = v
+        else:
+            vj = yield gen_ipce_from_object_(v, V, globals_=globals_, ieso=ieso)
         # h = "set:" + get_sha256_base58(cbor2.dumps(vj)).decode("ascii")
 
         res[h] = vj
@@ -61,7 +61,7 @@ from zuper_typing.my_dict import (
     is_ListLike,
     is_SetLike,
 )
-from zuper_typing.my_intersection import get_Intersection_args, is_Intersection
+from zuper_typing.my_intersection import get_Intersection_args
 from zuper_typing.recursive_tricks import get_name_without_brackets
 from .constants import (
     ALL_OF,
@@ -107,14 +107,29 @@ from .constants import (
     X_ORDER,
     X_PYTHON_MODULE_ATT,
 )
-from .ipce_spec import assert_canonical_ipce, sorted_dict_cbor_ord
+from .ipce_spec import assert_canonical_ipce, should_validate, sorted_dict_cbor_ord
+from .persistent_schema_cache import (
+    get_persistent_schema,
+    is_persistent_schema_cache_enabled,
+    set_persistent_schema,
+)
 from .schema_caching import (
     get_ipce_from_typelike_cache,
     set_ipce_from_typelike_cache,
     TRE,
+    validate_schema,
 )
 from .schema_utils import make_ref, make_url
 from .structures import FakeValues
+from .type_descriptors import (
+    get_type_descriptor,
+    KIND_DICT,
+    KIND_INTERSECTION,
+    KIND_LIST,
+    KIND_OPTIONAL,
+    KIND_SET,
+    KIND_UNION,
+)
 
 
 def ipce_from_typelike(
@@ -133,7 +148,8 @@ def ipce_from_typelike(
     c = IFTContext(globals0, processing, ())
     tr = ipce_from_typelike_tr(T, c, ieso=ieso)
     schema = tr.schema
-    assert_canonical_ipce(schema)
+    if should_validate(ieso.validation):
+        assert_canonical_ipce(schema)
     return schema
 
 
@@ -157,6 +173,16 @@ def ipce_from_typelike_tr(T: TypeLike, c: IFTContext, ieso: IESO) -> TRE:
             except KeyError:
                 pass
 
+            if is_persistent_schema_cache_enabled() and is_dataclass(T):
+                try:
+                    schema = get_persistent_schema(T)
+                except KeyError:
+                    pass
+                else:
+                    validate_schema(schema, ieso.validation)
+                    set_ipce_from_typelike_cache(T, {}, schema)
+                    return TRE(schema)
+
     try:
 
         if T is type:
@@ -195,10 +221,14 @@ def ipce_from_typelike_tr(T: TypeLike, c: IFTContext, ieso: IESO) -> TRE:
                 c = dataclasses.replace(c, globals_=globals2)
 
         tr: TRE = ipce_from_typelike_tr_(T, c=c, ieso=ieso)
+        validate_schema(tr.schema, ieso.validation)
 
         if ieso.use_ipce_from_typelike_cache:
             set_ipce_from_typelike_cache(T, tr.used, tr.schema)
 
+            if is_persistent_schema_cache_enabled() and is_dataclass(T) and not tr.used:
+                set_persistent_schema(T, tr.schema)
+
         return tr
     except IPCE_PASS_THROUGH:  # pragma: no cover
         raise
@@ -442,21 +472,23 @@ def ipce_from_typelike_tr_(T: TypeLike, c: IFTContext, ieso: IESO) -> TRE:
         res = sorted_dict_cbor_ord(res)
         return TRE(res)
 
-    if is_Union(T):
+    d = get_type_descriptor(T)
+    kind = d.kind
+    if kind == KIND_UNION:
         return ipce_from_typelike_Union(T, c=c, ieso=ieso)
 
-    if is_Optional(T):
+    if kind == KIND_OPTIONAL:
         return ipce_from_typelike_Optional(T, c=c, ieso=ieso)
 
-    if is_DictLike(T):
+    if kind == KIND_DICT:
         T = cast(Type[Dict], T)
         return ipce_from_typelike_DictLike(T, c=c, ieso=ieso)
 
-    if is_SetLike(T):
+    if kind == KIND_SET:
         T = cast(Type[Set], T)
         return ipce_from_typelike_SetLike(T, c=c, ieso=ieso)
 
-    if is_Intersection(T):
+    if kind == KIND_INTERSECTION:
         return ipce_from_typelike_Intersection(T, c=c, ieso=ieso)
 
     if is_Callable(T):
@@ -473,11 +505,11 @@ def ipce_from_typelike_tr_(T: TypeLike, c: IFTContext, ieso: IESO) -> TRE:
         T = List[V]
         return ipce_from_typelike_ListLike(T, c=c, ieso=ieso)
 
-    if is_ListLike(T):
+    if kind == KIND_LIST:
         T = cast(Type[List], T)
         return ipce_from_typelike_ListLike(T, c=c, ieso=ieso)
 
-    if is_TupleLike(T):
+    if d.is_tuple:
         # noinspection PyTypeChecker
         return ipce_from_typelike_TupleLike(T, c=c, ieso=ieso)
 
@@ -0,0 +1,118 @@
+import io
+import json
+from json.encoder import encode_basestring_ascii
+from typing import Callable, Dict, Optional, TextIO
+
+from zuper_typing.exceptions import ZTypeError
+from .constants import GlobalsDict, IESO
+from .ipce_stream_writer import IPCEStreamWriter
+from .json_utils import encode_bytes_before_json_serialization
+from .schema_session import SchemaSession
+from .types import IPCE, TypeLike
+
+__all__ = ["json_from_object"]
+
+INFINITY = float("inf")
+
+
+def json_from_float(x: float) -> str:
+    """ Same as json.dumps(x). """
+    if x != x:
+        return "NaN"
+    if x == INFINITY:
+        return "Infinity"
+    if x == -INFINITY:
+        return "-Infinity"
+    return float.__repr__(x)
+
+
+# The leaves written directly, with the same output as json.dumps()
+JSON_LEAVES: Dict[type, Callable[[object], str]] = {
+    str: encode_basestring_ascii,
+    int: int.__repr__,
+    float: json_from_float,
+    bool: lambda x: "true" if x else "false",
+    type(None): lambda x: "null",
+}
+# The scalars that json.dumps() writes without transforming them first
+JSON_NATIVE = frozenset(JSON_LEAVES)
+
+
+def json_from_object(
+    ob: object,
+    fp: Optional[TextIO] = None,
+    suggest_type: TypeLike = object,
+    *,
+    globals_: GlobalsDict = None,
+    ieso: Optional[IESO] = None,
+    session: Optional[SchemaSession] = None,
+) -> Optional[str]:
+    """
+        Writes the JSON encoding of the object to the text stream fp,
+        walking the object directly instead of creating the IPCE first.
+
+        The output is identical to
+        ``json.dumps(encode_bytes_before_json_serialization(ipce_from_object(ob)))``.
+        If fp is None, the string is returned.
+
+        If a session is given, the schemas already written in the session
+        are replaced by references (see SchemaSession).
+
+        If an error occurs, part of the output might have been already written.
+    """
+    if ieso is None:
+        ieso = IESO(with_schema=True)
+    if globals_ is None:
+        globals_ = {}
+    if fp is None:
+        buf = io.StringIO()
+        json_from_object(
+            ob, buf, suggest_type, globals_=globals_, ieso=ieso, session=session
+        )
+        return buf.getvalue()
+
+    w = JSONStreamWriter(fp, ieso, session)
+    try:
+        w.write(ob, suggest_type, globals_)
+    except TypeError as e:
+        msg = "json_from_object() for type @T failed."
+        raise ZTypeError(msg, ob=ob, T=type(ob)) from e
+    return None
+
+
+class JSONStreamWriter(IPCEStreamWriter):
+    def __init__(self, fp: TextIO, ieso: IESO, session: Optional[SchemaSession]):
+        IPCEStreamWriter.__init__(self, ieso, session)
+        self.fp = fp
+
+    def write_ipce(self, x: IPCE) -> None:
+        f = JSON_LEAVES.get(type(x), None)
+        if f is not None:
+            self.fp.write(f(x))
+        elif type(x) is list and JSON_NATIVE.issuperset(map(type, x)):
+            # e.g. the lists of numbers, in one call
+            self.fp.write(json.dumps(x))
+        else:
+            self.fp.write(json.dumps(encode_bytes_before_json_serialization(x)))
+
+    def begin_array(self, n: int) -> None:
+        self.fp.write("[")
+
+    def array_item(self, i: int) -> None:
+        if i > 0:
+            self.fp.write(", ")
+
+    def end_array(self) -> None:
+        self.fp.write("]")
+
+    def begin_map(self, n: int) -> None:
+        self.fp.write("{")
+
+    def map_key(self, i: int, k: str) -> None:
+        if i > 0:
+            self.fp.write(", ")
+        self.fp.write(encode_basestring_ascii(k))
+        self.fp.write(": ")
+
+    def end_map(self) -> None:
+        self.fp.write("}")
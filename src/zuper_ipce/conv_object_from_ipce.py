@@ -1,46 +1,34 @@
 import datetime
-import inspect
-import traceback
-from dataclasses import Field, fields, is_dataclass, MISSING, replace
+import os
+from dataclasses import is_dataclass
 from decimal import Decimal
-from typing import cast, Dict, Optional, Set, Type, TypeVar
+from typing import (
+    cast,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Type,
+    TypeVar,
+    Union,
+)
 
 import numpy as np
 import yaml
 
 from zuper_commons.fs import write_ustring_to_utf8_file
 from zuper_ipce.constants import IPCE_PASS_THROUGH, REF_ATT
-from zuper_ipce.conv_typelike_from_ipce import typelike_from_ipce_sr
-from zuper_ipce.exceptions import ZDeserializationErrorSchema
+from zuper_ipce.exceptions import FailedAttempt, ZDeserializationErrorSchema
 from zuper_ipce.types import is_unconstrained
-from zuper_typing.annotations_tricks import (
-    get_FixedTuple_args,
-    get_Optional_arg,
-    get_Union_args,
-    get_VarTuple_arg,
-    is_ClassVar,
-    is_FixedTuple,
-    is_Optional,
-    is_TupleLike,
-    is_TypeVar,
-    is_Union,
-    is_VarTuple,
-)
+from zuper_typing.annotations_tricks import get_Union_args, is_TypeVar
 from zuper_typing.exceptions import ZTypeError, ZValueError
-from zuper_typing.my_dict import (
-    get_DictLike_args,
-    get_ListLike_arg,
-    get_SetLike_arg,
-    is_DictLike,
-    is_ListLike,
-    is_SetLike,
-    make_dict,
-    make_list,
-    make_set,
-)
-from zuper_typing.my_intersection import get_Intersection_args, is_Intersection
+from zuper_typing.my_dict import make_dict, make_list, make_set
+from zuper_typing.my_intersection import get_Intersection_args
 from .constants import (
-    HINTS_ATT,
+    COLUMNS_ATT,
     IEDO,
     IEDS,
     JSC_TITLE,
@@ -50,56 +38,189 @@ from .constants import (
     SCHEMA_ID,
 )
 from .numpy_encoding import numpy_array_from_ipce
+from .type_descriptors import (
+    get_type_descriptor,
+    KIND_DICT,
+    KIND_FIXED_TUPLE,
+    KIND_INTERSECTION,
+    KIND_LIST,
+    KIND_OPTIONAL,
+    KIND_SET,
+    KIND_UNCONSTRAINED,
+    KIND_UNION,
+    KIND_VAR_TUPLE,
+)
+from .schema_session import expand_schemas, SchemaSession
 from .structures import FakeValues
+from .trampoline import lazy_steps, run_trampoline, Steps
 from .types import IPCE, TypeLike
 
 
 def object_from_ipce(
-    mj: IPCE, expect_type: TypeLike = object, *, iedo: Optional[IEDO] = None
+    mj: IPCE,
+    expect_type: TypeLike = object,
+    *,
+    iedo: Optional[IEDO] = None,
+    session: Optional[SchemaSession] = None,
 ) -> object:
+    """
+        If a session is given, the schema references are resolved using
+        the schemas found earlier in the session (see SchemaSession).
+    """
     assert expect_type is not None
+    if session is not None:
+        mj = expand_schemas(mj, session)
     if iedo is None:
         iedo = IEDO(use_remembered_classes=False, remember_deserialized_classes=False)
     ieds = IEDS({}, {})
+    g = lazy_steps(gen_object_from_ipce_, mj, expect_type, ieds=ieds, iedo=iedo)
+    return object_from_ipce_finish(mj, g, expect_type)
+
 
+def object_from_ipce_finish(mj: IPCE, g: Steps, expect_type: TypeLike) -> object:
+    """ Runs the steps for the IPCE, adding the context in case of errors. """
     try:
-        res = object_from_ipce_(mj, expect_type, ieds=ieds, iedo=iedo)
+        res = run_trampoline(g)
         return res
     except IPCE_PASS_THROUGH:
         raise
     except ZValueError as e:
         msg = f"Cannot deserialize object"
-        if isinstance(mj, dict) and "$schema" in mj:
-            schema = mj["$schema"]
-        else:
-            schema = None
-
-        prefix = f"object_{id(mj)}"
-        fn = write_out_yaml(prefix + "_data", mj)
-        msg += f"\n object data in {fn}"
-        if schema:
-            fn = write_out_yaml(prefix + "_schema", schema)
-            msg += f"\n object schema in {fn}"
+        if ErrorDumps.dirname is not None:
+            msg += write_out_error_dumps(mj)
 
         raise ZValueError(msg, expect_type=expect_type) from e
 
 
+def is_untyped_dict(mj: IPCE) -> bool:
+    """ True if mj is a dict whose type is the one expected
+        (no schema, and it is not itself a type). """
+    return (
+        isinstance(mj, dict)
+        and SCHEMA_ATT not in mj
+        and REF_ATT not in mj
+        and mj.get(JSC_TITLE, None) != JSC_TITLE_TYPE
+    )
+
+
+def objects_from_ipces(
+    ipces: Iterable[IPCE],
+    expect_type: TypeLike = object,
+    *,
+    iedo: Optional[IEDO] = None,
+    session: Optional[SchemaSession] = None,
+    lazy: bool = False,
+    classes: Sequence[type] = (),
+) -> Union[List[object], Iterator[object]]:
+    """
+        Same as calling object_from_ipce() for each IPCE, but the options
+        and the plan of the dataclass expect_type are resolved only once.
+
+        If lazy is True, returns an iterator instead of a list.
+
+        The dataclasses in ``classes`` are used, instead of creating new ones,
+        for the schemas with the same module and qualified name.
+    """
+    assert expect_type is not None
+    if iedo is None:
+        iedo = IEDO(use_remembered_classes=False, remember_deserialized_classes=False)
+
+    plan = None
+    if isinstance(expect_type, type) and is_dataclass(expect_type):
+        from .compile_object_from_ipce import get_object_from_ipce_plan
+
+        plan = get_object_from_ipce_plan(expect_type)
+
+    klasses = {(K.__module__, K.__qualname__): K for K in classes}
+
+    def convert_all() -> Iterator[object]:
+        for mj in ipces:
+            if session is not None:
+                mj = expand_schemas(mj, session)
+            ieds = IEDS({}, {}, dict(klasses)) if klasses else IEDS({}, {})
+            if plan is not None and is_untyped_dict(mj):
+                g = plan(mj, ieds, iedo)
+            else:
+                f = gen_object_from_ipce_
+                g = lazy_steps(f, mj, expect_type, ieds=ieds, iedo=iedo)
+            yield object_from_ipce_finish(mj, g, expect_type)
+
+    if lazy:
+        return convert_all()
+    else:
+        return list(convert_all())
+
+
 _X = TypeVar("_X")
 
 
 def object_from_ipce_(mj: IPCE, st: Type[_X] = object, *, ieds: IEDS, iedo: IEDO) -> _X:
-    # ztinfo('object_from_ipce_', mj=mj, st=st)
-    # if mj == {'ob': []}:
-    #     raise ZException(mj=mj, st=st)
+    g = gen_object_from_ipce_(mj, st, ieds=ieds, iedo=iedo)
+    return cast(_X, run_trampoline(g))
+
 
-    if is_Optional(st):
-        return object_from_ipce_optional(mj, st, ieds=ieds, iedo=iedo)
+# IPCE scalars that are their own object, if the expected type is compatible
+SCALARS_AS_IS = (int, float, bool, bytes, str)
 
-    if is_Union(st):
-        return object_from_ipce_union(mj, st, ieds=ieds, iedo=iedo)
 
-    if is_Intersection(st):
-        return object_from_ipce_intersection(mj, st, ieds=ieds, iedo=iedo)
+def is_object_as_is(mj: IPCE, st: TypeLike) -> bool:
+    """ Fast check for the common case of scalars (the object is the IPCE itself);
+        we can skip creating the steps for these. """
+    T = type(mj)
+    return (st is object or st is T) and T in SCALARS_AS_IS
+
+
+def all_objects_as_is(mjs: List[IPCE], st: TypeLike) -> bool:
+    """ Same as is_object_as_is() for all the elements, in a single pass;
+        see all_ipce_as_is(). """
+    types = set(map(type, mjs))
+    if st is object:
+        return types.issubset(SCALARS_AS_IS)
+    return st in SCALARS_AS_IS and types.issubset((st,))
+
+
+def gen_object_from_ipce_(
+    mj: IPCE, st: TypeLike, *, ieds: IEDS, iedo: IEDO
+) -> Union[object, Steps]:
+    """ The steps of object_from_ipce_(): the values inside containers
+        are converted by yielding their steps (see run_trampoline).
+        The leaves are converted directly, without creating the steps. """
+    if iedo.share_objects and isinstance(mj, (dict, list)):
+        return gen_object_from_ipce_shared(mj, st, ieds=ieds, iedo=iedo)
+    return gen_object_from_ipce_value(mj, st, ieds=ieds, iedo=iedo)
+
+
+def gen_object_from_ipce_shared(
+    mj: IPCE, st: TypeLike, *, ieds: IEDS, iedo: IEDO
+) -> Steps:
+    """ Converts each IPCE subtree (by identity) only once, so that the
+        repeated subtrees become the same object (see IEDO.share_objects). """
+    key = (id(mj), st)
+    try:
+        return ieds.shared[key][1]
+    except KeyError:
+        pass
+    except TypeError:  # pragma: no cover
+        # not hashable
+        return (yield gen_object_from_ipce_value(mj, st, ieds=ieds, iedo=iedo))
+    res = yield gen_object_from_ipce_value(mj, st, ieds=ieds, iedo=iedo)
+    # the IPCE is kept so that its id is not reused
+    ieds.shared[key] = mj, res
+    return res
+
+
+def gen_object_from_ipce_value(
+    mj: IPCE, st: TypeLike, *, ieds: IEDS, iedo: IEDO
+) -> Union[object, Steps]:
+    kind = get_type_descriptor(st).kind
+    if kind == KIND_OPTIONAL:
+        return gen_object_from_ipce_optional(mj, st, ieds=ieds, iedo=iedo)
+
+    if kind == KIND_UNION:
+        return gen_object_from_ipce_union(mj, st, ieds=ieds, iedo=iedo)
+
+    if kind == KIND_INTERSECTION:
+        return gen_object_from_ipce_intersection(mj, st, ieds=ieds, iedo=iedo)
 
     trivial = (int, float, bool, bytes, str, datetime.datetime, Decimal)
 
@@ -118,7 +239,18 @@ def object_from_ipce_(mj: IPCE, st: Type[_X] = object, *, ieds: IEDS, iedo: IEDO
         return mj
 
     if isinstance(mj, list):
-        return object_from_ipce_list(mj, st, ieds=ieds, iedo=iedo)
+        return gen_object_from_ipce_list(mj, st, ieds=ieds, iedo=iedo)
+
+    if isinstance(mj, np.ndarray):
+        # already decoded, from the CBOR typed-array tags
+        if get_type_descriptor(st).kind == KIND_LIST:
+            from .columnar import list_from_packed_ipce
+
+            return list_from_packed_ipce(mj, st)
+        if not (is_unconstrained(st) or st is np.ndarray):
+            msg = "Found a numpy array, but wanted @st."
+            raise ZValueError(msg, st=st)
+        return mj
 
     if mj is None:
         if st is type(None):
@@ -152,20 +284,31 @@ def object_from_ipce_(mj: IPCE, st: Type[_X] = object, *, ieds: IEDS, iedo: IEDO
 
         K = st
 
+    if COLUMNS_ATT in mj:
+        from .columnar import gen_list_from_ipce_columns
+
+        return gen_list_from_ipce_columns(mj, K, ieds=ieds, iedo=iedo)
+
     if K is np.ndarray:
-        return numpy_array_from_ipce(mj)
+        return numpy_array_from_ipce(mj, writable=iedo.numpy_writable)
+
+    kind = get_type_descriptor(K).kind
+    if kind == KIND_LIST:
+        # a list of numbers packed as an array (IESO.pack_numeric_lists)
+        from .columnar import list_from_packed_ipce
+
+        return list_from_packed_ipce(mj, K)
 
-    if is_DictLike(K):
+    if kind == KIND_DICT:
         K = cast(Type[Dict], K)
-        return object_from_ipce_dict(mj, K, ieds=ieds, iedo=iedo)
+        return gen_object_from_ipce_dict(mj, K, ieds=ieds, iedo=iedo)
 
-    if is_SetLike(K):
+    if kind == KIND_SET:
         K = cast(Type[Set], K)
-        res = object_from_ipce_SetLike(mj, K, ieds=ieds, iedo=iedo)
-        return res
+        return gen_object_from_ipce_SetLike(mj, K, ieds=ieds, iedo=iedo)
 
     if is_dataclass(K):
-        return object_from_ipce_dataclass_instance(mj, K, ieds=ieds, iedo=iedo)
+        return gen_object_from_ipce_dataclass_instance(mj, K, ieds=ieds, iedo=iedo)
 
     if K is slice:
         return object_from_ipce_slice(mj)
@@ -173,8 +316,7 @@ def object_from_ipce_(mj: IPCE, st: Type[_X] = object, *, ieds: IEDS, iedo: IEDO
     if is_unconstrained(K):
         if looks_like_set(mj):
             st = Set[object]
-            res = object_from_ipce_SetLike(mj, st, ieds=ieds, iedo=iedo)
-            return res
+            return gen_object_from_ipce_SetLike(mj, st, ieds=ieds, iedo=iedo)
         else:
             msg = "No schema found and very ambiguous."
             raise ZDeserializationErrorSchema(msg=msg, mj=mj, ieds=ieds)
@@ -198,23 +340,23 @@ def object_from_ipce_slice(mj) -> slice:
     return slice(start, stop, step)
 
 
-def object_from_ipce_list(mj: IPCE, expect_type, *, ieds: IEDS, iedo: IEDO) -> IPCE:
-    def rec(x, TT: TypeLike) -> object:
-        return object_from_ipce_(x, TT, ieds=ieds, iedo=iedo)
-
+def gen_object_from_ipce_list(
+    mj: IPCE, expect_type, *, ieds: IEDS, iedo: IEDO
+) -> Steps:
     # logger.info(f'expect_type for list is {expect_type}')
-    from zuper_ipce.conv_ipce_from_object import is_unconstrained
-
-    if is_unconstrained(expect_type):
+    d = get_type_descriptor(expect_type)
+    if d.kind == KIND_UNCONSTRAINED:
         suggest = object
-        seq = [rec(_, suggest) for _ in mj]
+        seq = yield from gen_object_from_ipce_seq(mj, suggest, ieds=ieds, iedo=iedo)
         T = make_list(object)
         return T(seq)
-    elif is_TupleLike(expect_type):
-        return object_from_ipce_tuple(mj, expect_type, ieds=ieds, iedo=iedo)
-    elif is_ListLike(expect_type):
-        suggest = get_ListLike_arg(expect_type)
-        seq = [rec(_, suggest) for _ in mj]
+    elif d.is_tuple:
+        return (
+            yield from gen_object_from_ipce_tuple(mj, expect_type, ieds=ieds, iedo=iedo)
+        )
+    elif d.kind == KIND_LIST:
+        (suggest,) = d.args
+        seq = yield from gen_object_from_ipce_seq(mj, suggest, ieds=ieds, iedo=iedo)
         T = make_list(suggest)
         return T(seq)
 
@@ -223,157 +365,96 @@ def object_from_ipce_list(mj: IPCE, expect_type, *, ieds: IEDS, iedo: IEDO) -> I
         raise ZValueError(msg, expect_type=expect_type, mj=mj)
 
 
-def object_from_ipce_optional(
+def gen_object_from_ipce_seq(
+    mj: List[IPCE], T: TypeLike, *, ieds: IEDS, iedo: IEDO
+) -> Steps:
+    """ Converts all the elements with the same type T; returns a list. """
+    if all_objects_as_is(mj, T):
+        return list(mj)
+    seq = []
+    for x in mj:
+        if is_object_as_is(x, T):
+            seq.append(x)
+        else:
+            seq.append((yield gen_object_from_ipce_(x, T, ieds=ieds, iedo=iedo)))
+    return seq
+
+
+def gen_object_from_ipce_optional(
     mj: IPCE, expect_type: TypeLike, *, ieds: IEDS, iedo: IEDO
-) -> IPCE:
+) -> Steps:
     if mj is None:
         return mj
-    K = get_Optional_arg(expect_type)
+    (K,) = get_type_descriptor(expect_type).args
 
-    return object_from_ipce_(mj, K, ieds=ieds, iedo=iedo)
+    return (yield gen_object_from_ipce_(mj, K, ieds=ieds, iedo=iedo))
 
 
-def object_from_ipce_union(
+def gen_object_from_ipce_union(
     mj: IPCE, expect_type: TypeLike, *, ieds: IEDS, iedo: IEDO
-) -> IPCE:
+) -> Steps:
+    from .compile_union import get_union_plan
+
     errors = []
-    ts = get_Union_args(expect_type)
+    # only the members that do not fail trivially
+    ts = get_union_plan(expect_type).candidates_for_ipce(mj)
     for T in ts:
         try:
-            return object_from_ipce_(mj, T, ieds=ieds, iedo=iedo)
+            return (yield gen_object_from_ipce_(mj, T, ieds=ieds, iedo=iedo))
         except IPCE_PASS_THROUGH:  # pragma: no cover
             raise
-        except BaseException:
-            errors.append(dict(T=T, e=traceback.format_exc()))
+        except BaseException as e:
+            errors.append(FailedAttempt(T, e))
     msg = f"Cannot deserialize with any type."
-    fn = write_out_yaml(f"object{id(mj)}", mj)
-    msg += f"\n ipce in {fn}"
-    raise ZValueError(msg, ts=ts, errors=errors)
+    raise ZValueError(msg, ts=get_Union_args(expect_type), tried=ts, errors=errors)
 
 
-def object_from_ipce_intersection(
+def gen_object_from_ipce_intersection(
     mj: IPCE, expect_type: TypeLike, *, ieds: IEDS, iedo: IEDO
-) -> IPCE:
-    errors = {}
+) -> Steps:
+    errors = []
     ts = get_Intersection_args(expect_type)
     for T in ts:
         try:
-            return object_from_ipce_(mj, T, ieds=ieds, iedo=iedo)
+            return (yield gen_object_from_ipce_(mj, T, ieds=ieds, iedo=iedo))
         except IPCE_PASS_THROUGH:  # pragma: no cover
             raise
-        except BaseException:
-            errors[str(T)] = traceback.format_exc()
+        except BaseException as e:
+            errors.append(FailedAttempt(T, e))
     msg = f"Cannot deserialize with any of @ts"
-    fn = write_out_yaml(f"object{id(mj)}", mj)
-    msg += f"\n ipce in {fn}"
     raise ZValueError(msg, errors=errors, ts=ts)
 
 
-def object_from_ipce_tuple(mj: IPCE, st: TypeLike, *, ieds: IEDS, iedo: IEDO):
-    if is_FixedTuple(st):
+def gen_object_from_ipce_tuple(
+    mj: IPCE, st: TypeLike, *, ieds: IEDS, iedo: IEDO
+) -> Steps:
+    d = get_type_descriptor(st)
+    if d.kind == KIND_FIXED_TUPLE:
         seq = []
-        ts = get_FixedTuple_args(st)
+        ts = d.args
         for st_i, ob in zip(ts, mj):
-            st_i = cast(Type[_X], st_i)  # XXX should not be necessary
-            r = object_from_ipce_(ob, st_i, ieds=ieds, iedo=iedo)
+            if is_object_as_is(ob, st_i):
+                r = ob
+            else:
+                r = yield gen_object_from_ipce_(ob, st_i, ieds=ieds, iedo=iedo)
             seq.append(r)
 
         return tuple(seq)
-    elif is_VarTuple(st):
-        T = get_VarTuple_arg(st)
-        seq = []
-        for i, ob in enumerate(mj):
-            r = object_from_ipce_(ob, T, ieds=ieds, iedo=iedo)
-            seq.append(r)
-
+    elif d.kind == KIND_VAR_TUPLE:
+        (T,) = d.args
+        seq = yield from gen_object_from_ipce_seq(mj, T, ieds=ieds, iedo=iedo)
         return tuple(seq)
     else:
         assert False
 
 
-def get_class_fields(K) -> Dict[str, Field]:
-    class_fields: Dict[str, Field] = {}
-    for f in fields(K):
-        class_fields[f.name] = f
-    return class_fields
-
-
-def add_to_globals(ieds: IEDS, name: str, val: object) -> IEDS:
-    g = dict(ieds.global_symbols)
-    g[name] = val
-    return replace(ieds, global_symbols=g)
-
-
-def object_from_ipce_dataclass_instance(
+def gen_object_from_ipce_dataclass_instance(
     mj: IPCE, K: TypeLike, *, ieds: IEDS, iedo: IEDO
-):
-    ieds = add_to_globals(ieds, K.__name__, K)
-
-    anns = getattr(K, "__annotations__", {})
-
-    attrs = {}
-    hints = mj.get(HINTS_ATT, {})
-    # ztinfo('hints', mj=mj, h=hints)
-    # logger.info(f'hints for {K.__name__} = {hints}')
-
-    for k, v in mj.items():
-        if k not in anns:
-            continue
-
-        et_k = anns[k]
-
-        if inspect.isabstract(et_k):  # pragma: no cover
-            msg = f"Trying to instantiate abstract class for field {k!r} of class {K.__name__}."
-            raise ZValueError(msg, K=K, expect_type=et_k, mj=mj, annotation=anns[k])
-
-        if k in hints:
-            R = typelike_from_ipce_sr(hints[k], ieds=ieds, iedo=iedo)
-            hint = R.res
-            et_k = hint
+) -> Steps:
+    from .compile_object_from_ipce import get_object_from_ipce_plan
 
-        else:
-            hint = None
-        try:
-            attrs[k] = object_from_ipce_(v, et_k, ieds=ieds, iedo=iedo)
-        except IPCE_PASS_THROUGH:  # pragma: no cover
-            raise
-        except ZValueError as e:  # pragma: no cover
-            msg = f"Cannot deserialize attribute {k!r} of {K.__name__}."
-
-            raise ZValueError(
-                msg,
-                K_annotations=K.__annotations__,
-                expect_type=et_k,
-                ann_K=anns[k],
-                K_name=K.__name__,
-            ) from e
-        # ztinfo(f'result for {k}', raw=v, hint = hint, et_k=et_k, attrs_k=attrs[k])
-
-    class_fields = get_class_fields(K)
-
-    for k, T in anns.items():
-        if is_ClassVar(T):
-            continue
-        if not k in mj:
-            f = class_fields[k]
-            if f.default != MISSING:
-                attrs[k] = f.default
-            elif f.default_factory != MISSING:
-                attrs[k] = f.default_factory()
-            else:
-                msg = (
-                    f"Cannot find field {k!r} in data for class {K.__name__} "
-                    f"and no default available"
-                )
-                raise ZValueError(msg, anns=anns, T=T, known=sorted(mj), f=f)
-
-    for k, v in attrs.items():
-        assert not isinstance(v, Field), (k, v)
-    try:
-        return K(**attrs)
-    except TypeError as e:  # pragma: no cover
-        msg = f"Cannot instantiate type {K.__name__}."
-        raise ZTypeError(msg, K=K, attrs=attrs, bases=K.__bases__, fields=anns) from e
+    plan = get_object_from_ipce_plan(K)
+    return plan(mj, ieds, iedo)
 
 
 def ignore_aliases(self, data) -> bool:
@@ -393,6 +474,39 @@ def ignore_aliases(self, data) -> bool:
         return True
 
 
+class ErrorDumps:
+    """
+        Where object_from_ipce writes the data and schema of the objects
+        it could not deserialize; None (the default) means not to write them.
+    """
+
+    dirname: Optional[str] = None
+
+
+def enable_error_dumps(dirname: str = "errors") -> None:
+    ErrorDumps.dirname = dirname
+
+
+def disable_error_dumps() -> None:
+    ErrorDumps.dirname = None
+
+
+def write_out_error_dumps(mj: IPCE) -> str:
+    """ Writes out the data and the schema; returns the text for the message. """
+    if isinstance(mj, dict) and SCHEMA_ATT in mj:
+        schema = mj[SCHEMA_ATT]
+    else:
+        schema = None
+
+    prefix = f"object_{id(mj)}"
+    fn = write_out_yaml(prefix + "_data", mj)
+    msg = f"\n object data in {fn}"
+    if schema:
+        fn = write_out_yaml(prefix + "_schema", schema)
+        msg += f"\n object schema in {fn}"
+    return msg
+
+
 def write_out_yaml(prefix: str, v: object, no_aliases: bool = False) -> str:
     if no_aliases:
         yaml.Dumper.ignore_aliases = lambda _, data: True
@@ -400,14 +514,18 @@ def write_out_yaml(prefix: str, v: object, no_aliases: bool = False) -> str:
         yaml.Dumper.ignore_aliases = ignore_aliases
     # d = oyaml_dump(v)
     d = yaml.dump(v)
-    fn = f"errors/{prefix}.yaml"
+    dirname = ErrorDumps.dirname or "errors"
+    fn = os.path.join(dirname, f"{prefix}.yaml")
     write_ustring_to_utf8_file(d, fn)
     return fn
 
 
-def object_from_ipce_dict(mj: IPCE, D: Type[Dict], *, ieds: IEDS, iedo: IEDO):
-    assert is_DictLike(D), D
-    K, V = get_DictLike_args(D)
+def gen_object_from_ipce_dict(
+    mj: IPCE, D: Type[Dict], *, ieds: IEDS, iedo: IEDO
+) -> Steps:
+    d = get_type_descriptor(D)
+    assert d.kind == KIND_DICT, D
+    K, V = d.args
     D = make_dict(K, V)
     ob = D()
 
@@ -424,7 +542,10 @@ def object_from_ipce_dict(mj: IPCE, D: Type[Dict], *, ieds: IEDS, iedo: IEDO):
             continue
 
         try:
-            attrs[k] = object_from_ipce_(v, et_V, ieds=ieds, iedo=iedo)
+            if is_object_as_is(v, et_V):
+                attrs[k] = v
+            else:
+                attrs[k] = yield gen_object_from_ipce_(v, et_V, ieds=ieds, iedo=iedo)
 
         except (TypeError, NotImplementedError) as e:  # pragma: no cover
             msg = f'Cannot deserialize element at index "{k}".'
@@ -444,8 +565,10 @@ def object_from_ipce_dict(mj: IPCE, D: Type[Dict], *, ieds: IEDS, iedo: IEDO):
         return ob
 
 
-def object_from_ipce_SetLike(mj: IPCE, D: Type[Set], *, ieds: IEDS, iedo: IEDO):
-    V = get_SetLike_arg(D)
+def gen_object_from_ipce_SetLike(
+    mj: IPCE, D: Type[Set], *, ieds: IEDS, iedo: IEDO
+) -> Steps:
+    (V,) = get_type_descriptor(D).args
 
     res = set()
 
@@ -454,7 +577,10 @@ def object_from_ipce_SetLike(mj: IPCE, D: Type[Set], *, ieds: IEDS, iedo: IEDO):
         if k == SCHEMA_ATT:
             continue
 
-        vob = object_from_ipce_(v, V, ieds=ieds, iedo=iedo)
+        if is_object_as_is(v, V):
+            vob = v
+        else:
+            vob = yield gen_object_from_ipce_(v, V, ieds=ieds, iedo=iedo)
 
         # logger.info(f'loaded k = {k} vob = {vob}')
         res.add(vob)
@@ -82,6 +82,7 @@ from .constants import (
     X_ORDER,
     X_PYTHON_MODULE_ATT,
 )
+from .schema_caching import get_typelike_from_ipce_cache, set_typelike_from_ipce_cache
 from .structures import CannotFindSchemaReference
 from .types import TypeLike, IPCE, is_unconstrained
 
@@ -107,6 +108,19 @@ def typelike_from_ipce(schema0: JSONSchema, *, iedo: Optional[IEDO] = None) -> T
 
 
 def typelike_from_ipce_sr(schema0: JSONSchema, *, ieds: IEDS, iedo: IEDO) -> SRE:
+    # Only the schemas with an id (dataclasses) are worth caching across calls.
+    use_cache = (
+        iedo.use_schema_cache and isinstance(schema0, dict) and ID_ATT in schema0
+    )
+    if use_cache:
+        try:
+            res = get_typelike_from_ipce_cache(schema0, iedo)
+        except KeyError:
+            pass
+        else:
+            ieds.encountered[schema0[ID_ATT]] = res
+            return SRE(res)
+
     try:
         sre = typelike_from_ipce_sr_(schema0, ieds=ieds, iedo=iedo)
         assert isinstance(sre, SRE), (schema0, sre)
@@ -119,6 +133,10 @@ def typelike_from_ipce_sr(schema0: JSONSchema, *, ieds: IEDS, iedo: IEDO) -> SRE
         schema_id = schema0[ID_ATT]
         ieds.encountered[schema_id] = res
 
+    # If it refers to outside definitions, it depends on the context.
+    if use_cache and not sre.used:
+        set_typelike_from_ipce_cache(schema0, iedo, res)
+
     return sre
 
 
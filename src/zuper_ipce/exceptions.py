@@ -1,3 +1,6 @@
+import traceback
+from dataclasses import dataclass
+
 from zuper_typing.exceptions import ZValueError
 
 
@@ -15,3 +18,23 @@ class ZSerializationError(ZValueError):
 
 class ZInvalidSchema(ZValueError):
     pass
+
+
+@dataclass(repr=False)
+class FailedAttempt:
+    """
+        Records that a conversion with type T failed.
+
+        The traceback is only formatted if the record is shown,
+        that is, if the whole conversion fails; most failed attempts
+        (for example while trying the members of a Union) are just discarded.
+    """
+
+    T: object
+    e: BaseException
+
+    def __repr__(self) -> str:
+        tb = traceback.format_exception(type(self.e), self.e, self.e.__traceback__)
+        return f"{self.T}:\n" + "".join(tb)
+
+    __str__ = __repr__
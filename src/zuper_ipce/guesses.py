@@ -1,17 +1,6 @@
-from typing import cast, Dict, List, Set, Tuple, Type
+from typing import cast, Tuple, Type
 
-from zuper_ipce.types import is_unconstrained
 from zuper_typing.aliases import TypeLike
-from zuper_typing.annotations_tricks import (
-    get_FixedTuple_args,
-    get_Optional_arg,
-    get_Union_args,
-    get_VarTuple_arg,
-    is_FixedTuple,
-    is_Optional,
-    is_Union,
-    is_VarTuple,
-)
 from zuper_typing.exceptions import ZTypeError, ZValueError
 from zuper_typing.my_dict import (
     CustomDict,
@@ -19,15 +8,20 @@ from zuper_typing.my_dict import (
     get_CustomDict_args,
     get_CustomList_arg,
     get_CustomSet_arg,
-    get_DictLike_args,
-    get_ListLike_arg,
-    get_SetLike_arg,
     is_CustomDict,
     is_CustomList,
     is_CustomSet,
-    is_DictLike,
-    is_ListLike,
-    is_SetLike,
+)
+from .type_descriptors import (
+    get_type_descriptor,
+    KIND_DICT,
+    KIND_FIXED_TUPLE,
+    KIND_LIST,
+    KIND_OPTIONAL,
+    KIND_SET,
+    KIND_UNCONSTRAINED,
+    KIND_UNION,
+    KIND_VAR_TUPLE,
 )
 
 
@@ -36,11 +30,11 @@ def get_set_type_suggestion(x: set, st: TypeLike) -> TypeLike:
     if is_CustomSet(T):
         return get_CustomSet_arg(T)
 
-    if is_SetLike(st):
-        st = cast(Type[Set], st)
-        V = get_SetLike_arg(st)
+    d = get_type_descriptor(st)
+    if d.kind == KIND_SET:
+        (V,) = d.args
         return V
-    elif is_unconstrained(st):
+    elif d.kind == KIND_UNCONSTRAINED:
         return object
     else:
         msg = "suggest_type does not make sense for a list"
@@ -54,11 +48,11 @@ def get_list_type_suggestion(x: list, st: TypeLike) -> TypeLike:
         return get_CustomList_arg(T)
 
     # TODO: if it is custom dict
-    if is_unconstrained(st):
+    d = get_type_descriptor(st)
+    if d.kind == KIND_UNCONSTRAINED:
         return object
-    elif is_ListLike(st):
-        T = cast(Type[List], st)
-        V = get_ListLike_arg(T)
+    elif d.kind == KIND_LIST:
+        (V,) = d.args
         return V
     else:
         msg = "suggest_type does not make sense for a list"
@@ -76,12 +70,12 @@ def get_dict_type_suggestion(ob: dict, st: TypeLike) -> Tuple[TypeLike, TypeLike
         K, V = get_CustomDict_args(T)
         return K, V
 
-    if is_DictLike(st):
+    d = get_type_descriptor(st)
+    if d.kind == KIND_DICT:
         # There was a suggestion of Dict-like
-        st = cast(Type[Dict], st)
-        K, V = get_DictLike_args(st)
+        K, V = d.args
         return K, V
-    elif is_unconstrained(st):
+    elif d.kind == KIND_UNCONSTRAINED:
         # Guess from the dictionary itself
         K, V = guess_type_for_naked_dict(ob)
         return K, V
@@ -91,14 +85,15 @@ def get_dict_type_suggestion(ob: dict, st: TypeLike) -> Tuple[TypeLike, TypeLike
 
 
 def is_UnionLike(x: TypeLike) -> bool:
-    return is_Union(x) or is_Optional(x)
+    return get_type_descriptor(x).kind in (KIND_UNION, KIND_OPTIONAL)
 
 
 def get_UnionLike_args(x: TypeLike) -> Tuple[TypeLike, ...]:
-    if is_Union(x):
-        return get_Union_args(x)
-    elif is_Optional(x):
-        y = get_Optional_arg(x)
+    d = get_type_descriptor(x)
+    if d.kind == KIND_UNION:
+        return d.args
+    elif d.kind == KIND_OPTIONAL:
+        (y,) = d.args
         if is_UnionLike(y):
             return get_UnionLike_args(y) + (type(None),)
     else:
@@ -114,14 +109,14 @@ def get_tuple_type_suggestion(x: tuple, st: TypeLike) -> Tuple[TypeLike, ...]:
 
     # first look for any tuple-like
     for op in options:
-        if is_VarTuple(op):
-            V = get_VarTuple_arg(op)
+        d = get_type_descriptor(op)
+        if d.kind == KIND_VAR_TUPLE:
+            (V,) = d.args
             return tuple([V] * n)
-        if is_FixedTuple(op):
-            ts = get_FixedTuple_args(op)
-            return ts
+        if d.kind == KIND_FIXED_TUPLE:
+            return d.args
     for op in options:
-        if is_unconstrained(op):
+        if get_type_descriptor(op).kind == KIND_UNCONSTRAINED:
             return tuple([object] * n)
 
     msg = f"@suggest_type does not make sense for a tuple"
@@ -1,7 +1,8 @@
+import threading
 from dataclasses import is_dataclass
-from typing import Dict, List, overload, Tuple, TypeVar
+from typing import Dict, List, Optional, overload, Tuple, TypeVar
 
-from zuper_ipce.constants import JSONSchema
+from zuper_ipce.constants import JSONSchema, VALIDATION_FULL, VALIDATION_OFF
 from zuper_typing.exceptions import ZValueError
 from .types import IPCE
 
@@ -25,10 +26,8 @@ def sorted_dict_cbor_ord(x):
         k, v = item
         return (len(k), k)
 
-    res = dict(sorted(x.items(), key=key))
-
-    assert_sorted_dict_cbor_ord(res)
-    return res
+    # Note: no need to check the result, it is sorted by construction.
+    return dict(sorted(x.items(), key=key))
 
 
 def sorted_list_cbor_ord(x: List[str]) -> List[str]:
@@ -42,12 +41,53 @@ IPCL_LINKS = "$links"
 IPCL_SELF = "$self"
 
 
+class IPCEValidation:
+    """ Process-wide settings for the checks of the canonical form. """
+
+    default: int = VALIDATION_FULL
+    # Number of checks requested with a sampled level
+    counter: int = 0
+    # The conversions can run in several threads.
+    lock = threading.Lock()
+
+
+def set_default_validation(level: int) -> None:
+    """
+        Sets the validation level used when IESO.validation is None:
+        VALIDATION_OFF, VALIDATION_FULL, or N > 1 to check one result every N.
+    """
+    if not isinstance(level, int) or level < 0:
+        msg = "Invalid validation level @level."
+        raise ZValueError(msg, level=level)
+    IPCEValidation.default = level
+
+
+def get_default_validation() -> int:
+    return IPCEValidation.default
+
+
+def should_validate(level: Optional[int] = None) -> bool:
+    """ Whether this result should be checked, for the given level
+        (None means the process-wide default). """
+    if level is None:
+        level = IPCEValidation.default
+    if level == VALIDATION_OFF:
+        return False
+    if level == VALIDATION_FULL:
+        return True
+    with IPCEValidation.lock:
+        IPCEValidation.counter += 1
+        n = IPCEValidation.counter
+    return n % level == 0
+
+
 def assert_sorted_dict_cbor_ord(x: dict):
     keys = list(x.keys())
-    keys2 = sorted_list_cbor_ord(keys)
-    if keys != keys2:
-        msg = f"x not sorted"
-        raise ZValueError(msg, keys=keys, keys2=keys2)
+    for a, b in zip(keys, keys[1:]):
+        if (len(a), a) > (len(b), b):
+            keys2 = sorted_list_cbor_ord(keys)
+            msg = f"x not sorted"
+            raise ZValueError(msg, keys=keys, keys2=keys2)
 
 
 def assert_canonical_ipce(ob_ipce: IPCE, max_rec=2) -> None:
@@ -0,0 +1,336 @@
+import datetime
+from dataclasses import is_dataclass
+from decimal import Decimal
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+from frozendict import frozendict
+
+from zuper_typing.annotations_tricks import is_SpecialForm
+from zuper_typing.exceptions import ZNotImplementedError, ZTypeError, ZValueError
+from .columnar import get_columnar_type, get_packed_list, ipce_from_packed_list
+from .constants import GlobalsDict, HINTS_ATT, IESO, IPCE_PASS_THROUGH, SCHEMA_ATT
+from .conv_ipce_from_object import (
+    all_ipce_as_is,
+    get_registered_handler,
+    is_ipce_as_is,
+)
+from .guesses import (
+    get_dict_type_suggestion,
+    get_list_type_suggestion,
+    get_set_type_suggestion,
+    get_tuple_type_suggestion,
+)
+from .ipce_spec import sorted_list_cbor_ord
+from .schema_session import schema_or_ref, SchemaSession, session_scope
+from .structures import FakeValues
+from .trampoline import run_trampoline, Steps
+from .type_descriptors import (
+    get_type_descriptor,
+    KIND_OPTIONAL,
+    KIND_UNCONSTRAINED,
+    KIND_UNION,
+)
+from .types import IPCE, TypeLike
+
+__all__ = ["IPCEStreamWriter"]
+
+# A map entry: the key, and the function writing the value;
+# it returns the steps for writing it, if it is not a leaf.
+MapEntry = Tuple[str, Callable[[], Optional[Steps]]]
+
+
+class IPCEStreamWriter:
+    """
+        Mirrors ipce_from_object_, but instead of creating the IPCE
+        it calls the methods below as it walks the object.
+        Subclasses write a particular encoding.
+
+        Like the conversions, the values inside containers are written by
+        yielding their steps (see run_trampoline), so that the depth of the
+        object is not limited by the recursion limit.
+    """
+
+    def __init__(self, ieso: IESO, session: Optional[SchemaSession] = None):
+        self.ieso = ieso
+        self.session = session
+
+    def write_ipce(self, x: IPCE) -> None:
+        """ Writes a complete IPCE value (a leaf, or a small subtree like a schema). """
+        raise NotImplementedError()
+
+    def write(self, ob: object, st: TypeLike, globals_: GlobalsDict) -> None:
+        """ Writes the object; the IPCE created for some parts of it
+            (e.g. the unions) uses the session. """
+        with session_scope(self.session):
+            run_trampoline(self.gen_write_object(ob, st, globals_))
+
+    def schema_writer(self, schema: IPCE) -> Callable[[], None]:
+        """ Returns the writer of the value of a "$schema" attribute.
+            The reference is looked up now, before the other entries of
+            the map are written, as done by ipce_from_object(). """
+        schema = schema_or_ref(schema)
+        return lambda: self.write_ipce(schema)
+
+    def write_bytes(self, b: memoryview) -> None:
+        """ Writes a byte string given as a buffer. """
+        self.write_ipce(bytes(b))
+
+    def begin_array(self, n: int) -> None:
+        raise NotImplementedError()
+
+    def array_item(self, i: int) -> None:
+        """ Called before writing the i-th item. """
+
+    def end_array(self) -> None:
+        pass
+
+    def begin_map(self, n: int) -> None:
+        raise NotImplementedError()
+
+    def map_key(self, i: int, k: str) -> None:
+        """ Writes the i-th key. """
+        raise NotImplementedError()
+
+    def end_map(self) -> None:
+        pass
+
+    def gen_write_map(self, entries: List[MapEntry]) -> Steps:
+        """ Writes the entries in CBOR order. """
+        d = dict(entries)
+        self.begin_map(len(d))
+        for i, k in enumerate(sorted_list_cbor_ord(list(d))):
+            self.map_key(i, k)
+            yield d[k]()
+        self.end_map()
+
+    def write_map(self, entries: List[MapEntry]) -> None:
+        """ Same as gen_write_map(), for the maps of leaves. """
+        run_trampoline(self.gen_write_map(entries))
+
+    def gen_write_via_ipce(
+        self, ob: object, st: TypeLike, globals_: GlobalsDict
+    ) -> Steps:
+        """ Writes the IPCE of the object, created in the same steps. """
+        from .conv_ipce_from_object import gen_ipce_from_object_
+
+        res = yield gen_ipce_from_object_(ob, st, globals_=globals_, ieso=self.ieso)
+        self.write_ipce(res)
+
+    def gen_write_object(
+        self, ob: object, st: TypeLike, globals_: GlobalsDict
+    ) -> Steps:
+        kind = get_type_descriptor(st).kind
+        if ob is None:
+            if kind in (KIND_UNCONSTRAINED, KIND_OPTIONAL) or (st is type(None)):
+                self.write_ipce(None)
+                return
+            else:
+                msg = "ob is None but suggest_type is @suggest_type"
+                raise ZTypeError(msg, suggest_type=st)
+
+        if kind == KIND_OPTIONAL:
+            (T,) = get_type_descriptor(st).args
+            yield self.gen_write_object(ob, T, globals_)
+            return
+
+        if kind == KIND_UNION:
+            # We need to try the options; use the IPCE for this.
+            yield self.gen_write_via_ipce(ob, st, globals_)
+            return
+
+        if get_registered_handler(type(ob)) is not None:
+            yield self.gen_write_via_ipce(ob, st, globals_)
+            return
+
+        if isinstance(ob, datetime.datetime):
+            if not ob.tzinfo:
+                msg = "Cannot serialize dates without a timezone."
+                raise ZValueError(msg, ob=ob)
+
+        trivial = (bool, int, str, float, bytes, Decimal, datetime.datetime)
+        if st in trivial:
+            if not isinstance(ob, st):
+                msg = "Expected this to be @suggest_type."
+                raise ZTypeError(msg, st=st, ob=ob, T=type(ob))
+            self.write_ipce(ob)
+            return
+
+        if isinstance(ob, trivial):
+            self.write_ipce(ob)
+            return
+
+        if isinstance(ob, list):
+            V = get_list_type_suggestion(ob, st)
+            if self.ieso.columnar and get_columnar_type(ob, V, self.ieso):
+                yield self.gen_write_via_ipce(ob, st, globals_)
+                return
+            packed = get_packed_list(ob, V, self.ieso)
+            if packed is not None:
+                if not self.ieso.with_schema:
+                    # the same as the IPCE, or the typed-array tags
+                    self.write_numpy(packed)
+                    return
+                ieso = self.ieso
+                res = ipce_from_packed_list(packed, V, globals_=globals_, ieso=ieso)
+                self.write_ipce(res)
+                return
+            if all_ipce_as_is(ob, V):
+                self.write_ipce(list(ob))
+                return
+            self.begin_array(len(ob))
+            for i, x in enumerate(ob):
+                self.array_item(i)
+                if is_ipce_as_is(x, V):
+                    self.write_ipce(x)
+                else:
+                    yield self.gen_write_object(x, V, globals_)
+            self.end_array()
+            return
+
+        if isinstance(ob, tuple):
+            ts = get_tuple_type_suggestion(ob, st)
+            pairs = list(zip(ob, ts))
+            self.begin_array(len(pairs))
+            for i, (x, T) in enumerate(pairs):
+                self.array_item(i)
+                if is_ipce_as_is(x, T):
+                    self.write_ipce(x)
+                else:
+                    yield self.gen_write_object(x, T, globals_)
+            self.end_array()
+            return
+
+        if isinstance(ob, set):
+            yield from self.gen_write_set(ob, st, globals_)
+            return
+
+        if isinstance(ob, (dict, frozendict)):
+            yield from self.gen_write_dict(ob, st, globals_)
+            return
+
+        if isinstance(ob, np.ndarray):
+            self.write_numpy(ob)
+            return
+
+        if isinstance(ob, (type, slice)) or is_SpecialForm(ob):
+            # These are small or already a single leaf; use the IPCE.
+            yield self.gen_write_via_ipce(ob, st, globals_)
+            return
+
+        if is_dataclass(ob):
+            yield from self.gen_write_dataclass(ob, globals_)
+            return
+
+        msg = "I do not know a way to convert object @ob of type @T."
+        raise ZNotImplementedError(msg, ob=ob, T=type(ob))
+
+    def get_schema(self, T: TypeLike, globals_: GlobalsDict) -> Callable[[], None]:
+        from .conv_ipce_from_typelike import ipce_from_typelike
+
+        schema = ipce_from_typelike(T, globals0=globals_, ieso=self.ieso)
+        return self.schema_writer(schema)
+
+    def get_writer(
+        self, v: object, T: TypeLike, globals_: GlobalsDict
+    ) -> Callable[[], Optional[Steps]]:
+        if is_ipce_as_is(v, T):
+            return lambda: self.write_ipce(v)
+        return lambda: self.gen_write_object(v, T, globals_)
+
+    def gen_write_dataclass(self, ob: object, globals_: GlobalsDict) -> Steps:
+        from .compile_ipce_from_object import get_ipce_from_object_plan
+
+        plan = get_ipce_from_object_plan(type(ob), self.ieso)
+        entries: List[MapEntry] = []
+        if self.ieso.with_schema:
+            entries.append((SCHEMA_ATT, self.schema_writer(plan.get_schema(globals_))))
+
+        globals_ = plan.get_globals(globals_)
+        present, hints = plan.select(ob)
+
+        def field_writer(fp, v) -> Callable[[], Steps]:
+            def f() -> Steps:
+                try:
+                    yield self.gen_write_object(v, fp.T, globals_)
+                except IPCE_PASS_THROUGH:
+                    raise
+                except BaseException as e:
+                    raise plan.field_error(fp, ob) from e
+
+            return f
+
+        for k, (fp_, v_) in present.items():
+            entries.append((k, field_writer(fp_, v_)))
+        if hints:
+            hints_ipce = plan.get_hints_ipce(hints)
+            entries.append((HINTS_ATT, lambda: self.write_ipce(hints_ipce)))
+        yield from self.gen_write_map(entries)
+
+    def write_numpy(self, x: np.ndarray) -> None:
+        """ Same as ipce_from_numpy_array(), but the data is not copied. """
+        from .conv_ipce_from_typelike import ipce_from_typelike_ndarray
+        from .numpy_encoding import (
+            compressed_chunks,
+            num_compressed_chunks,
+            numpy_array_buffer,
+            use_compression,
+        )
+
+        entries: List[MapEntry] = [
+            ("shape", lambda: self.write_ipce(list(x.shape))),
+            ("dtype", lambda: self.write_ipce(x.dtype.name)),
+        ]
+        compression = self.ieso.numpy_compression
+        if use_compression(x, compression):
+
+            def write_chunks() -> None:
+                self.begin_array(num_compressed_chunks(x, compression))
+                for i, c in enumerate(compressed_chunks(x, compression)):
+                    self.array_item(i)
+                    self.write_bytes(memoryview(c))
+                self.end_array()
+
+            method, cs = compression.method, compression.chunk_size
+            entries.append(("compression", lambda: self.write_ipce(method)))
+            entries.append(("chunk_size", lambda: self.write_ipce(cs)))
+            entries.append(("chunks", write_chunks))
+        else:
+            entries.append(("data", lambda: self.write_bytes(numpy_array_buffer(x))))
+        if self.ieso.with_schema:
+            schema = ipce_from_typelike_ndarray().schema
+            entries.append((SCHEMA_ATT, self.schema_writer(schema)))
+        self.write_map(entries)
+
+    def gen_write_dict(self, ob: dict, st: TypeLike, globals_: GlobalsDict) -> Steps:
+        from .conv_ipce_from_object import get_key_for_set_entry
+
+        K, V = get_dict_type_suggestion(ob, st)
+        entries: List[MapEntry] = []
+        if self.ieso.with_schema:
+            entries.append((SCHEMA_ATT, self.get_schema(Dict[K, V], globals_)))
+
+        if isinstance(K, type) and issubclass(K, str):
+            for k, v in ob.items():
+                entries.append((k, self.get_writer(v, V, globals_)))
+        elif isinstance(K, type) and issubclass(K, int):
+            for k, v in ob.items():
+                entries.append((str(k), self.get_writer(v, V, globals_)))
+        else:
+            FV = FakeValues[K, V]
+            for i, (k, v) in enumerate(ob.items()):
+                h = get_key_for_set_entry(i, len(ob))
+                entries.append((h, self.get_writer(FV(k, v), object, globals_)))
+        yield from self.gen_write_map(entries)
+
+    def gen_write_set(self, ob: set, st: TypeLike, globals_: GlobalsDict) -> Steps:
+        from .conv_ipce_from_object import get_key_for_set_entry
+
+        V = get_set_type_suggestion(ob, st)
+        entries: List[MapEntry] = []
+        if self.ieso.with_schema:
+            entries.append((SCHEMA_ATT, self.get_schema(Set[V], globals_)))
+        for i, v in enumerate(ob):
+            h = get_key_for_set_entry(i, len(ob))
+            entries.append((h, self.get_writer(v, V, globals_)))
+        yield from self.gen_write_map(entries)
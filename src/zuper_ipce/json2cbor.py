@@ -1,6 +1,8 @@
 import io
 import json
+import os
 import select
+import stat
 import time
 import traceback
 from io import BufferedReader
@@ -62,8 +64,18 @@ def cbor2yaml_main() -> None:
         fo.flush()
 
 
-def read_cbor_or_json_objects(f, timeout=None) -> Iterator:
-    """ Reads cbor or line-separated json objects from the binary file f."""
+def read_cbor_or_json_objects(f, timeout=None, use_mmap: bool = False) -> Iterator:
+    """ Reads cbor or line-separated json objects from the binary file f.
+
+        If use_mmap is True and f is a regular file starting with CBOR,
+        the rest of the file is memory-mapped and the numpy arrays are views
+        of it (see read_cbor_mmap()); the position of f is not changed.
+    """
+    if use_mmap and is_regular_cbor_file(f):
+        from .cbor_mmap import read_cbor_objects_mmap_file
+
+        yield from read_cbor_objects_mmap_file(f)
+        return
     while True:
         try:
             ob = read_next_either_json_or_cbor(f, timeout=timeout)
@@ -74,6 +86,18 @@ def read_cbor_or_json_objects(f, timeout=None) -> Iterator:
             raise
 
 
+def is_regular_cbor_file(f) -> bool:
+    """ Whether f can be memory-mapped and does not start with JSON. """
+    try:
+        fileno = f.fileno()
+    except (AttributeError, io.UnsupportedOperation):
+        return False
+    if not stat.S_ISREG(os.fstat(fileno).st_mode):
+        return False
+    first = f.peek(1)[:1] if hasattr(f, "peek") else b""
+    return first not in (b" ", b"\n", b"{")
+
+
 def read_cbor_objects(f, timeout=None) -> Iterator:
     """ Reads cbor or line-separated json objects from the binary file f."""
     while True:
@@ -153,7 +177,9 @@ def read_next_either_json_or_cbor(f, timeout=None, waiting_for: str = None) -> d
 def tag_hook(decoder, tag, shareable_index=None) -> dict:
     # logger.info(f'tag_hook {tag}')
     if tag.tag != 42:
-        return tag
+        from .numpy_encoding import numpy_array_from_cbor_tag
+
+        return numpy_array_from_cbor_tag(tag)
 
     d = tag.value
 
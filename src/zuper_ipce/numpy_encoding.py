@@ -1,27 +1,207 @@
+import lzma
+import sys
+import zlib
+from typing import Callable, Iterator, Optional, Tuple
+
 import numpy as np
 
 from zuper_commons.types import check_isinstance
+from zuper_typing.exceptions import ZValueError
+from .constants import NUMPY_COMPRESSION_LZMA, NUMPY_COMPRESSION_ZLIB, NumpyCompression
 from .types import IPCE
 
+# RFC 8746: multi-dimensional array [dims, array], in row-major order
+CBOR_TAG_MULTI_DIM_ARRAY = 40
+# RFC 8746: typed arrays are the tags 0b010_f_s_e_ll (64..87)
+CBOR_TAG_TYPED_ARRAY_MIN = 64
+CBOR_TAG_TYPED_ARRAY_MAX = 87
+
 
-def ipce_from_numpy_array(x: np.ndarray) -> IPCE:
-    res = {"shape": list(x.shape), "dtype": x.dtype.name, "data": x.tobytes()}
+def ipce_from_numpy_array(
+    x: np.ndarray, compression: Optional[NumpyCompression] = None
+) -> IPCE:
+    if use_compression(x, compression):
+        res = {
+            "shape": list(x.shape),
+            "dtype": x.dtype.name,
+            "compression": compression.method,
+            "chunk_size": compression.chunk_size,
+            "chunks": list(compressed_chunks(x, compression)),
+        }
+    else:
+        # This copies: the IPCE must hold bytes, which do not change if the
+        # array is modified later, and which can be hashed and compared.
+        # The stream writers use numpy_array_buffer() instead.
+        res = {"shape": list(x.shape), "dtype": x.dtype.name, "data": x.tobytes()}
     from .ipce_spec import sorted_dict_cbor_ord
 
     res = sorted_dict_cbor_ord(res)
     return res
 
 
-def numpy_array_from_ipce(d: IPCE) -> np.ndarray:
+def numpy_array_buffer(x: np.ndarray) -> memoryview:
+    """ The same bytes as x.tobytes(), but without copying
+        if the array is already C-contiguous. """
+    x = np.ascontiguousarray(x)
+    return memoryview(x.reshape(-1).view(np.uint8))
+
+
+def numpy_array_from_ipce(d: IPCE, writable: bool = False) -> np.ndarray:
+    """
+        The array is a view of the data buffer, without copying.
+
+        If writable is True and the buffer is read-only (e.g. bytes),
+        the data is copied once so that the array can be modified.
+    """
     shape = tuple(d["shape"])
     dtype = d["dtype"]
-    data: bytes = d["data"]
-    check_isinstance(data, bytes)
+    if "chunks" in d:
+        # decompressed in a new (writable) buffer
+        nbytes = np.dtype(dtype).itemsize * int(np.prod(shape, dtype=np.int64))
+        data = decompress_range(d, 0, nbytes)
+        return np.frombuffer(data, dtype=dtype).reshape(shape)
+    data = d["data"]
+    check_isinstance(data, (bytes, bytearray, memoryview))
+    if writable and (isinstance(data, bytes) or memoryview(data).readonly):
+        data = bytearray(data)
     a = np.frombuffer(data, dtype=dtype)
     res = a.reshape(shape)
     return res
 
 
+def numpy_rows_from_ipce(d: IPCE, start: int, stop: int) -> np.ndarray:
+    """
+        The rows [start:stop] (along the first axis) of the array encoded in d.
+
+        For compressed arrays, only the chunks that contain the rows
+        are decompressed.
+    """
+    shape = tuple(d["shape"])
+    dtype = np.dtype(d["dtype"])
+    if not shape:
+        msg = "Cannot take rows of a 0-d array."
+        raise ZValueError(msg, shape=shape)
+    start, stop, _ = slice(start, stop).indices(shape[0])
+    stop = max(start, stop)
+    row_size = dtype.itemsize * int(np.prod(shape[1:], dtype=np.int64))
+    a, b = start * row_size, stop * row_size
+    if "chunks" in d:
+        data = decompress_range(d, a, b)
+    else:
+        data = memoryview(d["data"])[a:b]
+    return np.frombuffer(data, dtype=dtype).reshape((stop - start,) + shape[1:])
+
+
+def use_compression(x: np.ndarray, compression: Optional[NumpyCompression]) -> bool:
+    return compression is not None and x.nbytes >= compression.min_size
+
+
+Compress = Callable[[memoryview, int], bytes]
+Decompress = Callable[[bytes], bytes]
+
+
+def get_codec(method: str) -> Tuple[Compress, Decompress]:
+    if method == NUMPY_COMPRESSION_ZLIB:
+        return zlib.compress, zlib.decompress
+    if method == NUMPY_COMPRESSION_LZMA:
+        return (lambda b, level: lzma.compress(b, preset=level)), lzma.decompress
+    msg = "Unknown compression method @method."
+    known = [NUMPY_COMPRESSION_ZLIB, NUMPY_COMPRESSION_LZMA]
+    raise ZValueError(msg, method=method, known=known)
+
+
+def num_compressed_chunks(x: np.ndarray, compression: NumpyCompression) -> int:
+    return -(-x.nbytes // compression.chunk_size)
+
+
+def compressed_chunks(x: np.ndarray, compression: NumpyCompression) -> Iterator[bytes]:
+    """ Compresses the data of the array, one chunk at a time.
+        The chunks are independent, so they can also be decompressed separately. """
+    compress, _ = get_codec(compression.method)
+    buf = numpy_array_buffer(x)
+    cs = compression.chunk_size
+    for i in range(0, buf.nbytes, cs):
+        yield compress(buf[i : i + cs], compression.level)
+
+
+def decompress_range(d: IPCE, a: int, b: int) -> memoryview:
+    """ Decompresses the bytes [a:b] of the data, using only the chunks needed. """
+    _, decompress = get_codec(d["compression"])
+    cs = d["chunk_size"]
+    chunks = d["chunks"]
+    res = bytearray()
+    if b <= a:
+        return memoryview(res)
+    first = a // cs
+    for i in range(first, -(-b // cs)):
+        res += decompress(chunks[i])
+    offset = a - first * cs
+    if offset + (b - a) > len(res):
+        msg = "The compressed data is shorter than expected."
+        raise ZValueError(msg, expected=b, found=first * cs + len(res))
+    return memoryview(res)[offset : offset + (b - a)]
+
+
+def cbor_tag_from_dtype(dtype: np.dtype) -> Optional[int]:
+    """ The RFC 8746 typed-array tag for the dtype, or None if there is none
+        (bool, complex, long double, structured, ...). """
+    if dtype.kind in "ui":
+        lls = {1: 0, 2: 1, 4: 2, 8: 3}
+        f, s = 0, int(dtype.kind == "i")
+    elif dtype.kind == "f":
+        lls = {2: 0, 4: 1, 8: 2}
+        f, s = 1, 0
+    else:
+        return None
+    if dtype.itemsize not in lls:
+        return None
+    ll = lls[dtype.itemsize]
+    if dtype.itemsize == 1:
+        # for bytes, e=1 means "clamped" (uint8) or is reserved (int8)
+        e = 0
+    elif dtype.byteorder == "=":
+        e = int(sys.byteorder == "little")
+    else:
+        e = int(dtype.byteorder == "<")
+    return CBOR_TAG_TYPED_ARRAY_MIN | (f << 4) | (s << 3) | (e << 2) | ll
+
+
+def dtype_from_cbor_tag(tag: int) -> Optional[np.dtype]:
+    """ The inverse of cbor_tag_from_dtype(); None for the unsupported tags. """
+    if not CBOR_TAG_TYPED_ARRAY_MIN <= tag <= CBOR_TAG_TYPED_ARRAY_MAX:
+        return None
+    x = tag - CBOR_TAG_TYPED_ARRAY_MIN
+    f, s, e, ll = (x >> 4) & 1, (x >> 3) & 1, (x >> 2) & 1, x & 3
+    if f:
+        if ll == 3:  # binary128
+            return None
+        kind, size = "f", 2 << ll
+    else:
+        if ll == 0 and e and s:  # reserved
+            return None
+        kind, size = ("i" if s else "u"), 1 << ll
+    order = "<" if e else ">"
+    return np.dtype(f"{order}{kind}{size}")
+
+
+def numpy_array_from_cbor_tag(tag):
+    """
+        Decodes the RFC 8746 tags for typed arrays and multi-dimensional arrays
+        (to be used from a cbor2 tag_hook). The array is a view of the data.
+
+        The other tags are returned unchanged.
+    """
+    if tag.tag == CBOR_TAG_MULTI_DIM_ARRAY:
+        dims, a = tag.value
+        if isinstance(a, np.ndarray):
+            return a.reshape(tuple(dims))
+        return tag
+    dtype = dtype_from_cbor_tag(tag.tag)
+    if dtype is None or not isinstance(tag.value, (bytes, memoryview)):
+        return tag
+    return np.frombuffer(tag.value, dtype=dtype)
+
+
 #
 #
 # def bytes_from_numpy(a: np.ndarray) -> bytes:
@@ -0,0 +1,209 @@
+import collections
+import itertools
+import os
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from dataclasses import fields, is_dataclass
+from typing import Callable, Deque, Iterable, Iterator, List, Optional, TypeVar
+
+from zuper_typing.exceptions import ZValueError
+from .constants import GlobalsDict, IEDO, IESO
+from .types import IPCE, TypeLike
+
+__all__ = ["ipce_from_objects_parallel", "objects_from_ipces_parallel"]
+
+DEFAULT_CHUNKSIZE = 1000
+# The chunks submitted and not yet collected, for each worker
+MAX_PENDING_PER_WORKER = 2
+
+X = TypeVar("X")
+Y = TypeVar("Y")
+
+# Converts a chunk: f(options, chunk)
+ChunkFunction = Callable[[tuple, list], list]
+
+
+def ipce_from_objects_parallel(
+    obs: Iterable[object],
+    suggest_type: TypeLike = object,
+    *,
+    globals_: GlobalsDict = None,
+    ieso: Optional[IESO] = None,
+    max_workers: Optional[int] = None,
+    chunksize: int = DEFAULT_CHUNKSIZE,
+    executor: Optional[Executor] = None,
+) -> List[IPCE]:
+    """
+        Same as ipce_from_objects(), but the objects are split in chunks
+        of ``chunksize`` that are converted by a pool of ``max_workers``
+        processes. The results are in the same order as the objects.
+
+        The objects (and the types) must be picklable. An existing executor
+        can be passed; otherwise a ProcessPoolExecutor is created for the call.
+    """
+    if ieso is None:
+        ieso = IESO(with_schema=True)
+    if globals_ is None:
+        globals_ = {}
+    options = (suggest_type, globals_, ieso)
+    return map_chunks(
+        encode_chunk,
+        options,
+        obs,
+        max_workers=max_workers,
+        chunksize=chunksize,
+        executor=executor,
+    )
+
+
+def objects_from_ipces_parallel(
+    ipces: Iterable[IPCE],
+    expect_type: TypeLike = object,
+    *,
+    iedo: Optional[IEDO] = None,
+    max_workers: Optional[int] = None,
+    chunksize: int = DEFAULT_CHUNKSIZE,
+    executor: Optional[Executor] = None,
+) -> List[object]:
+    """
+        Same as objects_from_ipces(), but the IPCEs are split in chunks
+        of ``chunksize`` that are converted by a pool of ``max_workers``
+        processes. The results are in the same order as the IPCEs.
+
+        The resulting objects are sent back from the workers using pickle,
+        so they (and the types) must be picklable. For this, the schemas
+        of expect_type and of the dataclasses used by its fields are
+        resolved to those classes, instead of creating new ones, which could
+        not be pickled; use iedo.use_remembered_classes for the others.
+    """
+    if iedo is None:
+        iedo = IEDO(use_remembered_classes=False, remember_deserialized_classes=False)
+    options = (expect_type, iedo, get_dataclasses(expect_type))
+    return map_chunks(
+        decode_chunk,
+        options,
+        ipces,
+        max_workers=max_workers,
+        chunksize=chunksize,
+        executor=executor,
+    )
+
+
+def encode_chunk(options: tuple, obs: List[object]) -> List[IPCE]:
+    """ Runs in the worker. The plans and the schemas are computed once
+        per worker process, the first time they are needed, and then cached. """
+    from .conv_ipce_from_object import ipce_from_objects
+
+    suggest_type, globals_, ieso = options
+    return ipce_from_objects(obs, suggest_type, globals_=globals_, ieso=ieso)
+
+
+def decode_chunk(options: tuple, ipces: List[IPCE]) -> List[object]:
+    """ Runs in the worker; see encode_chunk(). """
+    from .conv_object_from_ipce import objects_from_ipces
+
+    expect_type, iedo, classes = options
+    return objects_from_ipces(ipces, expect_type, iedo=iedo, classes=classes)
+
+
+class WorkerOptions:
+    # The options of the pool created by map_chunks(), sent once to each
+    # worker process by its initializer instead of with each chunk.
+    options: Optional[tuple] = None
+
+
+def set_worker_options(options: tuple) -> None:
+    WorkerOptions.options = options
+
+
+def run_chunk_in_worker(f: ChunkFunction, chunk: list) -> list:
+    return f(WorkerOptions.options, chunk)
+
+
+def get_dataclasses(T: TypeLike) -> List[type]:
+    """ Returns T if it is a dataclass, and the dataclasses used by
+        its fields or its type arguments, recursively. """
+    res = []
+    seen = set()
+    todo = [T]
+    while todo:
+        t = todo.pop()
+        if id(t) in seen:
+            continue
+        seen.add(id(t))
+        if isinstance(t, type) and is_dataclass(t):
+            res.append(t)
+            todo.extend(f.type for f in fields(t))
+        todo.extend(getattr(t, "__args__", None) or ())
+    return res
+
+
+def iterate_chunks(xs: Iterable[X], chunksize: int) -> Iterator[List[X]]:
+    it = iter(xs)
+    while True:
+        chunk = list(itertools.islice(it, chunksize))
+        if not chunk:
+            return
+        yield chunk
+
+
+def map_chunks(
+    f: ChunkFunction,
+    options: tuple,
+    xs: Iterable[X],
+    *,
+    max_workers: Optional[int],
+    chunksize: int,
+    executor: Optional[Executor],
+) -> List[Y]:
+    """
+        Calls f(options, chunk) for the chunks of xs in the executor.
+
+        The chunks are created while the results are collected, with at most
+        a few chunks per worker waiting, so that xs can be a long iterator.
+        In the pool created here, the options are sent once to each worker;
+        with a given executor, they are sent with each chunk.
+    """
+    if chunksize < 1:
+        msg = "Invalid chunksize @chunksize."
+        raise ZValueError(msg, chunksize=chunksize)
+
+    chunks = iterate_chunks(xs, chunksize)
+    first = next(chunks, None)
+    if first is None:
+        return []
+    second = next(chunks, None)
+    if second is None:
+        if executor is None:
+            # not worth starting the processes
+            return f(options, first)
+        head = [first]
+    else:
+        head = [first, second]
+    chunks = itertools.chain(head, chunks)
+
+    max_pending = MAX_PENDING_PER_WORKER * (max_workers or os.cpu_count() or 1)
+    if executor is None:
+        initargs = (options,)
+        with ProcessPoolExecutor(
+            max_workers=max_workers, initializer=set_worker_options, initargs=initargs
+        ) as pool:
+            futures = (pool.submit(run_chunk_in_worker, f, c) for c in chunks)
+            return collect_in_order(futures, max_pending)
+    else:
+        futures = (executor.submit(f, options, c) for c in chunks)
+        return collect_in_order(futures, max_pending)
+
+
+def collect_in_order(futures: Iterator[Future], max_pending: int) -> list:
+    """ Concatenates the results of the futures, taking the next one from
+        the iterator (which submits it) only when less than max_pending
+        are waiting. """
+    res = []
+    pending: Deque[Future] = collections.deque()
+    for future in futures:
+        pending.append(future)
+        if len(pending) >= max_pending:
+            res.extend(pending.popleft().result())
+    while pending:
+        res.extend(pending.popleft().result())
+    return res
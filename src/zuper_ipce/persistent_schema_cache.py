@@ -0,0 +1,232 @@
+import hashlib
+import importlib
+import os
+from dataclasses import Field, is_dataclass, MISSING
+from types import ModuleType
+from typing import cast, Iterator, List, Optional, Sequence, Union
+
+import cbor2
+
+from zuper_typing.annotations_tricks import (
+    get_ClassVar_arg,
+    get_fields_including_static,
+    get_FixedTuple_args,
+    get_Optional_arg,
+    get_Type_arg,
+    get_Union_args,
+    get_VarTuple_arg,
+    is_ClassVar,
+    is_FixedTuple,
+    is_Optional,
+    is_Type,
+    is_Union,
+    is_VarTuple,
+)
+from zuper_typing.my_dict import (
+    get_DictLike_args,
+    get_ListLike_arg,
+    get_SetLike_arg,
+    is_DictLike,
+    is_ListLike,
+    is_SetLike,
+)
+from .constants import JSONSchema
+from .logging import logger
+from .types import TypeLike
+
+__all__ = [
+    "enable_persistent_schema_cache",
+    "disable_persistent_schema_cache",
+    "warm_schema_cache",
+    "get_persistent_schema_cache_stats",
+]
+
+
+class PersistentSchemaCache:
+    """
+        On-disk cache of the schemas of dataclasses, to be shared across processes.
+
+        There is one file per class (keyed by module and qualname); the file
+        also records the fingerprint of the class definition, and it is
+        ignored if the class changed.
+    """
+
+    dirname: Optional[str] = None
+    hits: int = 0
+    misses: int = 0
+    invalidated: int = 0
+    writes: int = 0
+
+
+def enable_persistent_schema_cache(dirname: str) -> None:
+    if not os.path.exists(dirname):
+        os.makedirs(dirname, exist_ok=True)
+    PersistentSchemaCache.dirname = dirname
+
+
+def disable_persistent_schema_cache() -> None:
+    PersistentSchemaCache.dirname = None
+
+
+def is_persistent_schema_cache_enabled() -> bool:
+    return PersistentSchemaCache.dirname is not None
+
+
+def get_persistent_schema_cache_stats() -> dict:
+    C = PersistentSchemaCache
+    return dict(
+        dirname=C.dirname,
+        hits=C.hits,
+        misses=C.misses,
+        invalidated=C.invalidated,
+        writes=C.writes,
+    )
+
+
+def get_persistent_schema_filename(T: type) -> str:
+    k = f"{T.__module__}:{T.__qualname__}"
+    h = hashlib.sha256(k.encode("utf-8")).hexdigest()[:32]
+    return os.path.join(PersistentSchemaCache.dirname, f"{h}.schema.cbor")
+
+
+def get_persistent_schema(T: type) -> JSONSchema:
+    """ Raises KeyError if not found or if the class changed. """
+    C = PersistentSchemaCache
+    fn = get_persistent_schema_filename(T)
+    try:
+        with open(fn, "rb") as f:
+            data = cbor2.load(f)
+        module, qualname = data["module"], data["qualname"]
+        fingerprint, schema = data["fingerprint"], data["schema"]
+    except FileNotFoundError:
+        C.misses += 1
+        raise KeyError(fn) from None
+    except (OSError, ValueError, KeyError, TypeError):  # pragma: no cover
+        logger.warning(f"Ignoring invalid schema cache file {fn}")
+        C.misses += 1
+        raise KeyError(fn) from None
+
+    if (module, qualname, fingerprint) != (
+        T.__module__,
+        T.__qualname__,
+        get_class_fingerprint(T),
+    ):
+        C.invalidated += 1
+        C.misses += 1
+        raise KeyError(fn)
+    C.hits += 1
+    return cast(JSONSchema, schema)
+
+
+def set_persistent_schema(T: type, schema: JSONSchema) -> None:
+    C = PersistentSchemaCache
+    fn = get_persistent_schema_filename(T)
+    data = {
+        "module": T.__module__,
+        "qualname": T.__qualname__,
+        "fingerprint": get_class_fingerprint(T),
+        "schema": schema,
+    }
+    # write and then rename, so that other processes never see a partial file
+    tmp = f"{fn}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, "wb") as f:
+            cbor2.dump(data, f)
+        os.replace(tmp, fn)
+    except OSError as e:  # pragma: no cover
+        logger.warning(f"Cannot write schema cache file {fn}: {e}")
+        return
+    C.writes += 1
+
+
+def get_class_fingerprint(T: type) -> str:
+    """
+        A digest of the definition of the dataclass T and of all the
+        dataclasses it refers to, so that it changes if any of them changes.
+    """
+    from . import __version__
+
+    m = hashlib.sha256()
+    m.update(__version__.encode("utf-8"))
+    klasses = {}
+    for K in iterate_mentioned_dataclasses(T, ()):
+        klasses[(K.__module__, K.__qualname__)] = K
+    for key in sorted(klasses):
+        m.update(describe_dataclass(klasses[key]).encode("utf-8"))
+    return m.hexdigest()
+
+
+def describe_dataclass(K: type) -> str:
+    s = [K.__module__, K.__qualname__, repr(K.__doc__)]
+    s.extend(_.__qualname__ for _ in K.__mro__)
+    fields_ = get_fields_including_static(K)
+    for name, f in fields_.items():
+        s.append(f"{name}: {f.type!r} = {describe_default(f)}")
+    return "\n".join(s)
+
+
+def describe_default(f: Field) -> str:
+    if f.default is not MISSING:
+        return repr(f.default)
+    elif f.default_factory is not MISSING:
+        factory = f.default_factory
+        return "factory " + getattr(factory, "__qualname__", repr(factory))
+    else:
+        return "-"
+
+
+def iterate_mentioned_dataclasses(T: TypeLike, context: tuple) -> Iterator[type]:
+    if T in context:
+        return
+    c2 = context + (T,)
+    if is_dataclass(T):
+        yield T
+        for f in get_fields_including_static(T).values():
+            yield from iterate_mentioned_dataclasses(f.type, c2)
+    elif is_ClassVar(T):
+        yield from iterate_mentioned_dataclasses(get_ClassVar_arg(T), c2)
+    elif is_Type(T):
+        yield from iterate_mentioned_dataclasses(get_Type_arg(T), c2)
+    elif is_FixedTuple(T):
+        for t in get_FixedTuple_args(T):
+            yield from iterate_mentioned_dataclasses(t, c2)
+    elif is_VarTuple(T):
+        yield from iterate_mentioned_dataclasses(get_VarTuple_arg(T), c2)
+    elif is_ListLike(T):
+        yield from iterate_mentioned_dataclasses(get_ListLike_arg(T), c2)
+    elif is_DictLike(T):
+        for t in get_DictLike_args(T):
+            yield from iterate_mentioned_dataclasses(t, c2)
+    elif is_SetLike(T):
+        yield from iterate_mentioned_dataclasses(get_SetLike_arg(T), c2)
+    elif is_Optional(T):
+        yield from iterate_mentioned_dataclasses(get_Optional_arg(T), c2)
+    elif is_Union(T):
+        for t in get_Union_args(T):
+            yield from iterate_mentioned_dataclasses(t, c2)
+
+
+def warm_schema_cache(modules: Sequence[Union[str, ModuleType]]) -> List[type]:
+    """
+        Computes the schemas of all the dataclasses defined in the given
+        modules, so that they are in the in-memory cache and, if enabled,
+        in the persistent cache. Returns the classes processed.
+    """
+    from .conv_ipce_from_typelike import ipce_from_typelike
+
+    res = []
+    for module in modules:
+        if isinstance(module, str):
+            module = importlib.import_module(module)
+        for name, x in list(vars(module).items()):
+            if not (isinstance(x, type) and is_dataclass(x)):
+                continue
+            if x.__module__ != module.__name__:
+                continue
+            try:
+                ipce_from_typelike(x)
+            except (ValueError, TypeError, AssertionError) as e:
+                logger.warning(f"Cannot warm schema cache for {name}: {e}")
+                continue
+            res.append(x)
+    return res
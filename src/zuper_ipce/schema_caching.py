@@ -1,11 +1,16 @@
-from collections import defaultdict
+import sys
+import threading
+import weakref
+from collections import OrderedDict
 from dataclasses import dataclass, field
-from typing import Dict, Tuple
+from typing import Callable, Dict, List, Optional, Set, Tuple
 
 from zuper_typing.exceptions import ZValueError
-from .constants import JSONSchema, REF_ATT, SCHEMA_ATT, SCHEMA_ID
+from .constants import IEDO, JSONSchema, REF_ATT, SCHEMA_ATT, SCHEMA_ID
 from .ipce_attr import make_key
-from .ipce_spec import assert_canonical_ipce
+from .ipce_spec import assert_canonical_ipce, should_validate
+from .schema_utils import get_schema_digest
+from .types import TypeLike
 
 
 def assert_canonical_schema(x: JSONSchema):
@@ -23,39 +28,110 @@ def assert_canonical_schema(x: JSONSchema):
     # json.dumps(x) # try no bytes
 
 
+def validate_schema(schema: JSONSchema, validation: Optional[int]) -> None:
+    """ Checks the schema according to the validation level (see IESO.validation). """
+    if not should_validate(validation):
+        return
+    try:
+        assert_canonical_schema(schema)
+    except ValueError as e:  # pragma: no cover
+        msg = "Invalid schema"
+        raise ZValueError(msg, schema=schema) from e
+
+
 @dataclass
 class TRE:
+    # checked with validate_schema() by ipce_from_typelike_tr()
     schema: JSONSchema
     used: Dict[str, str] = field(default_factory=dict)
 
-    def __post_init__(self) -> None:
-        try:
-            assert_canonical_schema(self.schema)
-        except ValueError as e:  # pragma: no cover
-            msg = f"Invalid schema"
-            raise ZValueError(msg, schema=self.schema) from e
+
+ContextKey = Tuple[Tuple[str, str], ...]
+
+
+@dataclass
+class IPCETypelikeCacheEntry:
+    # Returns the type, or None if it was garbage collected.
+    ref: Callable[[], Optional[TypeLike]]
+    contexts: Dict[ContextKey, JSONSchema] = field(default_factory=dict)
+    # The keys of contexts, the ones with more context first
+    ordered: List[ContextKey] = field(default_factory=list)
+    # The lengths of the contexts present
+    lengths: Set[int] = field(default_factory=set)
 
 
 class IPCETypelikeCache:
-    c: Dict[Tuple, Dict[Tuple, JSONSchema]] = defaultdict(dict)
+    """
+        Cache from types to their schemas, bounded and LRU-ordered.
 
+        The key (see make_key) contains the id of the type; the entry keeps
+        a weak reference to the type, so that the entry is dropped when the
+        type is garbage collected and a recycled id is never confused
+        with the old type.
 
-# def get_cached():
-#     return {k[1]: [x for x, _ in v.items()] for k, v in IPCETypelikeCache.c.items()}
+        The LRU updates are not atomic, so the accesses hold the lock
+        (the conversions can run in a ThreadPoolExecutor).
+    """
 
+    maxsize: int = 4096
+    c: "OrderedDict[Tuple, IPCETypelikeCacheEntry]" = OrderedDict()
+    # reentrant: the weakref callbacks can run during an access
+    lock = threading.RLock()
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    collected: int = 0
 
-def get_ipce_from_typelike_cache(T, context: Dict[str, str]) -> TRE:
+
+def get_ipce_from_typelike_cache_entry(T: TypeLike) -> IPCETypelikeCacheEntry:
+    """ Raises KeyError if not present or stale. """
+    C = IPCETypelikeCache
     k = make_key(T)
-    if k not in IPCETypelikeCache.c:
+    with C.lock:
+        entry = C.c.get(k, None)
+        if entry is None:
+            raise KeyError()
+        if entry.ref() is not T:
+            # the id was recycled
+            del C.c[k]
+            raise KeyError()
+        C.c.move_to_end(k)
+        return entry
+
+
+def get_ipce_from_typelike_cache(T, context: Dict[str, str]) -> TRE:
+    C = IPCETypelikeCache
+    with C.lock:
+        try:
+            entry = get_ipce_from_typelike_cache_entry(T)
+            context0 = find_compatible_context(entry, context)
+        except KeyError:
+            C.misses += 1
+            raise
+        C.hits += 1
+        return TRE(entry.contexts[context0], dict(context0))
+
+
+def find_compatible_context(
+    entry: IPCETypelikeCacheEntry, context: Dict[str, str]
+) -> ContextKey:
+    """ Returns the most specific cached context compatible with the given one.
+        Raises KeyError if there is none. """
+    if not context:
+        # only the empty context is compatible
+        if () in entry.contexts:
+            return ()
         raise KeyError()
-    items = list(IPCETypelikeCache.c[k].items())
-    # actually first look for the ones with more context
-    items.sort(key=lambda x: len(x[1]), reverse=True)
-    for context0, schema in items:
+
+    # the exact match is the most specific
+    if len(context) in entry.lengths:
+        ci = tuple(sorted(context.items()))
+        if ci in entry.contexts:
+            return ci
+
+    for context0 in entry.ordered:
         if compatible(context0, context):
-            # if context0:
-            # logger.debug(f'Returning cached {T} with context {context0}')
-            return TRE(schema, dict(context0))
+            return context0
     raise KeyError()
 
 
@@ -67,6 +143,202 @@ def compatible(c0: Tuple[Tuple[str, str]], context: Dict[str, str]) -> bool:
 
 
 def set_ipce_from_typelike_cache(T, context: Dict[str, str], schema: JSONSchema):
-    k = make_key(T)
+    C = IPCETypelikeCache
     ci = tuple(sorted(context.items()))
-    IPCETypelikeCache.c[k][ci] = schema
+    with C.lock:
+        try:
+            entry = get_ipce_from_typelike_cache_entry(T)
+        except KeyError:
+            k = make_key(T)
+            entry = IPCETypelikeCacheEntry(make_type_ref(T, k))
+            C.c[k] = entry
+            evict_ipce_from_typelike_cache(C.maxsize)
+        if ci not in entry.contexts:
+            entry.ordered.append(ci)
+            entry.ordered.sort(key=len, reverse=True)
+            entry.lengths.add(len(ci))
+        entry.contexts[ci] = schema
+
+
+def make_type_ref(T: TypeLike, k: Tuple) -> Callable[[], Optional[TypeLike]]:
+    def on_collected(_: object) -> None:
+        C = IPCETypelikeCache
+        with C.lock:
+            entry = C.c.get(k, None)
+            # check it is not a newer entry for a recycled id
+            if entry is not None and entry.ref() is None:
+                del C.c[k]
+                C.collected += 1
+
+    try:
+        return weakref.ref(T, on_collected)
+    except TypeError:
+        # Some typing constructs do not support weak references.
+        def strong() -> TypeLike:
+            return T
+
+        return strong
+
+
+def evict_ipce_from_typelike_cache(maxsize: int) -> None:
+    C = IPCETypelikeCache
+    with C.lock:
+        while len(C.c) > maxsize:
+            C.c.popitem(last=False)
+            C.evictions += 1
+
+
+def set_ipce_from_typelike_cache_size(maxsize: int) -> None:
+    IPCETypelikeCache.maxsize = maxsize
+    evict_ipce_from_typelike_cache(maxsize)
+
+
+def clear_ipce_from_typelike_cache() -> None:
+    C = IPCETypelikeCache
+    with C.lock:
+        C.c.clear()
+        C.hits = C.misses = C.evictions = C.collected = 0
+
+
+def get_ipce_from_typelike_cache_entries() -> List[Tuple[TypeLike, List[ContextKey]]]:
+    """ Returns the types currently cached, with the contexts for each. """
+    res = []
+    with IPCETypelikeCache.lock:
+        entries = list(IPCETypelikeCache.c.values())
+    for entry in entries:
+        T = entry.ref()
+        if T is not None:
+            res.append((T, list(entry.contexts)))
+    return res
+
+
+def get_ipce_from_typelike_cache_stats() -> Dict[str, int]:
+    C = IPCETypelikeCache
+    seen = set()
+    memory = 0
+    ncontexts = 0
+    with C.lock:
+        entries = list(C.c.values())
+    for entry in entries:
+        ncontexts += len(entry.contexts)
+        for ci, schema in entry.contexts.items():
+            memory += estimate_size(ci, seen) + estimate_size(schema, seen)
+    return dict(
+        entries=len(C.c),
+        contexts=ncontexts,
+        maxsize=C.maxsize,
+        hits=C.hits,
+        misses=C.misses,
+        evictions=C.evictions,
+        collected=C.collected,
+        memory_bytes=memory,
+    )
+
+
+def estimate_size(x: object, seen: Set[int]) -> int:
+    """ Rough estimate of the memory used by a schema;
+        the shared parts are counted once. """
+    if id(x) in seen:
+        return 0
+    seen.add(id(x))
+    n = sys.getsizeof(x)
+    if isinstance(x, dict):
+        for k, v in x.items():
+            n += estimate_size(k, seen) + estimate_size(v, seen)
+    elif isinstance(x, (list, tuple)):
+        for v in x:
+            n += estimate_size(v, seen)
+    return n
+
+
+class TypelikeFromIPCECache:
+    """
+        Process-wide cache from schemas to the types synthesized from them.
+
+        ``by_digest`` maps (digest of the schema, IEDO) to the type.
+        ``by_id`` is the identity fast path: it maps the id of a schema
+        dict that was already seen to the schema itself and its digest.
+        The accesses hold the lock, as for IPCETypelikeCache.
+    """
+
+    maxsize: int = 1024
+    by_digest: "OrderedDict[Tuple[str, IEDO], TypeLike]" = OrderedDict()
+    by_id: "OrderedDict[int, Tuple[JSONSchema, str]]" = OrderedDict()
+    lock = threading.RLock()
+    hits: int = 0
+    hits_identity: int = 0
+    misses: int = 0
+
+
+def get_schema_digest_cached(schema: JSONSchema) -> Tuple[str, bool]:
+    """ Returns the digest of the schema, and whether it was
+        found using the identity fast path. """
+    C = TypelikeFromIPCECache
+    k = id(schema)
+    with C.lock:
+        found = C.by_id.get(k, None)
+        if found is not None and found[0] is schema:
+            C.by_id.move_to_end(k)
+            return found[1], True
+    digest = get_schema_digest(schema)
+    with C.lock:
+        C.by_id[k] = (schema, digest)
+        while len(C.by_id) > C.maxsize:
+            C.by_id.popitem(last=False)
+    return digest, False
+
+
+def get_typelike_from_ipce_cache(schema: JSONSchema, iedo: IEDO) -> TypeLike:
+    """ Raises KeyError if the schema was not seen before. """
+    C = TypelikeFromIPCECache
+    digest, identity = get_schema_digest_cached(schema)
+    k = (digest, iedo)
+    with C.lock:
+        try:
+            res = C.by_digest[k]
+        except KeyError:
+            C.misses += 1
+            raise
+        C.by_digest.move_to_end(k)
+        C.hits += 1
+        if identity:
+            C.hits_identity += 1
+        return res
+
+
+def set_typelike_from_ipce_cache(schema: JSONSchema, iedo: IEDO, T: TypeLike) -> None:
+    C = TypelikeFromIPCECache
+    digest, _ = get_schema_digest_cached(schema)
+    with C.lock:
+        C.by_digest[(digest, iedo)] = T
+        while len(C.by_digest) > C.maxsize:
+            C.by_digest.popitem(last=False)
+
+
+def set_typelike_from_ipce_cache_size(maxsize: int) -> None:
+    C = TypelikeFromIPCECache
+    with C.lock:
+        C.maxsize = maxsize
+        while len(C.by_digest) > maxsize:
+            C.by_digest.popitem(last=False)
+        while len(C.by_id) > maxsize:
+            C.by_id.popitem(last=False)
+
+
+def clear_typelike_from_ipce_cache() -> None:
+    C = TypelikeFromIPCECache
+    with C.lock:
+        C.by_digest.clear()
+        C.by_id.clear()
+        C.hits = C.hits_identity = C.misses = 0
+
+
+def get_typelike_from_ipce_cache_stats() -> Dict[str, int]:
+    C = TypelikeFromIPCECache
+    return dict(
+        entries=len(C.by_digest),
+        maxsize=C.maxsize,
+        hits=C.hits,
+        hits_identity=C.hits_identity,
+        misses=C.misses,
+    )
@@ -0,0 +1,217 @@
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Callable, cast, Dict, Iterator, Optional
+
+from zuper_typing.exceptions import ZValueError
+from .constants import (
+    JSC_TITLE,
+    JSC_TITLE_TYPE,
+    JSONSchema,
+    REF_ATT,
+    SCHEMA_ATT,
+    SCHEMA_ID,
+    SCHEMA_REF_ATT,
+)
+from .types import IPCE
+
+__all__ = [
+    "SchemaSession",
+    "compress_schemas",
+    "expand_schemas",
+    "session_scope",
+    "schema_or_ref",
+]
+
+
+@dataclass
+class SchemaSession:
+    """
+        The schemas seen so far in a stream of objects, keyed by digest.
+
+        When encoding with a session, the first time a schema is needed it
+        is written in full, and afterwards it is replaced by
+        ``{"$schema_ref": digest}``. When decoding with a session, the full
+        schemas are remembered and the references are resolved.
+
+        Use one session for the encoder, and one for the decoder, and
+        encode and decode the objects in the same order.
+
+        The references are substituted while the IPCE is created (or written).
+        Within one object, which occurrence of a schema is the full one
+        depends on the order of conversion, so ipce_from_object() and
+        cbor_from_object() might choose different ones; the decoder accepts
+        both.
+    """
+
+    schemas: Dict[str, JSONSchema] = field(default_factory=dict)
+    # Number of schemas replaced by references (or resolved)
+    nrefs: int = 0
+
+
+class ActiveSession:
+    # The session of the conversion running in this thread (see session_scope)
+    local = threading.local()
+
+
+def is_schema_ipce(mj: dict) -> bool:
+    """ True if the dict is a type (the same test done by object_from_ipce_);
+        we do not touch the insides of schemas. """
+    return (
+        mj.get(SCHEMA_ATT, "") == SCHEMA_ID
+        or REF_ATT in mj
+        or mj.get(JSC_TITLE, None) == JSC_TITLE_TYPE
+    )
+
+
+class UnresolvedSchemaRef(Exception):
+    """ A reference to a schema that is written later in the same object. """
+
+
+def transform_schemas(x: IPCE, f: Callable[[JSONSchema], IPCE]) -> IPCE:
+    """
+        Replaces the value s of each "$schema" attribute of the objects with f(s).
+        Only the containers that changed are copied.
+
+        The "$schema" of a dict is visited before its values, which are visited
+        in order. The traversal uses a stack, so there is no recursion limit.
+    """
+    if not is_container(x):
+        return x
+    # Each frame is [container, iterator over (key, value), copy or None, key]
+    stack = [open_frame(x, f, None)]
+    while True:
+        frame = stack[-1]
+        for k, v in frame[1]:
+            if is_container(v):
+                stack.append(open_frame(v, f, k))
+                break
+        else:
+            stack.pop()
+            original, _, res, key = frame
+            x2 = original if res is None else res
+            if not stack:
+                return x2
+            if x2 is not original:
+                parent = stack[-1]
+                if parent[2] is None:
+                    parent[2] = copy_container(parent[0])
+                parent[2][key] = x2
+
+
+def is_container(x: IPCE) -> bool:
+    """ Whether we need to look inside x for the schemas. """
+    return isinstance(x, list) or (isinstance(x, dict) and not is_schema_ipce(x))
+
+
+def copy_container(x: IPCE) -> IPCE:
+    return list(x) if isinstance(x, list) else dict(x)
+
+
+def open_frame(x: IPCE, f: Callable[[JSONSchema], IPCE], key: object) -> list:
+    res = None
+    if isinstance(x, list):
+        items = enumerate(x)
+    else:
+        schema = x.get(SCHEMA_ATT, None)
+        if isinstance(schema, dict):
+            schema2 = f(schema)
+            if schema2 is not schema:
+                res = dict(x)
+                res[SCHEMA_ATT] = schema2
+        items = ((k, v) for k, v in x.items() if k != SCHEMA_ATT)
+    return [x, items, res, key]
+
+
+def get_schema_or_ref(schema: JSONSchema, session: SchemaSession) -> IPCE:
+    """ Returns the reference if the schema was already written in the session. """
+    from .schema_caching import get_schema_digest_cached
+
+    if SCHEMA_REF_ATT in schema:
+        return schema
+    digest, _ = get_schema_digest_cached(schema)
+    if digest in session.schemas:
+        session.nrefs += 1
+        return {SCHEMA_REF_ATT: digest}
+    session.schemas[digest] = schema
+    return schema
+
+
+def resolve_schema_ref(mj: IPCE, session: SchemaSession) -> JSONSchema:
+    """ Returns the schema for the reference, or registers the full schema.
+        Raises UnresolvedSchemaRef if the reference is not known. """
+    from .schema_caching import get_schema_digest_cached
+
+    if SCHEMA_REF_ATT in mj:
+        digest = mj[SCHEMA_REF_ATT]
+        if digest not in session.schemas:
+            raise UnresolvedSchemaRef(digest)
+        session.nrefs += 1
+        return session.schemas[digest]
+    schema = cast(JSONSchema, mj)
+    digest, _ = get_schema_digest_cached(schema)
+    # Keep the first one, so that the same object is used every time.
+    return session.schemas.setdefault(digest, schema)
+
+
+def register_schema(mj: IPCE, session: SchemaSession) -> IPCE:
+    if SCHEMA_REF_ATT not in mj:
+        resolve_schema_ref(mj, session)
+    return mj
+
+
+def compress_schemas(x: IPCE, session: SchemaSession) -> IPCE:
+    """ Replaces the schemas already written in the session with references. """
+    return transform_schemas(x, lambda s: get_schema_or_ref(s, session))
+
+
+def expand_schemas(x: IPCE, session: SchemaSession) -> IPCE:
+    """
+        Replaces the references with the schemas found earlier in the session.
+
+        Within one object, the encoder might have written a schema in full
+        after a reference to it (the objects are converted in field order,
+        but written in CBOR order); in that case the full schemas in the
+        object are registered first.
+    """
+    nrefs = session.nrefs
+    try:
+        return transform_schemas(x, lambda s: resolve_schema_ref(s, session))
+    except UnresolvedSchemaRef:
+        pass
+    session.nrefs = nrefs
+    transform_schemas(x, lambda s: register_schema(s, session))
+    try:
+        return transform_schemas(x, lambda s: resolve_schema_ref(s, session))
+    except UnresolvedSchemaRef as e:
+        (digest,) = e.args
+        msg = "Reference to a schema not found in the session."
+        raise ZValueError(msg, digest=digest, known=list(session.schemas)) from None
+
+
+@contextmanager
+def session_scope(session: Optional[SchemaSession]) -> Iterator[None]:
+    """
+        Makes the session used by schema_or_ref() during a conversion,
+        so that the schemas are replaced while the IPCE is created.
+        Passing None suspends the session of an outer conversion.
+    """
+    previous = getattr(ActiveSession.local, "session", None)
+    ActiveSession.local.session = session
+    try:
+        yield
+    finally:
+        ActiveSession.local.session = previous
+
+
+def get_active_session() -> Optional[SchemaSession]:
+    return getattr(ActiveSession.local, "session", None)
+
+
+def schema_or_ref(schema: JSONSchema) -> IPCE:
+    """ The value of a "$schema" attribute: the reference if the schema was
+        already written in the active session. """
+    session = getattr(ActiveSession.local, "session", None)
+    if session is None:
+        return schema
+    return get_schema_or_ref(schema, session)
@@ -1,12 +1,15 @@
+import hashlib
 from typing import cast
 
+import cbor2
+
 from .constants import JSONSchema, REF_ATT
 
 
-# def schema_hash(k):
-#     ob_cbor = cbor2.dumps(k)
-#     ob_cbor_hash = hashlib.sha256(ob_cbor).digest()
-#     return ob_cbor_hash
+def get_schema_digest(schema: JSONSchema) -> str:
+    """ Returns a digest of the canonical CBOR encoding of the schema. """
+    ob_cbor = cbor2.dumps(schema, canonical=True)
+    return hashlib.sha256(ob_cbor).hexdigest()
 
 
 #
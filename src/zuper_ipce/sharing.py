@@ -0,0 +1,126 @@
+import datetime
+import threading
+from contextlib import contextmanager
+from dataclasses import fields, is_dataclass
+from decimal import Decimal
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+import numpy as np
+from frozendict import frozendict
+
+from .constants import IESO, SCHEMA_ATT, SHARING_OFF, SHARING_VALUE
+from .types import IPCE, TypeLike
+
+__all__ = ["sharing_scope", "get_sharing_memo", "get_sharing_key", "find_shared"]
+
+# The objects that can be shared; the scalars are always converted.
+SHAREABLE = (list, tuple, set, dict, frozendict, np.ndarray)
+
+# The key is (id(ob), st), or (value_key(ob), st) for sharing by value.
+SharingKey = Tuple[object, ...]
+# key -> (ob, IPCE); the object is kept so that its id is not reused
+SharingMemo = Dict[SharingKey, Tuple[object, IPCE]]
+
+
+class SharedIPCEs:
+    # The memo of the conversion running in this thread, if IESO.sharing is on
+    local = threading.local()
+
+
+@contextmanager
+def sharing_scope(ieso: IESO) -> Iterator[None]:
+    """
+        During the conversion of a top-level object, the IPCE of each
+        object that is converted is remembered, so that the other
+        occurrences of the object become references to the same IPCE.
+
+        The nested conversions (e.g. for the members of a Union)
+        use the memo of the outermost one.
+    """
+    if ieso.sharing == SHARING_OFF or get_sharing_memo() is not None:
+        yield
+        return
+    SharedIPCEs.local.memo = {}
+    try:
+        yield
+    finally:
+        SharedIPCEs.local.memo = None
+
+
+def get_sharing_memo() -> Optional[SharingMemo]:
+    return getattr(SharedIPCEs.local, "memo", None)
+
+
+def get_sharing_key(ob: object, st: TypeLike, ieso: IESO) -> Optional[SharingKey]:
+    """ Returns None if the object is not to be shared. """
+    T = type(ob)
+    is_dc = is_dataclass(T)
+    if not (is_dc or isinstance(ob, SHAREABLE)):
+        return None
+    if is_dc and ieso.sharing == SHARING_VALUE and T.__dataclass_params__.frozen:
+        vk = value_key(ob)
+        if vk is not None:
+            key = (vk, st)
+            try:
+                hash(key)
+                return key
+            except TypeError:  # pragma: no cover
+                pass
+    key = (id(ob), st)
+    try:
+        hash(key)
+    except TypeError:  # pragma: no cover
+        return None
+    return key
+
+
+def value_key(x: object) -> Optional[tuple]:
+    """
+        A key that is equal for two values only if they have the same IPCE:
+        unlike ==, it distinguishes 1, 1.0 and True, 0.0 and -0.0,
+        Decimal("1.0") and Decimal("1.00").
+
+        Returns None for the values that are not frozen dataclasses, tuples,
+        or scalars; those are shared only by identity.
+    """
+    T = type(x)
+    if T in (bool, int, str, bytes) or x is None:
+        return T, x
+    if T is float:
+        return T, x.hex()
+    if T in (Decimal, datetime.datetime):
+        return T, str(x)
+    if T is tuple:
+        items = tuple(value_key(_) for _ in x)
+        return None if None in items else (T, items)
+    if is_dataclass(T) and T.__dataclass_params__.frozen:
+        items = tuple(value_key(getattr(x, f.name)) for f in fields(T))
+        return None if None in items else (T, items)
+    return None
+
+
+def find_shared(x: IPCE) -> Set[int]:
+    """
+        Returns the ids of the dicts and lists that appear more than once
+        in the IPCE (as the same object).
+
+        The schemas are not visited: they come from the schema cache,
+        so they are the same objects even if the sharing is off.
+    """
+    seen: Set[int] = set()
+    shared: Set[int] = set()
+    todo: List[IPCE] = [x]
+    while todo:
+        y = todo.pop()
+        if isinstance(y, dict):
+            children = [v for k, v in y.items() if k != SCHEMA_ATT]
+        elif isinstance(y, list):
+            children = y
+        else:
+            continue
+        if id(y) in seen:
+            shared.add(id(y))
+            continue
+        seen.add(id(y))
+        todo.extend(children)
+    return shared
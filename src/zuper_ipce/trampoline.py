@@ -0,0 +1,59 @@
+from types import GeneratorType
+from typing import Callable, Generator, List, Optional, Union
+
+__all__ = ["run_trampoline", "Steps", "lazy_steps"]
+
+# A conversion written as a generator: it yields the generators for the
+# values it needs, receives their results, and returns its own result.
+# Instead of a generator, it can yield a value already converted:
+# the conversions of the leaves do not need to create the steps.
+Steps = Generator[Union["Steps", object], object, object]
+
+
+def run_trampoline(g0: Union[Steps, object]) -> object:
+    """
+        Runs the generator g0, and the generators that it yields
+        (recursively), sending back to each its result,
+        or throwing into it the exception that was raised.
+        A yielded value that is not a generator is sent back as it is;
+        if g0 is not a generator, it is the result.
+
+        This uses an explicit stack, so that the depth of the
+        structures is limited only by memory, not by the recursion limit.
+    """
+    if not isinstance(g0, GeneratorType):
+        return g0
+    stack: List[Steps] = [g0]
+    to_send: object = None
+    to_throw: Optional[BaseException] = None
+    while True:
+        g = stack[-1]
+        try:
+            if to_throw is not None:
+                e, to_throw = to_throw, None
+                child = g.throw(e)
+            else:
+                child = g.send(to_send)
+        except StopIteration as s:
+            stack.pop()
+            if not stack:
+                return s.value
+            to_send = s.value
+            continue
+        except BaseException as e:
+            stack.pop()
+            if not stack:
+                raise
+            to_throw = e
+            continue
+        if isinstance(child, GeneratorType):
+            stack.append(child)
+            to_send = None
+        else:
+            to_send = child
+
+
+def lazy_steps(f: Callable[..., Union[Steps, object]], *args, **kwargs) -> Steps:
+    """ The steps that call f(*args, **kwargs) only when they are run,
+        for example inside the try block of the caller. """
+    return (yield f(*args, **kwargs))
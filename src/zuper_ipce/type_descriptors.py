@@ -0,0 +1,108 @@
+from dataclasses import dataclass
+from typing import Dict, Tuple
+
+from zuper_typing.annotations_tricks import (
+    get_FixedTuple_args,
+    get_Optional_arg,
+    get_Union_args,
+    get_VarTuple_arg,
+    is_FixedTuple,
+    is_Optional,
+    is_Union,
+    is_VarTuple,
+)
+from zuper_typing.my_dict import (
+    get_DictLike_args,
+    get_ListLike_arg,
+    get_SetLike_arg,
+    is_DictLike,
+    is_ListLike,
+    is_SetLike,
+)
+from zuper_typing.my_intersection import get_Intersection_args, is_Intersection
+from .types import is_unconstrained, TypeLike
+
+__all__ = [
+    "get_type_descriptor",
+    "TypeDescriptor",
+    "KIND_UNCONSTRAINED",
+    "KIND_OPTIONAL",
+    "KIND_UNION",
+    "KIND_INTERSECTION",
+    "KIND_VAR_TUPLE",
+    "KIND_FIXED_TUPLE",
+    "KIND_LIST",
+    "KIND_DICT",
+    "KIND_SET",
+    "KIND_OTHER",
+]
+
+KIND_UNCONSTRAINED = "unconstrained"  # object, Any
+KIND_OPTIONAL = "Optional"  # args: (X,)
+KIND_UNION = "Union"  # args: the members
+KIND_INTERSECTION = "Intersection"  # args: the members
+KIND_VAR_TUPLE = "VarTuple"  # args: (X,)
+KIND_FIXED_TUPLE = "FixedTuple"  # args: the members
+KIND_LIST = "List"  # args: (X,)
+KIND_DICT = "Dict"  # args: (K, V)
+KIND_SET = "Set"  # args: (X,)
+KIND_OTHER = "other"
+
+TUPLE_KINDS = (KIND_VAR_TUPLE, KIND_FIXED_TUPLE)
+
+
+@dataclass(frozen=True)
+class TypeDescriptor:
+    """ What the annotations_tricks predicates say about a TypeLike. """
+
+    kind: str
+    args: Tuple[TypeLike, ...] = ()
+
+    @property
+    def is_tuple(self) -> bool:
+        return self.kind in TUPLE_KINDS
+
+
+class TypeDescriptors:
+    # id(T) -> (T, descriptor). We use the identity because equal types can
+    # differ in ways that matter: Union[int, str] == Union[str, int].
+    cache: Dict[int, Tuple[TypeLike, TypeDescriptor]] = {}
+    max_size = 10000
+
+
+def get_type_descriptor(T: TypeLike) -> TypeDescriptor:
+    """ Classifies T, only the first time it is seen. """
+    try:
+        T0, d = TypeDescriptors.cache[id(T)]
+        if T0 is T:
+            return d
+    except KeyError:
+        pass
+    d = compile_type_descriptor(T)
+    if len(TypeDescriptors.cache) >= TypeDescriptors.max_size:
+        TypeDescriptors.cache.clear()
+    # Keeping T alive ensures that its id is not reused.
+    TypeDescriptors.cache[id(T)] = T, d
+    return d
+
+
+def compile_type_descriptor(T: TypeLike) -> TypeDescriptor:
+    if is_unconstrained(T):
+        return TypeDescriptor(KIND_UNCONSTRAINED)
+    if is_Optional(T):
+        return TypeDescriptor(KIND_OPTIONAL, (get_Optional_arg(T),))
+    if is_Union(T):
+        return TypeDescriptor(KIND_UNION, tuple(get_Union_args(T)))
+    if is_Intersection(T):
+        return TypeDescriptor(KIND_INTERSECTION, tuple(get_Intersection_args(T)))
+    if is_VarTuple(T):
+        return TypeDescriptor(KIND_VAR_TUPLE, (get_VarTuple_arg(T),))
+    if is_FixedTuple(T):
+        return TypeDescriptor(KIND_FIXED_TUPLE, tuple(get_FixedTuple_args(T)))
+    if is_ListLike(T):
+        return TypeDescriptor(KIND_LIST, (get_ListLike_arg(T),))
+    if is_DictLike(T):
+        return TypeDescriptor(KIND_DICT, tuple(get_DictLike_args(T)))
+    if is_SetLike(T):
+        return TypeDescriptor(KIND_SET, (get_SetLike_arg(T),))
+    return TypeDescriptor(KIND_OTHER)
@@ -0,0 +1,64 @@
+from typing import List, Optional, Union
+
+from nose.tools import assert_equal, raises
+
+from zuper_ipce import (
+    IESO,
+    ipce_from_object,
+    ipce_from_objects,
+    object_from_ipce,
+    objects_from_ipces,
+)
+from zuper_ipce.schema_session import SchemaSession
+from zuper_typing import dataclass
+
+
+@dataclass
+class B1:
+    a: int
+    b: List[float]
+    c: Optional[str] = None
+
+
+@dataclass
+class B2(B1):
+    d: int = 0
+
+
+def get_obs(n: int) -> List[B1]:
+    return [B1(i, [i / 2], None if i % 2 else "x") for i in range(n)]
+
+
+def test_batch_same_as_single():
+    obs = get_obs(10) + [B2(1, [], d=3)]
+    for with_schema in [True, False]:
+        ieso = IESO(with_schema=with_schema)
+        expected = [ipce_from_object(ob, B1, ieso=ieso) for ob in obs]
+        obtained = ipce_from_objects(obs, B1, ieso=ieso)
+        assert_equal(expected, obtained)
+
+        expected2 = [object_from_ipce(_, B1) for _ in expected]
+        obtained2 = objects_from_ipces(obtained, B1)
+        assert_equal(expected2, obtained2)
+    assert_equal(obtained2[:10], obs[:10])
+
+
+def test_batch_lazy():
+    obs = get_obs(5) + [1, "a"]
+    T = Union[B1, int, str]
+    it = ipce_from_objects(obs, T, lazy=True)
+    assert not isinstance(it, list)
+    it2 = objects_from_ipces(it, T, lazy=True)
+    assert_equal(list(it2), obs)
+
+
+def test_batch_session():
+    obs = get_obs(5)
+    ipces = ipce_from_objects(obs, session=SchemaSession())
+    obs2 = objects_from_ipces(ipces, session=SchemaSession())
+    assert_equal(obs, obs2)
+
+
+@raises(ValueError)
+def test_batch_error():
+    objects_from_ipces([{"a": 1, "b": []}, {"b": []}], B1)
@@ -0,0 +1,56 @@
+import io
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple, Union
+
+import cbor2
+import numpy as np
+import pytz
+from nose.tools import assert_equal
+
+from zuper_ipce import IESO, ipce_from_object
+from zuper_ipce.conv_cbor_from_object import cbor_from_object
+from zuper_typing import dataclass
+
+
+def check_same_bytes(ob: object, suggest_type=object) -> None:
+    for with_schema in [True, False]:
+        ieso = IESO(with_schema=with_schema)
+        expected = cbor2.dumps(ipce_from_object(ob, suggest_type, ieso=ieso))
+        obtained = cbor_from_object(ob, suggest_type=suggest_type, ieso=ieso)
+        assert_equal(expected, obtained)
+
+
+def test_cbor_from_object_scalars():
+    for x in [1, "a", 2.5, True, None, b"bytes", [1, 2, 3], (1, "a")]:
+        check_same_bytes(x)
+    check_same_bytes(datetime.now(tz=pytz.utc))
+
+
+def test_cbor_from_object_dataclass():
+    @dataclass
+    class CB1:
+        a: int
+        values: List[float]
+        d: Dict[str, int]
+        s: Set[int]
+        t: Tuple[int, ...]
+        u: Union[int, str]
+        o: "Optional[CB1]" = None
+        rest: Dict[int, str] = None
+
+    x = CB1(1, [0.5] * 30, {"b": 1, "aa": 2}, {1, 2}, (1, 2), "x")
+    y = CB1(2, [], {}, set(), (), 3, o=x, rest={1: "a"})
+    check_same_bytes(y)
+    check_same_bytes([x, y])
+
+
+def test_cbor_from_object_stream():
+    @dataclass
+    class CB2:
+        a: np.ndarray
+        b: object
+
+    ob = CB2(np.zeros((2, 3)), {(1, 2): "x"})
+    f = io.BytesIO()
+    cbor_from_object(ob, f)
+    assert_equal(f.getvalue(), cbor2.dumps(ipce_from_object(ob)))
@@ -0,0 +1,131 @@
+import os
+import tempfile
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, List, Optional
+
+import cbor2
+import numpy as np
+import pytz
+from nose.tools import assert_equal, raises
+from numpy.testing import assert_allclose
+
+from zuper_ipce import IEDO, ipce_from_object, NumpyCompression, object_from_ipce
+from zuper_ipce.cbor_mmap import read_cbor_mmap, read_cbor_objects_mmap
+from zuper_ipce.constants import IESO
+from zuper_ipce.conv_cbor_from_object import cbor_from_object
+from zuper_ipce.json2cbor import read_cbor_or_json_objects, tag_hook
+from zuper_typing import dataclass
+
+
+@dataclass
+class M1:
+    a: np.ndarray
+    b: object
+    data: bytes
+    c: Dict[str, List[Optional[float]]]
+    d: datetime
+    e: Decimal
+
+
+def get_m1() -> M1:
+    x = np.random.rand(30, 20)
+    now = datetime.now(tz=pytz.utc)
+    c = {"x": [1.5, None, -2.0], "yy": []}
+    return M1(x, x[::2], b"not an array" * 10, c, now, Decimal("1.25"))
+
+
+def write_tmp(data: bytes) -> str:
+    fd, fn = tempfile.mkstemp(suffix=".ipce.cbor")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    return fn
+
+
+def test_mmap_same_as_cbor2():
+    ob = get_m1()
+    for numpy_tags in [False, True]:
+        data = cbor_from_object(ob, numpy_tags=numpy_tags)
+        fn = write_tmp(data)
+        try:
+            mj = read_cbor_mmap(fn)
+            mj2 = cbor2.loads(data, tag_hook=tag_hook)
+            ob1 = object_from_ipce(mj, M1)
+            ob2 = object_from_ipce(mj2, M1)
+            assert_allclose(ob1.a, ob.a)
+            assert_allclose(ob1.b, ob.b)
+            assert_equal(ob1.data, ob.data)
+            assert_equal((ob1.c, ob1.d, ob1.e), (ob2.c, ob2.d, ob2.e))
+            # a view, not a copy
+            assert not ob1.a.flags.owndata
+            assert not ob1.a.flags.writeable
+        finally:
+            os.unlink(fn)
+
+
+def test_mmap_writable():
+    x = np.arange(1000, dtype="int32")
+    data = cbor2.dumps(ipce_from_object(x)) * 3
+    fn = write_tmp(data)
+    try:
+        mjs = list(read_cbor_objects_mmap(fn, writable=True))
+        assert_equal(len(mjs), 3)
+        iedo = IEDO(False, False)
+        a = object_from_ipce(mjs[0], np.ndarray, iedo=iedo)
+        a[0] = 42
+        # copy on write: the other objects and the file are not changed
+        assert_equal(object_from_ipce(mjs[1], np.ndarray, iedo=iedo)[0], 0)
+        assert_equal(read_cbor_mmap(fn)["data"][:4].tobytes(), x[:1].tobytes())
+    finally:
+        os.unlink(fn)
+
+
+def test_mmap_compressed():
+    x = np.zeros((100, 100))
+    ieso = IESO(numpy_compression=NumpyCompression(min_size=0, chunk_size=4096))
+    fn = write_tmp(cbor_from_object(x, ieso=ieso))
+    try:
+        assert_allclose(object_from_ipce(read_cbor_mmap(fn), np.ndarray), x)
+    finally:
+        os.unlink(fn)
+
+
+@dataclass
+class LooksLikeNumpy:
+    data: bytes
+    shape: List[int]
+    dtype: str
+
+
+def test_mmap_not_numpy():
+    ob = LooksLikeNumpy(b"abc" * 100, [300], "uint8")
+    fn = write_tmp(cbor_from_object(ob))
+    try:
+        mj = read_cbor_mmap(fn)
+        # only the numpy encoding keeps the view
+        assert_equal(type(mj["data"]), bytes)
+        assert_equal(object_from_ipce(mj, LooksLikeNumpy), ob)
+    finally:
+        os.unlink(fn)
+
+
+def test_mmap_reader():
+    x = np.arange(1000, dtype="int32")
+    fn = write_tmp(cbor2.dumps(ipce_from_object(x)) * 2)
+    try:
+        with open(fn, "rb") as f:
+            mjs = list(read_cbor_or_json_objects(f, use_mmap=True))
+        assert_equal(len(mjs), 2)
+        assert_equal(type(mjs[1]["data"]), memoryview)
+        assert_allclose(object_from_ipce(mjs[1], np.ndarray), x)
+    finally:
+        os.unlink(fn)
+
+
+@raises(ValueError)
+def test_mmap_empty():
+    fn = write_tmp(b"")
+    try:
+        read_cbor_mmap(fn)
+    finally:
+        os.unlink(fn)
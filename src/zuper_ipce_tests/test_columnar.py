@@ -0,0 +1,90 @@
+from typing import List, Optional
+
+import cbor2
+from nose.tools import assert_equal
+
+from zuper_ipce import IESO, ipce_from_object, object_from_ipce
+from zuper_ipce.constants import COLUMNS_ATT
+from zuper_ipce.conv_cbor_from_object import cbor_from_object
+from zuper_typing import dataclass
+
+
+@dataclass
+class Pos:
+    x: float
+    y: float
+
+
+@dataclass
+class Record:
+    t: int
+    value: float
+    ok: bool
+    label: str
+    pos: Pos
+    note: Optional[str] = None
+
+
+@dataclass
+class Batch:
+    records: List[Record]
+    other: List[Pos]
+
+
+def get_records(n: int) -> List[Record]:
+    res = []
+    for i in range(n):
+        pos = Pos(i * 1.0, -i * 1.0)
+        note = None if i % 4 else "!"
+        res.append(Record(i, i * 0.5, i % 2 == 0, f"r{i % 3}", pos, note))
+    return res
+
+
+def test_columnar_roundtrip():
+    b = Batch(get_records(50), [Pos(1.0, 2.0), Pos(3.0, 4.0)])
+    for with_schema in [True, False]:
+        ieso = IESO(with_schema=with_schema, columnar=True)
+        ipce = ipce_from_object(b, ieso=ieso)
+        columns = ipce["records"][COLUMNS_ATT]
+        assert isinstance(columns["t"], dict), columns["t"]
+        assert isinstance(columns["label"], list)
+        assert COLUMNS_ATT in ipce["other"]
+        b2 = object_from_ipce(ipce, Batch)
+        assert_equal(b, b2)
+
+        assert_equal(cbor_from_object(b, ieso=ieso), cbor2.dumps(ipce))
+
+        rows = cbor2.dumps(ipce_from_object(b, ieso=IESO(with_schema=with_schema)))
+        assert len(cbor2.dumps(ipce)) < len(rows)
+
+
+def test_columnar_objects():
+    # only with a schema the decoder can know the type of the elements
+    ob = [Pos(1.0, 2.0), Pos(3.0, 4.0)]
+    ipce = ipce_from_object(ob, List[object], ieso=IESO(columnar=True))
+    assert COLUMNS_ATT in ipce
+    assert_equal(object_from_ipce(ipce, List[object]), ob)
+
+
+def test_columnar_toplevel():
+    records = get_records(10)
+    ipce = ipce_from_object(records, ieso=IESO(columnar=True))
+    assert COLUMNS_ATT in ipce
+    assert_equal(object_from_ipce(ipce), records)
+
+
+def test_columnar_fallbacks():
+    # big ints are not a numeric column
+    records = get_records(3)
+    records[1].t = 2 ** 70
+    ipce = ipce_from_object(records, List[Record], ieso=IESO(columnar=True))
+    assert isinstance(ipce[COLUMNS_ATT]["t"], list)
+    assert_equal(object_from_ipce(ipce, List[Record]), records)
+
+    # mixed types are encoded by rows
+    mixed = [Pos(1.0, 2.0), get_records(1)[0]]
+    ipce = ipce_from_object(mixed, ieso=IESO(columnar=True))
+    assert isinstance(ipce, list)
+
+    # and so are empty lists
+    assert_equal(ipce_from_object([], List[Pos], ieso=IESO(columnar=True)), [])
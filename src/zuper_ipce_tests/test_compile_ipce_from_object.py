@@ -0,0 +1,92 @@
+from dataclasses import field
+from typing import List, Optional
+
+from nose.tools import assert_equal, raises
+
+from zuper_ipce import IESO, ipce_from_object
+from zuper_ipce.compile_ipce_from_object import get_ipce_from_object_plan
+from zuper_ipce.ipce_spec import assert_sorted_dict_cbor_ord
+from zuper_typing import dataclass
+from .test_utils import assert_object_roundtrip
+
+
+def test_compile_plan_cached():
+    @dataclass
+    class C1:
+        a: int
+
+    ieso = IESO(with_schema=True)
+    p1 = get_ipce_from_object_plan(C1, ieso)
+    p2 = get_ipce_from_object_plan(C1, IESO(with_schema=True))
+    assert p1 is p2
+    p3 = get_ipce_from_object_plan(C1, IESO(with_schema=False))
+    assert p1 is not p3
+
+
+def test_compile_plan_subclass():
+    @dataclass
+    class C2:
+        a: int
+
+    @dataclass
+    class C3(C2):
+        b: int = 2
+
+    ieso = IESO(with_schema=False)
+    get_ipce_from_object_plan(C2, ieso)
+    res = ipce_from_object(C3(1, 3), ieso=ieso)
+    assert_equal(res, {"a": 1, "b": 3})
+
+
+def test_compile_plan_defaults_and_order():
+    @dataclass
+    class C4:
+        zz: int
+        a: str = "x"
+        bbbbbbbbbb: List[int] = field(default_factory=list)
+        c: Optional[float] = None
+
+    ieso = IESO(with_schema=False)
+    res = ipce_from_object(C4(1), ieso=ieso)
+    assert_equal(res, {"zz": 1})
+    res = ipce_from_object(C4(1, "y", [1], 2.0), ieso=ieso)
+    assert_equal(list(res), ["a", "c", "zz", "bbbbbbbbbb"])
+
+    res = ipce_from_object(C4(1, "y", [1], 2.0))
+    assert_sorted_dict_cbor_ord(res)
+    assert_object_roundtrip(C4(1, "y", [1], 2.0))
+
+
+def test_compile_plan_default_factory():
+    current = [5]
+
+    @dataclass
+    class C7:
+        a: int = field(default_factory=lambda: current[0])
+
+    ieso = IESO(with_schema=False)
+    assert_equal(ipce_from_object(C7(), ieso=ieso), {})
+    # the factory is called for each value, not once in the plan
+    current[0] = 7
+    assert_equal(ipce_from_object(C7(5), ieso=ieso), {"a": 5})
+    assert_equal(ipce_from_object(C7(), ieso=ieso), {})
+
+
+def test_compile_plan_hints():
+    @dataclass
+    class C5:
+        a: object
+
+    res = ipce_from_object(C5((1, 2)))
+    assert "$hints" in res
+    assert_sorted_dict_cbor_ord(res)
+
+
+@raises(ValueError)
+def test_compile_plan_wrong_type():
+    @dataclass
+    class C6:
+        a: int
+
+    # noinspection PyTypeChecker
+    ipce_from_object(C6("not an int"))
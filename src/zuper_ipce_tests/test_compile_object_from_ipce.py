@@ -0,0 +1,71 @@
+from dataclasses import field
+from typing import ClassVar, List, Optional
+
+from nose.tools import assert_equal, raises
+
+from zuper_ipce import IESO, ipce_from_object, object_from_ipce
+from zuper_ipce.compile_object_from_ipce import get_object_from_ipce_plan
+from zuper_typing import dataclass
+
+
+def test_compile_decode_plan_cached():
+    @dataclass
+    class D1:
+        a: int
+
+    p1 = get_object_from_ipce_plan(D1)
+    p2 = get_object_from_ipce_plan(D1)
+    assert p1 is p2
+
+
+def test_compile_decode_defaults():
+    @dataclass
+    class D2:
+        a: int
+        K: ClassVar[int] = 2
+        b: str = "x"
+        c: List[int] = field(default_factory=list)
+        d: Optional[float] = None
+
+    ieso = IESO(with_schema=False)
+    ob = D2(1)
+    ipce = ipce_from_object(ob, ieso=ieso)
+    assert_equal(ipce, {"a": 1})
+    ob2 = object_from_ipce(ipce, D2)
+    assert_equal(ob, ob2)
+
+    ob = D2(1, "y", [1, 2], 3.0)
+    ob2 = object_from_ipce(ipce_from_object(ob, ieso=ieso), D2)
+    assert_equal(ob, ob2)
+
+
+def test_compile_decode_subclass():
+    @dataclass
+    class D3:
+        a: int
+
+    @dataclass
+    class D4(D3):
+        b: int = 0
+
+    get_object_from_ipce_plan(D3)
+    ob = object_from_ipce({"a": 1, "b": 2}, D4)
+    assert_equal(ob, D4(1, 2))
+
+
+@raises(ValueError)
+def test_compile_decode_missing():
+    @dataclass
+    class D5:
+        a: int
+
+    object_from_ipce({}, D5)
+
+
+@raises(ValueError)
+def test_compile_decode_wrong_type():
+    @dataclass
+    class D6:
+        a: int
+
+    object_from_ipce({"a": "not an int"}, D6)
@@ -0,0 +1,74 @@
+import enum
+from typing import List, Optional
+from uuid import UUID, uuid4
+
+import cbor2
+from nose.tools import assert_equal, raises
+
+from zuper_ipce import IESO, ipce_from_object, register_ipce_from_object
+from zuper_ipce.conv_cbor_from_object import cbor_from_object
+from zuper_ipce.conv_ipce_from_object import (
+    get_ipce_from_object_handler,
+    ipce_as_is,
+    IPCEFromObjectHandlers,
+)
+from zuper_typing import dataclass
+
+
+class Color(enum.IntEnum):
+    RED = 1
+    GREEN = 2
+
+
+def unregister(T: type) -> None:
+    IPCEFromObjectHandlers.registered.pop(T, None)
+    IPCEFromObjectHandlers.cache.clear()
+
+
+def test_dispatch_cached():
+    assert get_ipce_from_object_handler(int, object) is ipce_as_is
+    assert get_ipce_from_object_handler(int, Optional[int]) is not ipce_as_is
+    assert (int, object) in IPCEFromObjectHandlers.cache
+    x = [1, "a", None, 2.0]
+    assert_equal(ipce_from_object(x, List[object]), x)
+
+
+def test_dispatch_cache_bounded():
+    max_size = IPCEFromObjectHandlers.max_size
+    IPCEFromObjectHandlers.max_size = 5
+    try:
+        for i in range(20):
+            T = type(f"Bounded{i}", (), {})
+            get_ipce_from_object_handler(T, object)
+            assert len(IPCEFromObjectHandlers.cache) <= 5
+    finally:
+        IPCEFromObjectHandlers.max_size = max_size
+
+
+def test_dispatch_register():
+    @dataclass
+    class WithIds:
+        a: object
+        b: List[object]
+        c: int
+
+    u = uuid4()
+    ob = WithIds(u, [u, Color.GREEN], Color.RED)
+    register_ipce_from_object(UUID, lambda x, st, **_: str(x))
+    register_ipce_from_object(enum.Enum, lambda x, st, **_: x.name)
+    try:
+        ieso = IESO(with_schema=False)
+        ipce = ipce_from_object(ob, ieso=ieso)
+        assert_equal(ipce, {"a": str(u), "b": [str(u), "GREEN"], "c": "RED"})
+        assert_equal(cbor_from_object(ob, ieso=ieso), cbor2.dumps(ipce))
+    finally:
+        unregister(UUID)
+        unregister(enum.Enum)
+
+    # back to the defaults
+    assert_equal(ipce_from_object(Color.RED, ieso=IESO(with_schema=False)), 1)
+
+
+@raises(ValueError)
+def test_dispatch_register_builtin():
+    register_ipce_from_object(int, lambda x, st, **_: x)
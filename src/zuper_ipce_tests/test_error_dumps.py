@@ -0,0 +1,60 @@
+import os
+import tempfile
+from typing import Union
+
+from nose.tools import assert_equal
+
+from zuper_ipce import object_from_ipce
+from zuper_ipce.conv_object_from_ipce import (
+    disable_error_dumps,
+    enable_error_dumps,
+    ErrorDumps,
+)
+from zuper_ipce.exceptions import FailedAttempt
+from zuper_typing import dataclass
+
+
+@dataclass
+class ED1:
+    a: int
+
+
+def deserialize_bad() -> ValueError:
+    try:
+        object_from_ipce({"a": "x"}, Union[ED1, int])
+    except ValueError as e:
+        return e
+    raise AssertionError()  # pragma: no cover
+
+
+def test_error_dumps_disabled():
+    assert_equal(ErrorDumps.dirname, None)
+    d = tempfile.mkdtemp()
+    cwd = os.getcwd()
+    os.chdir(d)
+    try:
+        deserialize_bad()
+    finally:
+        os.chdir(cwd)
+    assert_equal(os.listdir(d), [])
+
+
+def test_error_dumps_enabled():
+    d = tempfile.mkdtemp()
+    enable_error_dumps(d)
+    try:
+        e = deserialize_bad()
+    finally:
+        disable_error_dumps()
+    assert len(os.listdir(d)) == 1, os.listdir(d)
+    assert d in str(e)
+
+
+def test_failed_attempt_lazy():
+    try:
+        int("x")
+    except ValueError as e:
+        fa = FailedAttempt(int, e)
+    s = str(fa)
+    assert "Traceback" in s, s
+    assert "invalid literal" in s, s
@@ -0,0 +1,89 @@
+import io
+import json
+import timeit
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, List, Optional, Set, Tuple, Union
+
+import numpy as np
+import pytz
+from nose.tools import assert_equal
+
+from zuper_ipce import IESO, ipce_from_object, logger
+from zuper_ipce.conv_json_from_object import json_from_object
+from zuper_ipce.json_utils import encode_bytes_before_json_serialization
+from zuper_typing import dataclass
+
+
+def check_same_json(ob: object, suggest_type=object) -> None:
+    for with_schema in [True, False]:
+        ieso = IESO(with_schema=with_schema)
+        ipce = ipce_from_object(ob, suggest_type, ieso=ieso)
+        expected = json.dumps(encode_bytes_before_json_serialization(ipce))
+        obtained = json_from_object(ob, suggest_type=suggest_type, ieso=ieso)
+        assert_equal(expected, obtained)
+
+
+def test_json_from_object_scalars():
+    for x in [1, "a", 2.5, True, None, b"bytes", Decimal("1.5"), [], [1, 2], (1, "a")]:
+        check_same_json(x)
+    check_same_json(datetime.now(tz=pytz.utc))
+
+
+def test_json_from_object_dataclass():
+    @dataclass
+    class JS1:
+        a: int
+        values: List[float]
+        d: Dict[str, int]
+        s: Set[int]
+        t: Tuple[int, ...]
+        u: Union[int, str]
+        o: "Optional[JS1]" = None
+        rest: Dict[int, bytes] = None
+
+    x = JS1(1, [0.5] * 30, {"b": 1, "aa": 2}, {1, 2}, (1, 2), "x")
+    y = JS1(2, [], {}, set(), (), 3, o=x, rest={1: b"a"})
+    check_same_json(y)
+    check_same_json([x, y])
+
+
+def test_json_from_object_stream():
+    @dataclass
+    class JS2:
+        a: np.ndarray
+        b: object
+
+    ob = JS2(np.zeros((2, 3)), {(1, 2): "x"})
+    f = io.StringIO()
+    json_from_object(ob, f)
+    ipce = ipce_from_object(ob)
+    assert_equal(f.getvalue(), json.dumps(encode_bytes_before_json_serialization(ipce)))
+
+
+def test_json_from_object_benchmark():
+    """ Compares with the path through the IPCE, on many small records. """
+
+    @dataclass
+    class JS3:
+        name: str
+        t: float
+        values: List[float]
+        counts: Dict[str, int]
+
+    obs = [JS3(f"r{i}", i * 0.5, [0.25] * 20, {"a": i, "b": -i}) for i in range(500)]
+    ieso = IESO(with_schema=False)
+
+    def old() -> str:
+        ipce = ipce_from_object(obs, List[JS3], ieso=ieso)
+        return json.dumps(encode_bytes_before_json_serialization(ipce))
+
+    def new() -> str:
+        return json_from_object(obs, suggest_type=List[JS3], ieso=ieso)
+
+    assert_equal(old(), new())
+    t_old = min(timeit.repeat(old, number=3, repeat=3))
+    t_new = min(timeit.repeat(new, number=3, repeat=3))
+    logger.info(f"json: through the IPCE {t_old:.3f}s, json_from_object {t_new:.3f}s")
+    # generous, to avoid spurious failures on loaded machines
+    assert t_new < 2 * t_old, (t_new, t_old)
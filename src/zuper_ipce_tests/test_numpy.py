@@ -1,10 +1,24 @@
 from dataclasses import field
 
+import cbor2
 import numpy as np
+from nose.tools import assert_equal, raises
 from numpy.testing import assert_allclose
 
+from zuper_ipce import (
+    IEDO,
+    IESO,
+    ipce_from_object,
+    NumpyCompression,
+    object_from_ipce,
+)
+from zuper_ipce.conv_cbor_from_object import cbor_from_object
 from zuper_ipce.json_utils import encode_bytes_before_json_serialization
-from zuper_ipce.numpy_encoding import ipce_from_numpy_array, numpy_array_from_ipce
+from zuper_ipce.numpy_encoding import (
+    ipce_from_numpy_array,
+    numpy_array_buffer,
+    numpy_array_from_ipce,
+)
 from zuper_typing import dataclass
 from .test_utils import assert_object_roundtrip, assert_type_roundtrip
 
@@ -55,3 +69,131 @@ def test_numpy_04():
     # print(json.dumps(d1, indent=3))
     y = numpy_array_from_ipce(d)
     assert_allclose(x, y)
+
+
+def test_numpy_buffer():
+    x = np.random.rand(4, 6)
+    for a in [x, x[:, ::2], x.T, np.array(0.23), np.zeros((0, 3))]:
+        b = numpy_array_buffer(a)
+        assert_equal(bytes(b), a.tobytes())
+    # no copy for C-contiguous arrays
+    b = numpy_array_buffer(x)
+    x[0, 0] = 42.0
+    assert_equal(bytes(b), x.tobytes())
+
+
+def test_numpy_writable():
+    x = np.random.rand(2, 3)
+    d = ipce_from_numpy_array(x)
+    assert not numpy_array_from_ipce(d).flags.writeable
+    y = numpy_array_from_ipce(d, writable=True)
+    assert y.flags.writeable
+    assert_allclose(x, y)
+
+    # backed by the buffer if it is already writable
+    d2 = dict(d, data=bytearray(d["data"]))
+    z = numpy_array_from_ipce(d2, writable=True)
+    z[0, 0] = 42.0
+    assert_equal(bytes(d2["data"][:8]), z[0, :1].tobytes())
+
+
+def test_numpy_cbor_stream():
+    @dataclass
+    class C2:
+        data: np.ndarray
+
+    x = np.random.rand(5, 4)
+    for a in [x, x[:, ::2], np.array(0.23, dtype="float32")]:
+        ob = C2(a)
+        for with_schema in [True, False]:
+            ieso = IESO(with_schema=with_schema)
+            expected = cbor2.dumps(ipce_from_object(ob, ieso=ieso))
+            assert_equal(cbor_from_object(ob, ieso=ieso), expected)
+
+    ob2 = object_from_ipce(
+        ipce_from_object(C2(x)), C2, iedo=IEDO(False, False, numpy_writable=True)
+    )
+    assert ob2.data.flags.writeable
+
+
+def test_numpy_cbor_tags():
+    from zuper_ipce.json2cbor import tag_hook
+    from zuper_ipce.numpy_encoding import cbor_tag_from_dtype, dtype_from_cbor_tag
+
+    # RFC 8746, table 1
+    assert_equal(cbor_tag_from_dtype(np.dtype("uint8")), 64)
+    assert_equal(cbor_tag_from_dtype(np.dtype(">u2")), 65)
+    assert_equal(cbor_tag_from_dtype(np.dtype("<i4")), 78)
+    assert_equal(cbor_tag_from_dtype(np.dtype(">f8")), 82)
+    assert_equal(cbor_tag_from_dtype(np.dtype("<f4")), 85)
+    assert_equal(cbor_tag_from_dtype(np.dtype("bool")), None)
+    for tag in range(64, 88):
+        dtype = dtype_from_cbor_tag(tag)
+        if dtype is not None and tag != 68:  # uint8 clamped
+            assert_equal(cbor_tag_from_dtype(dtype), tag)
+
+    @dataclass
+    class C3:
+        a: np.ndarray
+        b: object
+
+    x = np.random.rand(3, 4)
+    arrays = [
+        x,
+        x[:, ::2],
+        np.arange(10, dtype=">i2"),
+        np.arange(6, dtype="uint8").reshape((1, 2, 3)),
+        np.array([True, False]),
+    ]
+    for a in arrays:
+        ob = C3(a, a)
+        data = cbor_from_object(ob, numpy_tags=True)
+        if a.dtype != bool:
+            assert len(data) < len(cbor_from_object(ob))
+        mj = cbor2.loads(data, tag_hook=tag_hook)
+        ob2 = object_from_ipce(mj, C3)
+        assert_equal(ob2.a.dtype, a.dtype)
+        assert_equal(ob2.a.shape, a.shape)
+        assert_allclose(ob2.a, a)
+        assert_allclose(ob2.b, a)
+
+
+def test_numpy_compression():
+    from zuper_ipce.numpy_encoding import numpy_rows_from_ipce
+
+    # a depth-like image: compresses well
+    x = np.tile(np.arange(64, dtype="uint16"), (100, 3))
+    for method in ["zlib", "lzma"]:
+        compression = NumpyCompression(method, level=1, chunk_size=1000, min_size=0)
+        d = ipce_from_numpy_array(x, compression)
+        assert "data" not in d
+        assert_equal(len(d["chunks"]), -(-x.nbytes // 1000))
+        assert sum(len(c) for c in d["chunks"]) < x.nbytes
+        y = numpy_array_from_ipce(d)
+        assert y.flags.writeable
+        assert_equal(y.dtype, x.dtype)
+        assert_allclose(x, y)
+
+        for start, stop in [(0, 1), (7, 23), (50, 200), (99, 100), (5, 5)]:
+            assert_allclose(numpy_rows_from_ipce(d, start, stop), x[start:stop])
+
+        @dataclass
+        class C4:
+            a: np.ndarray
+
+        for with_schema in [True, False]:
+            ieso = IESO(with_schema=with_schema, numpy_compression=compression)
+            ob = C4(x[:, ::2])
+            ipce = ipce_from_object(ob, ieso=ieso)
+            assert "chunks" in ipce["a"]
+            assert_equal(cbor_from_object(ob, ieso=ieso), cbor2.dumps(ipce))
+            assert_allclose(object_from_ipce(ipce, C4).a, x[:, ::2])
+
+    # small arrays are not compressed
+    d = ipce_from_numpy_array(x, NumpyCompression(min_size=x.nbytes + 1))
+    assert "data" in d
+
+
+@raises(ValueError)
+def test_numpy_compression_unknown():
+    ipce_from_numpy_array(np.zeros(10), NumpyCompression("bz3", min_size=0))
@@ -0,0 +1,95 @@
+from typing import List
+
+import cbor2
+from nose.tools import assert_equal, raises
+
+from zuper_ipce import IESO, ipce_from_object, object_from_ipce
+from zuper_ipce.conv_cbor_from_object import cbor_from_object
+from zuper_ipce.json2cbor import tag_hook
+from zuper_typing import dataclass
+
+
+@dataclass
+class Signal:
+    times: List[float]
+    counts: List[int]
+    flags: List[bool]
+    names: List[str]
+    short: List[float]
+
+
+def get_signal(n: int) -> Signal:
+    times = [i * 0.1 for i in range(n)]
+    counts = list(range(n))
+    flags = [i % 3 == 0 for i in range(n)]
+    names = [f"n{i}" for i in range(n)]
+    return Signal(times, counts, flags, names, [1.0, 2.0])
+
+
+def test_packed_lists_roundtrip():
+    s = get_signal(100)
+    for with_schema in [True, False]:
+        ieso = IESO(with_schema=with_schema, pack_numeric_lists=10)
+        ipce = ipce_from_object(s, ieso=ieso)
+        for k in ["times", "counts", "flags"]:
+            assert isinstance(ipce[k], dict), ipce[k]
+        assert isinstance(ipce["names"], list)
+        # below the threshold
+        assert isinstance(ipce["short"], list)
+
+        s2 = object_from_ipce(ipce, Signal)
+        assert_equal(s, s2)
+        assert_equal(type(s2.counts[0]), int)
+        assert_equal(type(s2.flags[0]), bool)
+
+        assert_equal(cbor_from_object(s, ieso=ieso), cbor2.dumps(ipce))
+
+
+def test_packed_lists_smaller():
+    s = get_signal(1000)
+    ieso = IESO(with_schema=False, pack_numeric_lists=10)
+    packed = cbor2.dumps(ipce_from_object(s, ieso=ieso))
+    plain = cbor2.dumps(ipce_from_object(s, ieso=IESO(with_schema=False)))
+    assert len(packed) < len(plain), (len(packed), len(plain))
+
+
+def test_packed_lists_top_level():
+    ob = [1.5] * 20
+    ieso = IESO(with_schema=True, pack_numeric_lists=10)
+    ipce = ipce_from_object(ob, List[float], ieso=ieso)
+    assert isinstance(ipce, dict)
+    assert_equal(object_from_ipce(ipce), ob)
+    assert_equal(object_from_ipce(ipce, List[float]), ob)
+
+
+def test_packed_lists_not_packable():
+    # valid ints, but the last one does not fit in 64 bits
+    ob = [1] * 20 + [2 ** 70]
+    ieso = IESO(with_schema=False, pack_numeric_lists=10)
+    ipce = ipce_from_object(ob, List[int], ieso=ieso)
+    assert isinstance(ipce, list)
+    assert_equal(object_from_ipce(ipce, List[int]), ob)
+
+
+def test_packed_lists_small_ints():
+    ieso = IESO(with_schema=False, pack_numeric_lists=10)
+    ipce = ipce_from_object(list(range(200)), List[int], ieso=ieso)
+    assert_equal(ipce["dtype"], "uint8")
+    ipce = ipce_from_object(list(range(-5, 1000)), List[int], ieso=ieso)
+    assert_equal(ipce["dtype"], "int16")
+    assert_equal(object_from_ipce(ipce, List[int]), list(range(-5, 1000)))
+
+
+def test_packed_lists_numpy_tags():
+    s = get_signal(100)
+    ieso = IESO(with_schema=False, pack_numeric_lists=10)
+    data = cbor_from_object(s, ieso=ieso, numpy_tags=True)
+    s2 = object_from_ipce(cbor2.loads(data, tag_hook=tag_hook), Signal)
+    assert_equal(s, s2)
+
+
+@raises(ValueError)
+def test_packed_lists_wrong_dtype():
+    ieso = IESO(with_schema=False, pack_numeric_lists=1)
+    ipce = ipce_from_object([1, 2, 3], List[int], ieso=ieso)
+    object_from_ipce(ipce, List[float])
@@ -0,0 +1,68 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+from nose.tools import assert_equal, raises
+
+from zuper_ipce import IESO, ipce_from_objects, objects_from_ipces
+from zuper_ipce.parallel import ipce_from_objects_parallel, objects_from_ipces_parallel
+from zuper_typing import dataclass
+
+
+# Note: at module level, so that they can be pickled
+@dataclass
+class P1:
+    a: int
+    b: float
+    c: Optional[str] = None
+
+
+@dataclass
+class P2:
+    items: List[P1]
+
+
+def get_obs(n: int):
+    return [P1(i, i / 3, None if i % 3 else str(i)) for i in range(n)]
+
+
+def test_parallel_processes():
+    obs = get_obs(25)
+    for with_schema in [True, False]:
+        ieso = IESO(with_schema=with_schema)
+        expected = ipce_from_objects(obs, P1, ieso=ieso)
+        obtained = ipce_from_objects_parallel(
+            obs, P1, ieso=ieso, max_workers=2, chunksize=4
+        )
+        assert_equal(expected, obtained)
+
+        obs2 = objects_from_ipces_parallel(obtained, P1, max_workers=2, chunksize=4)
+        assert_equal(obs, obs2)
+
+
+def test_parallel_processes_nested():
+    obs = [P2(get_obs(i)) for i in range(6)]
+    ipces = ipce_from_objects(obs, P2)
+    obs2 = objects_from_ipces_parallel(ipces, P2, max_workers=2, chunksize=2)
+    assert_equal(obs, obs2)
+    # the classes of the caller, not new ones
+    assert all(type(ob) is P2 for ob in obs2)
+    assert type(obs2[1].items[0]) is P1
+
+
+def test_parallel_executor():
+    obs = get_obs(10)
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        ipces = ipce_from_objects_parallel(obs, chunksize=3, executor=executor)
+        obs2 = objects_from_ipces_parallel(ipces, chunksize=3, executor=executor)
+    assert_equal(ipces, ipce_from_objects(obs))
+    assert_equal(obs2, objects_from_ipces(ipces))
+
+
+def test_parallel_small():
+    assert_equal(ipce_from_objects_parallel([]), [])
+    assert_equal(ipce_from_objects_parallel(iter([1, 2])), [1, 2])
+
+
+@raises(ValueError)
+def test_parallel_invalid_chunksize():
+    ipce_from_objects_parallel([1], chunksize=0)
@@ -1,8 +1,19 @@
-from typing import List, Optional
+import timeit
+from types import GeneratorType
+from typing import List, Optional, Union
+
+import cbor2
+
+from nose.tools import assert_equal
 
 from zuper_commons.logs import setup_logging
-from zuper_ipce import IPCE
+from zuper_ipce import IEDO, IESO, IPCE, logger, object_from_ipce
 from zuper_ipce import ipce_from_object
+from zuper_ipce.constants import IEDS, SHARING_IDENTITY
+from zuper_ipce.conv_cbor_from_object import cbor_from_object
+from zuper_ipce.conv_ipce_from_object import gen_ipce_from_object_
+from zuper_ipce.conv_object_from_ipce import gen_object_from_ipce_
+from zuper_ipce.trampoline import run_trampoline
 from zuper_ipce_tests.test_utils import assert_object_roundtrip
 from zuper_typing import dataclass
 
@@ -66,6 +77,69 @@ def test_recursive_chain_ipce():
     # print(ipce)
 
 
+def test_recursive_chain_deep():
+    # deeper than the recursion limit
+    n = 5000
+    t = None
+    for i in range(n):
+        t = Chain(i, t)
+
+    for with_schema in [True, False]:
+        ieso = IESO(with_schema=with_schema)
+        ipce: IPCE = ipce_from_object(t, Chain, ieso=ieso)
+        t2 = object_from_ipce(ipce, Chain)
+        # note: the comparison of dataclasses is recursive
+        a, b = t, t2
+        while a is not None:
+            assert isinstance(b, Chain)
+            assert_equal(a.data, b.data)
+            a, b = a.next_link, b.next_link
+        assert b is None
+
+        assert_equal(cbor_from_object(t, Chain, ieso=ieso), cbor2.dumps(ipce))
+
+
+def test_recursive_chain_deep_shared():
+    # the same list in every link, written once with the value-sharing tags
+    n = 5000
+    data = list(range(100))
+    t = None
+    for i in range(n):
+        t = Chain(data, t)
+
+    ieso = IESO(with_schema=False, sharing=SHARING_IDENTITY)
+    shared = cbor_from_object(t, Chain, ieso=ieso)
+    plain = cbor_from_object(t, Chain, ieso=IESO(with_schema=False))
+    assert len(shared) < len(plain) / 10, (len(shared), len(plain))
+
+
+@dataclass
+class UChain:
+    data: int
+    next_link: "Union[UChain, str, None]" = None
+
+
+def test_recursive_union_deep():
+    # each link is converted by trying the members of the union
+    n = 1000
+    t = "end"
+    for i in range(n):
+        t = UChain(i, t)
+
+    for with_schema in [True, False]:
+        ieso = IESO(with_schema=with_schema)
+        ipce: IPCE = ipce_from_object(t, UChain, ieso=ieso)
+        t2 = object_from_ipce(ipce, UChain)
+        a, b = t, t2
+        while isinstance(a, UChain):
+            assert isinstance(b, UChain)
+            assert_equal(a.data, b.data)
+            a, b = a.next_link, b.next_link
+        assert_equal(b, "end")
+
+        assert_equal(cbor_from_object(t, UChain, ieso=ieso), cbor2.dumps(ipce))
+
+
 def test_recursive_ipce():
     n = 6
     t = create_tree(n, 2, 0)
@@ -74,6 +148,57 @@ def test_recursive_ipce():
     assert_object_roundtrip(t)
 
 
+def run_recursive(g: object) -> object:
+    """ Runs the steps like run_trampoline(), but with plain recursion. """
+    if not isinstance(g, GeneratorType):
+        return g
+    to_send = None
+    to_throw = None
+    while True:
+        try:
+            if to_throw is not None:
+                e, to_throw = to_throw, None
+                child = g.throw(e)
+            else:
+                child = g.send(to_send)
+        except StopIteration as s:
+            return s.value
+        try:
+            to_send = run_recursive(child)
+        except BaseException as e:
+            to_throw = e
+
+
+def test_trampoline_shallow_benchmark():
+    """ On shallow data, the explicit stack of run_trampoline()
+        costs about the same as the recursion. """
+    obs = [Tree(i, [Tree(j, []) for j in range(3)]) for i in range(300)]
+    ieso = IESO(with_schema=False)
+    iedo = IEDO(False, False)
+    ipces = [ipce_from_object(ob, Tree, ieso=ieso) for ob in obs]
+
+    def encode(run):
+        def f():
+            for ob in obs:
+                run(gen_ipce_from_object_(ob, Tree, globals_={}, ieso=ieso))
+
+        return f
+
+    def decode(run):
+        def f():
+            for mj in ipces:
+                run(gen_object_from_ipce_(mj, Tree, ieds=IEDS({}, {}), iedo=iedo))
+
+        return f
+
+    for name, make in [("encode", encode), ("decode", decode)]:
+        t_rec = min(timeit.repeat(make(run_recursive), number=3, repeat=3))
+        t_tr = min(timeit.repeat(make(run_trampoline), number=3, repeat=3))
+        logger.info(f"{name}: recursion {t_rec:.3f}s, trampoline {t_tr:.3f}s")
+        # generous, to avoid spurious failures on loaded machines
+        assert t_tr < 1.5 * t_rec, (name, t_tr, t_rec)
+
+
 #
 # async def test_recursive_chain_2():
 #     n = 1000
@@ -0,0 +1,68 @@
+import os
+import tempfile
+
+from nose.tools import assert_equal
+
+from zuper_ipce import ipce_from_typelike
+from zuper_ipce.persistent_schema_cache import (
+    disable_persistent_schema_cache,
+    enable_persistent_schema_cache,
+    get_persistent_schema_cache_stats,
+    warm_schema_cache,
+)
+from zuper_ipce.schema_caching import clear_ipce_from_typelike_cache
+from zuper_typing import dataclass
+
+
+def make_class(with_b: bool) -> type:
+    if with_b:
+
+        @dataclass
+        class P1:
+            a: int
+            b: str
+
+    else:
+
+        @dataclass
+        class P1:
+            a: int
+
+    return P1
+
+
+def test_persistent_cache_roundtrip():
+    with tempfile.TemporaryDirectory() as d:
+        enable_persistent_schema_cache(d)
+        try:
+            P1 = make_class(False)
+            clear_ipce_from_typelike_cache()
+            schema1 = ipce_from_typelike(P1)
+            assert os.listdir(d)
+            stats0 = get_persistent_schema_cache_stats()
+
+            clear_ipce_from_typelike_cache()
+            schema2 = ipce_from_typelike(P1)
+            assert_equal(schema1, schema2)
+            stats1 = get_persistent_schema_cache_stats()
+            assert_equal(stats1["hits"], stats0["hits"] + 1)
+
+            # same module and qualname, but a different definition
+            P1b = make_class(True)
+            clear_ipce_from_typelike_cache()
+            schema3 = ipce_from_typelike(P1b)
+            assert "b" in schema3["properties"]
+            stats2 = get_persistent_schema_cache_stats()
+            assert_equal(stats2["invalidated"], stats1["invalidated"] + 1)
+        finally:
+            disable_persistent_schema_cache()
+
+
+@dataclass
+class Warm1:
+    a: int
+
+
+def test_warm_schema_cache():
+    res = warm_schema_cache([__name__])
+    assert Warm1 in res
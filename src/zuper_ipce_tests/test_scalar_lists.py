@@ -0,0 +1,63 @@
+from decimal import Decimal
+from typing import List
+
+from nose.tools import assert_equal, raises
+
+from zuper_ipce import ipce_from_object, object_from_ipce
+from zuper_ipce.conv_ipce_from_object import all_ipce_as_is
+from zuper_ipce.conv_object_from_ipce import all_objects_as_is
+from zuper_typing import dataclass
+from .test_utils import assert_object_roundtrip
+
+
+def test_all_ipce_as_is():
+    assert all_ipce_as_is([], float)
+    assert all_ipce_as_is([1.0, 2.0], float)
+    assert all_ipce_as_is([1, "a", 2.0, b"", Decimal(1)], object)
+    assert not all_ipce_as_is([1.0, 2], float)
+    assert not all_ipce_as_is([True], int)
+    assert not all_ipce_as_is([[1]], object)
+    assert not all_ipce_as_is([None], object)
+
+
+def test_all_objects_as_is():
+    assert all_objects_as_is(["a", "b"], str)
+    assert not all_objects_as_is(["a", 1], str)
+    assert not all_objects_as_is([{}], object)
+
+
+@dataclass
+class TimeSeries:
+    timestamps: List[float]
+    values: List[int]
+    labels: List[str]
+
+
+def test_scalar_lists_roundtrip():
+    ts = TimeSeries([0.5 * i for i in range(1000)], list(range(1000)), ["a", "b"])
+    assert_object_roundtrip(ts)
+
+
+def test_scalar_list_mixed():
+    # not homogeneous: the elements are converted one by one
+    ob = [1, True, 2]
+    assert_equal(ipce_from_object(ob, List[int]), ob)
+
+
+def test_scalar_list_copied():
+    ob = [1.0, 2.0]
+    ipce = ipce_from_object(ob, List[float])
+    assert ipce is not ob
+    res = object_from_ipce(ipce, List[float])
+    assert res is not ipce
+    assert_equal(res, ob)
+
+
+@raises(TypeError)
+def test_scalar_list_wrong_type():
+    ipce_from_object([1.0, "a"], List[float])
+
+
+@raises(ValueError)
+def test_scalar_list_wrong_type_decode():
+    object_from_ipce([1.0, "a"], List[float])
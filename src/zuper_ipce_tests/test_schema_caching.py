@@ -0,0 +1,94 @@
+import gc
+
+from nose.tools import assert_equal
+
+from zuper_ipce import ipce_from_typelike
+from zuper_ipce.constants import SCHEMA_ATT, SCHEMA_ID
+from zuper_ipce.schema_caching import (
+    clear_ipce_from_typelike_cache,
+    get_ipce_from_typelike_cache,
+    get_ipce_from_typelike_cache_entries,
+    get_ipce_from_typelike_cache_stats,
+    IPCETypelikeCache,
+    set_ipce_from_typelike_cache,
+    set_ipce_from_typelike_cache_size,
+)
+from zuper_typing import dataclass
+
+
+def test_cache_weak_collected():
+    clear_ipce_from_typelike_cache()
+    schema = {SCHEMA_ATT: SCHEMA_ID}
+    T = type("TemporaryType", (), {})
+    set_ipce_from_typelike_cache(T, {}, schema)
+    tre = get_ipce_from_typelike_cache(T, {})
+    assert tre.schema is schema
+    assert_equal(get_ipce_from_typelike_cache_stats()["entries"], 1)
+    del T
+    gc.collect()
+    stats = get_ipce_from_typelike_cache_stats()
+    assert_equal(stats["entries"], 0)
+    assert_equal(stats["collected"], 1)
+
+
+def test_cache_eviction():
+    @dataclass
+    class E1:
+        a: int
+
+    @dataclass
+    class E2:
+        a: str
+
+    @dataclass
+    class E3:
+        a: bool
+
+    clear_ipce_from_typelike_cache()
+    maxsize = IPCETypelikeCache.maxsize
+    try:
+        set_ipce_from_typelike_cache_size(3)
+        for T in [E1, E2, E3]:
+            ipce_from_typelike(T)
+        stats = get_ipce_from_typelike_cache_stats()
+        assert stats["entries"] <= 3
+        assert stats["evictions"] > 0
+        assert stats["memory_bytes"] > 0
+        cached = [T for T, _ in get_ipce_from_typelike_cache_entries()]
+        assert E3 in cached
+        assert E1 not in cached
+    finally:
+        set_ipce_from_typelike_cache_size(maxsize)
+
+
+def test_cache_context_most_specific():
+    clear_ipce_from_typelike_cache()
+    T = type("ContextType", (), {})
+    s0 = {SCHEMA_ATT: SCHEMA_ID, "n": 0}
+    s1 = {SCHEMA_ATT: SCHEMA_ID, "n": 1}
+    s2 = {SCHEMA_ATT: SCHEMA_ID, "n": 2}
+    set_ipce_from_typelike_cache(T, {}, s0)
+    set_ipce_from_typelike_cache(T, {"A": "a"}, s1)
+    set_ipce_from_typelike_cache(T, {"A": "a", "B": "b"}, s2)
+
+    assert get_ipce_from_typelike_cache(T, {}).schema is s0
+    assert get_ipce_from_typelike_cache(T, {"A": "other"}).schema is s0
+    tre = get_ipce_from_typelike_cache(T, {"A": "a"})
+    assert tre.schema is s1
+    assert_equal(tre.used, {"A": "a"})
+    assert get_ipce_from_typelike_cache(T, {"A": "a", "C": "c"}).schema is s1
+    assert get_ipce_from_typelike_cache(T, {"A": "a", "B": "b"}).schema is s2
+    assert get_ipce_from_typelike_cache(T, {"A": "a", "B": "b", "C": "c"}).schema is s2
+
+
+def test_cache_context_missing():
+    clear_ipce_from_typelike_cache()
+    T = type("ContextType2", (), {})
+    set_ipce_from_typelike_cache(T, {"A": "a"}, {SCHEMA_ATT: SCHEMA_ID})
+    for context in [{}, {"A": "b"}, {"B": "a"}]:
+        try:
+            get_ipce_from_typelike_cache(T, context)
+        except KeyError:
+            pass
+        else:  # pragma: no cover
+            raise Exception(context)
@@ -0,0 +1,52 @@
+import cbor2
+from nose.tools import assert_equal
+
+from zuper_ipce import IEDO, ipce_from_object, object_from_ipce
+from zuper_ipce.schema_caching import (
+    clear_typelike_from_ipce_cache,
+    get_typelike_from_ipce_cache_stats,
+)
+from zuper_typing import dataclass
+
+
+iedo_cached = IEDO(
+    use_remembered_classes=False,
+    remember_deserialized_classes=False,
+    use_schema_cache=True,
+)
+
+
+def test_schema_cache_same_class():
+    @dataclass
+    class SC1:
+        a: int
+        b: str
+
+    clear_typelike_from_ipce_cache()
+    ipce = ipce_from_object(SC1(1, "a"))
+    # new dict objects every time, like when reading a stream
+    ob1 = object_from_ipce(cbor2.loads(cbor2.dumps(ipce)), iedo=iedo_cached)
+    ob2 = object_from_ipce(cbor2.loads(cbor2.dumps(ipce)), iedo=iedo_cached)
+    assert type(ob1) is type(ob2)
+    stats = get_typelike_from_ipce_cache_stats()
+    assert_equal(stats["misses"], 1)
+    assert_equal(stats["hits"], 1)
+    assert_equal(stats["hits_identity"], 0)
+
+    # the same dict object uses the identity fast path
+    object_from_ipce(ipce, iedo=iedo_cached)
+    object_from_ipce(ipce, iedo=iedo_cached)
+    stats = get_typelike_from_ipce_cache_stats()
+    assert_equal(stats["hits_identity"], 1)
+
+
+def test_schema_cache_disabled():
+    @dataclass
+    class SC2:
+        a: int
+
+    # the default
+    ipce = ipce_from_object(SC2(1))
+    ob1 = object_from_ipce(ipce)
+    ob2 = object_from_ipce(ipce)
+    assert type(ob1) is not type(ob2)
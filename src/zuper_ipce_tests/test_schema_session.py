@@ -0,0 +1,102 @@
+from typing import Dict, List, Optional
+
+import cbor2
+from nose.tools import assert_equal, raises
+
+from zuper_ipce import ipce_from_object, object_from_ipce
+from zuper_ipce.constants import SCHEMA_ATT, SCHEMA_REF_ATT
+from zuper_ipce.conv_cbor_from_object import cbor_from_object
+from zuper_ipce.schema_session import compress_schemas, expand_schemas, SchemaSession
+from zuper_typing import dataclass
+
+
+@dataclass
+class SS1:
+    a: int
+    b: Dict[str, float]
+    c: "Optional[SS1]" = None
+
+
+@dataclass
+class SS2:
+    records: List[SS1]
+    what: type = SS1
+
+
+def get_records(n: int) -> List[SS1]:
+    return [SS1(i, {"x": i / 2}, SS1(-i, {})) for i in range(n)]
+
+
+def test_schema_session_roundtrip():
+    obs = get_records(10) + [SS2(get_records(3))]
+    es = SchemaSession()
+    ds = SchemaSession()
+    data = []
+    for ob in obs:
+        ipce = ipce_from_object(ob, session=es)
+        data.append(cbor2.dumps(ipce))
+    # the schema of SS1 and of the dict are written once
+    first = cbor2.loads(data[0])
+    second = cbor2.loads(data[1])
+    assert SCHEMA_REF_ATT not in first[SCHEMA_ATT]
+    assert SCHEMA_REF_ATT in second[SCHEMA_ATT]
+    assert len(data[1]) < len(data[0])
+
+    for ob, d in zip(obs, data):
+        ob2 = object_from_ipce(cbor2.loads(d), session=ds)
+        assert_equal(ob, ob2)
+    assert_equal(set(es.schemas), set(ds.schemas))
+
+
+def test_schema_session_stream():
+    obs = get_records(5)
+    s1 = SchemaSession()
+    s2 = SchemaSession()
+    for ob in obs:
+        expected = cbor2.dumps(ipce_from_object(ob, session=s1))
+        obtained = cbor_from_object(ob, session=s2)
+        assert_equal(expected, obtained)
+
+
+@dataclass
+class SS3:
+    # converted first, but written after b in CBOR order
+    long_name: SS1
+    b: SS1
+
+
+def test_schema_session_ref_before_schema():
+    obs = [SS3(SS1(1, {}), SS1(2, {})), SS3(SS1(3, {}), SS1(4, {}))]
+    for encode in [ipce_from_object, cbor_from_object]:
+        es = SchemaSession()
+        ds = SchemaSession()
+        for ob in obs:
+            x = encode(ob, session=es)
+            mj = cbor2.loads(x) if isinstance(x, bytes) else x
+            assert_equal(object_from_ipce(mj, session=ds), ob)
+        assert_equal(set(es.schemas), set(ds.schemas))
+
+
+def test_schema_session_deep():
+    ipce = ipce_from_object(SS1(1, {}))
+    x = [ipce]
+    for _ in range(10000):
+        x = [x]
+    es = SchemaSession()
+    ds = SchemaSession()
+    compress_schemas(ipce, es)
+    compressed = compress_schemas(x, es)
+    assert compressed is not x
+    expand_schemas(ipce, ds)
+    expanded = expand_schemas(compressed, ds)
+    for _ in range(10001):
+        expanded = expanded[0]
+    assert_equal(expanded, ipce)
+
+
+@raises(ValueError)
+def test_schema_session_unknown_ref():
+    es = SchemaSession()
+    ipces = [ipce_from_object(ob, session=es) for ob in get_records(2)]
+    # the decoder did not see the first one
+    object_from_ipce(ipces[1], session=SchemaSession())
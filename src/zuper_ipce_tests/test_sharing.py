@@ -0,0 +1,142 @@
+import os
+import tempfile
+from decimal import Decimal
+from typing import List
+
+import cbor2
+from nose.tools import assert_equal, raises
+
+from zuper_ipce import IEDO, IESO, ipce_from_object, object_from_ipce
+from zuper_ipce.cbor_mmap import read_cbor_mmap
+from zuper_ipce.constants import SHARING_IDENTITY, SHARING_VALUE
+from zuper_ipce.conv_cbor_from_object import cbor_from_object
+from zuper_ipce.sharing import find_shared, value_key
+from zuper_typing import dataclass
+
+
+@dataclass(frozen=True)
+class Material:
+    name: str
+    roughness: float
+
+
+@dataclass
+class Mesh:
+    vertices: List[float]
+
+
+@dataclass
+class Node:
+    name: str
+    material: Material
+    mesh: Mesh
+
+
+@dataclass
+class Scene:
+    nodes: List[Node]
+
+
+def get_scene(n: int, same_material: bool = True) -> Scene:
+    mesh = Mesh([0.5 * i for i in range(100)])
+    red = Material("red", 0.25)
+    nodes = []
+    for i in range(n):
+        material = red if same_material else Material("red", 0.25)
+        nodes.append(Node(f"n{i}", material, mesh))
+    return Scene(nodes)
+
+
+iedo = IEDO(
+    use_remembered_classes=False,
+    remember_deserialized_classes=False,
+    share_objects=True,
+)
+
+
+def test_sharing_identity():
+    scene = get_scene(20)
+    ieso = IESO(with_schema=True, sharing=SHARING_IDENTITY)
+    ipce = ipce_from_object(scene, ieso=ieso)
+    n0, n1 = ipce["nodes"][0], ipce["nodes"][1]
+    assert n0["material"] is n1["material"]
+    assert n0["mesh"] is n1["mesh"]
+    # the schemas are not counted
+    assert_equal(find_shared(ipce), {id(n0["material"]), id(n0["mesh"])})
+
+    data = cbor_from_object(scene, ieso=ieso)
+    plain = cbor_from_object(scene, ieso=IESO(with_schema=True))
+    assert len(data) < len(plain) / 5, (len(data), len(plain))
+
+    mj = cbor2.loads(data)
+    assert_equal(mj, ipce)
+    assert mj["nodes"][0]["mesh"] is mj["nodes"][1]["mesh"]
+
+    scene2 = object_from_ipce(mj, Scene, iedo=iedo)
+    assert_equal(scene, scene2)
+    assert scene2.nodes[0].mesh is scene2.nodes[1].mesh
+    assert scene2.nodes[0].material is scene2.nodes[1].material
+
+
+def test_sharing_value():
+    scene = get_scene(5, same_material=False)
+    ipce = ipce_from_object(scene, ieso=IESO(sharing=SHARING_IDENTITY))
+    assert ipce["nodes"][0]["material"] is not ipce["nodes"][1]["material"]
+    assert ipce["nodes"][0]["mesh"] is ipce["nodes"][1]["mesh"]
+
+    ipce = ipce_from_object(scene, ieso=IESO(sharing=SHARING_VALUE))
+    assert ipce["nodes"][0]["material"] is ipce["nodes"][1]["material"]
+    assert_equal(object_from_ipce(ipce, Scene, iedo=iedo), scene)
+
+
+@dataclass(frozen=True)
+class Scalar:
+    x: object
+
+
+def test_sharing_value_exact():
+    # equal for ==, but with different IPCEs
+    for a, b in [(1, True), (1, 1.0), (0.0, -0.0), (Decimal("1.0"), Decimal("1.00"))]:
+        assert Scalar(a) == Scalar(b)
+        assert value_key(Scalar(a)) != value_key(Scalar(b)), (a, b)
+        ob = [Scalar(a), Scalar(b)]
+        ipce = ipce_from_object(ob, List[Scalar], ieso=IESO(sharing=SHARING_VALUE))
+        assert ipce[0] is not ipce[1]
+        assert_equal(object_from_ipce(ipce, List[Scalar]), ob)
+    assert_equal(value_key(Scalar(1.5)), value_key(Scalar(1.5)))
+    assert value_key(Scalar([1])) is None
+
+
+@raises(TypeError)
+def test_sharing_error():
+    cbor_from_object(1.5, suggest_type=int, ieso=IESO(sharing=SHARING_IDENTITY))
+
+
+def test_sharing_off():
+    scene = get_scene(5)
+    ipce = ipce_from_object(scene)
+    assert ipce["nodes"][0]["mesh"] is not ipce["nodes"][1]["mesh"]
+    assert_equal(find_shared(ipce), set())
+    assert_equal(cbor_from_object(scene), cbor2.dumps(ipce))
+
+    # without share_objects the values are the same, but not shared
+    data = cbor_from_object(scene, ieso=IESO(sharing=SHARING_IDENTITY))
+    scene2 = object_from_ipce(cbor2.loads(data), Scene)
+    assert_equal(scene, scene2)
+    assert scene2.nodes[0].mesh is not scene2.nodes[1].mesh
+
+
+def test_sharing_mmap():
+    scene = get_scene(10)
+    data = cbor_from_object(scene, ieso=IESO(sharing=SHARING_IDENTITY))
+    fd, fn = tempfile.mkstemp(suffix=".ipce.cbor")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    try:
+        mj = read_cbor_mmap(fn)
+        assert_equal(mj, cbor2.loads(data))
+        scene2 = object_from_ipce(mj, Scene, iedo=iedo)
+        assert_equal(scene, scene2)
+        assert scene2.nodes[0].mesh is scene2.nodes[1].mesh
+    finally:
+        os.unlink(fn)
@@ -1,6 +1,17 @@
-from nose.tools import raises
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
 
-from zuper_ipce.ipce_spec import assert_canonical_ipce
+from nose.tools import assert_equal, raises
+
+from zuper_ipce import IESO, ipce_from_object, ipce_from_typelike
+from zuper_ipce.constants import VALIDATION_FULL, VALIDATION_OFF
+from zuper_ipce.ipce_spec import (
+    assert_canonical_ipce,
+    get_default_validation,
+    set_default_validation,
+    should_validate,
+)
+from zuper_typing import dataclass
 
 
 @raises(ValueError)
@@ -30,3 +41,75 @@ def test_spec4():
 def test_spec4ok():
     x = [1, 2]
     assert_canonical_ipce(x)
+
+
+@raises(ValueError)
+def test_spec_not_sorted():
+    x = {"bb": 1, "a": 2}
+    assert_canonical_ipce(x)
+
+
+def test_spec_validation_levels():
+    @dataclass
+    class V1:
+        a: int
+
+    ieso = IESO(validation=VALIDATION_OFF)
+    assert not should_validate(ieso.validation)
+    assert should_validate(VALIDATION_FULL)
+    n = 10
+    checked = [should_validate(n) for _ in range(n * 3)]
+    assert_equal(checked.count(True), 3)
+
+    ipce_from_object(V1(1), ieso=ieso)
+    ipce_from_typelike(V1, ieso=ieso)
+
+
+def test_spec_validation_threads():
+    n = 10
+
+    def check() -> int:
+        return [should_validate(n) for _ in range(n * 100)].count(True)
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        counts = list(executor.map(lambda _: check(), range(8)))
+    # each increment of the counter is seen by exactly one call
+    assert_equal(sum(counts), 8 * 100)
+
+
+def test_spec_validation_default():
+    old = get_default_validation()
+    try:
+        set_default_validation(VALIDATION_OFF)
+        assert not should_validate()
+        assert should_validate(VALIDATION_FULL)
+    finally:
+        set_default_validation(old)
+    assert_equal(get_default_validation(), old)
+
+
+@raises(ValueError)
+def test_spec_validation_invalid():
+    set_default_validation(-1)
+
+
+def test_spec_validation_schemas():
+    import zuper_ipce.schema_caching as schema_caching
+
+    @dataclass
+    class V2:
+        a: int
+        b: "Optional[V2]" = None
+
+    checked = []
+    original = schema_caching.assert_canonical_schema
+    schema_caching.assert_canonical_schema = checked.append
+    try:
+        ieso = IESO(validation=VALIDATION_OFF, use_ipce_from_typelike_cache=False)
+        ipce_from_typelike(V2, ieso=ieso)
+        assert_equal(checked, [])
+        ieso = IESO(validation=VALIDATION_FULL, use_ipce_from_typelike_cache=False)
+        ipce_from_typelike(V2, ieso=ieso)
+        assert checked
+    finally:
+        schema_caching.assert_canonical_schema = original
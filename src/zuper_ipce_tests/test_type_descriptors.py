@@ -0,0 +1,53 @@
+from typing import Any, Dict, List, Optional, Set, Tuple, Union
+
+from nose.tools import assert_equal
+
+from zuper_ipce.type_descriptors import (
+    get_type_descriptor,
+    KIND_DICT,
+    KIND_FIXED_TUPLE,
+    KIND_LIST,
+    KIND_OPTIONAL,
+    KIND_OTHER,
+    KIND_SET,
+    KIND_UNCONSTRAINED,
+    KIND_UNION,
+    KIND_VAR_TUPLE,
+)
+from zuper_typing import dataclass
+
+
+@dataclass
+class DescribedClass:
+    a: int
+
+
+def check_descriptor(T, kind, args=()):
+    d = get_type_descriptor(T)
+    assert_equal(d.kind, kind, T)
+    assert_equal(d.args, args, T)
+
+
+def test_descriptors():
+    check_descriptor(object, KIND_UNCONSTRAINED)
+    check_descriptor(Any, KIND_UNCONSTRAINED)
+    check_descriptor(Optional[int], KIND_OPTIONAL, (int,))
+    check_descriptor(List[int], KIND_LIST, (int,))
+    check_descriptor(Dict[str, int], KIND_DICT, (str, int))
+    check_descriptor(Set[int], KIND_SET, (int,))
+    check_descriptor(Tuple[int, ...], KIND_VAR_TUPLE, (int,))
+    check_descriptor(Tuple[int, str], KIND_FIXED_TUPLE, (int, str))
+    check_descriptor(DescribedClass, KIND_OTHER)
+    check_descriptor(int, KIND_OTHER)
+    assert get_type_descriptor(Tuple[int, str]).is_tuple
+    assert not get_type_descriptor(List[int]).is_tuple
+
+
+def test_descriptors_union_order():
+    check_descriptor(Union[int, str], KIND_UNION, (int, str))
+    check_descriptor(Union[str, int], KIND_UNION, (str, int))
+
+
+def test_descriptors_cached():
+    T = Dict[str, DescribedClass]
+    assert get_type_descriptor(T) is get_type_descriptor(T)
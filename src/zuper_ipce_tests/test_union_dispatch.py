@@ -0,0 +1,96 @@
+from typing import List, Optional, Union
+
+from nose.tools import assert_equal, raises
+
+from zuper_ipce import IESO, ipce_from_object, object_from_ipce
+from zuper_ipce.compile_union import get_union_plan
+from zuper_typing import dataclass
+
+
+@dataclass
+class UD1:
+    a: int
+
+
+@dataclass
+class UD2:
+    b: str
+    c: int = 0
+
+
+@dataclass
+class UD3:
+    b: str
+    d: List[int]
+
+
+Envelope = Union[int, str, UD1, UD2, UD3]
+
+
+def test_union_dispatch_candidates_object():
+    plan = get_union_plan(Envelope)
+    assert plan is get_union_plan(Envelope)
+    assert_equal(plan.candidates_for_object(1), [int, UD1, UD2, UD3])
+    assert_equal(plan.candidates_for_object(True), [int, UD1, UD2, UD3])
+    assert_equal(plan.candidates_for_object(UD2("x")), [UD1, UD2, UD3])
+
+
+def test_union_dispatch_candidates_ipce():
+    plan = get_union_plan(Envelope)
+    assert_equal(plan.candidates_for_ipce("x"), [str])
+    assert_equal(plan.candidates_for_ipce(None), [])
+    assert_equal(plan.candidates_for_ipce([1]), [])
+    assert_equal(plan.candidates_for_ipce({"b": "x"}), [UD2])
+    assert_equal(plan.candidates_for_ipce({"b": "x", "d": []}), [UD2, UD3])
+    assert_equal(plan.candidates_for_ipce({"$schema": {}}), [UD1, UD2, UD3])
+
+
+def test_union_dispatch_by_schema():
+    plan = get_union_plan(Envelope)
+    schema = ipce_from_object(UD3("x", [1]))["$schema"]
+    assert_equal(plan.candidates_for_ipce({"$schema": schema}), [UD3, UD1, UD2])
+    unknown = {"__module__": "elsewhere", "__qualname__": "UD3"}
+    assert_equal(plan.candidates_for_ipce({"$schema": unknown}), [UD1, UD2, UD3])
+
+
+def test_union_plans_bounded():
+    from zuper_ipce.compile_union import UnionPlans
+
+    max_size = UnionPlans.max_size
+    UnionPlans.max_size = 3
+    try:
+        for T in [int, str, bytes, float, bool]:
+            get_union_plan(Union[T, UD1])
+            assert len(UnionPlans.plans) <= 3
+    finally:
+        UnionPlans.max_size = max_size
+
+
+def test_union_dispatch_roundtrip():
+    @dataclass
+    class UD4:
+        m: Envelope
+        o: Optional[Union[List[int], UD1]] = None
+
+    obs = [UD4(1), UD4("a"), UD4(UD1(2)), UD4(UD2("x"), [1]), UD4(UD2("y"), UD1(3))]
+    for with_schema in [True, False]:
+        ieso = IESO(with_schema=with_schema)
+        for ob in obs:
+            ipce = ipce_from_object(ob, ieso=ieso)
+            assert_equal(ob, object_from_ipce(ipce, UD4))
+
+    # Without a schema, the first member that fits is used, as before.
+    ob = UD4(UD3("x", [1]))
+    assert_equal(object_from_ipce(ipce_from_object(ob), UD4), ob)
+    ipce = ipce_from_object(ob, ieso=IESO(with_schema=False))
+    assert_equal(object_from_ipce(ipce, UD4), UD4(UD2("x")))
+
+
+@raises(ValueError)
+def test_union_dispatch_none_fits():
+    object_from_ipce({"z": 1}, Envelope)
+
+
+@raises(TypeError)
+def test_union_dispatch_encode_fails():
+    ipce_from_object(1.5, Union[int, str])